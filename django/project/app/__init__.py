@@ -0,0 +1,4 @@
+# NOTE: Load Celery along with Django so @shared_task binds to the project app.
+from app.config.celery import app as celery_app
+
+__all__ = ("celery_app",)
@@ -0,0 +1,36 @@
+"""
+ASGI config for project.
+
+This module exposes the ASGI application as a module-level variable named
+``application``, for ASGI servers such as uvicorn:
+
+    gunicorn app.config.asgi -k uvicorn.workers.UvicornWorker
+
+Django 2.2 has no ASGI handler, so requests are served by the WSGI
+application, run in the event loop's thread pool by
+``app.devoff.asgi.ThreadPoolWsgiToAsgi``. With SCYTALE_FAST_PATH, like under
+WSGI, the cipher routes are served by ``app.devoff.asgi.CipherApplication``
+instead, skipping MIDDLEWARE.
+
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.config.settings.local")
+
+django_application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402 isort:skip
+
+from app.devoff.asgi import (  # noqa: E402 isort:skip
+    CipherApplication,
+    LifespanApplication,
+    ThreadPoolWsgiToAsgi,
+)
+
+if settings.SCYTALE_FAST_PATH:
+    application = CipherApplication(ThreadPoolWsgiToAsgi(django_application))
+else:
+    application = LifespanApplication(ThreadPoolWsgiToAsgi(django_application))
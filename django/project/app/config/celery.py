@@ -0,0 +1,21 @@
+"""
+Celery application for project.
+
+Tasks are autodiscovered from ``tasks.py`` in every installed app and the
+configuration is read from Django settings prefixed with ``CELERY_``.
+
+Run a worker with:
+    celery -A app worker -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.config.settings.local")
+
+app = Celery("app")
+
+app.config_from_object("django.conf:settings", namespace="CELERY")
+
+app.autodiscover_tasks()
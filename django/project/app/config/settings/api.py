@@ -0,0 +1,58 @@
+"""
+Cipher API settings and globals.
+
+Serves only the Dev Off endpoints (see app/config/urls_api.py), without the
+database, GeoDjango, admin, CMS apps or i18n URL prefixes, so workers boot
+fast. Deploy with DJANGO_SETTINGS_MODULE=app.config.settings.api.
+
+NOTE: Most settings _should_ be managed from ENV (see base.py).
+
+"""
+
+from .base import *
+
+ROOT_URLCONF = "app.config.urls_api"
+
+INSTALLED_APPS = ["rest_framework", "corsheaders", "app.devoff"]
+
+INSTALLED_APPS += env.list("API_INSTALLED_APPS", default=[])
+
+# Middleware
+# =====================================
+# NOTE: No sessions, auth, messages or redirects; nothing here needs them.
+
+MIDDLEWARE = [
+    "app.devoff.middleware.ProfilerMiddleware",
+    "app.devoff.middleware.MetricsMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "corsheaders.middleware.CorsMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "app.devoff.middleware.CompressionMiddleware",
+    "app.devoff.middleware.MetricsViewMiddleware",
+]
+
+if ENFORCE_HOST:
+    MIDDLEWARE = ["enforce_host.EnforceHostMiddleware"] + MIDDLEWARE
+
+# Databases
+# =====================================
+# NOTE: No database at all, any query fails loudly.
+
+DATABASES = {}
+
+# Templates
+# =====================================
+
+TEMPLATES = []
+
+# Django Rest Framework
+# =====================================
+# NOTE: The cipher views are AllowAny, skip authentication altogether. An
+#       UNAUTHENTICATED_USER of None keeps django.contrib.auth unloaded.
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_AUTHENTICATION_CLASSES": [],
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.AllowAny"],
+    "UNAUTHENTICATED_USER": None,
+}
@@ -153,6 +153,8 @@ INSTALLED_APPS += env.list("INSTALLED_APPS", default=[])
 #   * Django WhiteNoise Middleware: https://goo.gl/b5nztY
 
 MIDDLEWARE = [
+    "app.devoff.middleware.ProfilerMiddleware",
+    "app.devoff.middleware.MetricsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.middleware.cache.UpdateCacheMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -161,12 +163,13 @@ MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.middleware.gzip.GZipMiddleware",
+    "app.devoff.middleware.CompressionMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.contrib.redirects.middleware.RedirectFallbackMiddleware",
     "django.middleware.cache.FetchFromCacheMiddleware",
+    "app.devoff.middleware.MetricsViewMiddleware",
 ]
 
 MIDDLEWARE += env.list("MIDDLEWARE", default=[])
@@ -190,6 +193,18 @@ DATABASES = {
 #       which sets the backend to django.db.backends.postgresql_psycopg2.
 DATABASES["default"]["ENGINE"] = "django.contrib.gis.db.backends.postgis"
 
+# NOTE: Keep connections open across requests, in seconds (0 closes them after
+#       every request). Under gevent, as the Dockerfile runs gunicorn, each
+#       greenlet keeps its own connection and they can exhaust Postgres'
+#       max_connections, so only raise it with sync workers or behind
+#       PgBouncer: point DATABASE_URL to it (see docker-compose.yml) and, with
+#       transaction pooling, disable server-side cursors.
+DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=0)
+
+DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = env.bool(
+    "DISABLE_SERVER_SIDE_CURSORS", default=False
+)
+
 # Geo Django
 # =====================================
 # See:
@@ -302,7 +317,8 @@ USE_I18N = True
 
 USE_L10N = True
 
-PREFIX_DEFAULT_LANGUAGE = False
+# NOTE: Serve the default language under /<code>/ too, e.g. /en/encrypt.
+PREFIX_DEFAULT_LANGUAGE = env.bool("PREFIX_DEFAULT_LANGUAGE", default=False)
 
 LANGUAGE_CODE = "en"
 
@@ -350,17 +366,54 @@ CACHES = {
 
 REDIS_URL = env("REDIS_URL", default="")
 
+# NOTE: With REDIS_URL a per-process LRU of CACHE_LOCAL_ENTRIES values up to
+#       CACHE_LOCAL_MAX_LENGTH bytes, kept for CACHE_LOCAL_TIMEOUT seconds and
+#       invalidated over pub/sub, answers repeated reads without a round trip,
+#       see app/devoff/cache.py. Each process has a pool of
+#       REDIS_MAX_CONNECTIONS connections, waiting up to REDIS_POOL_TIMEOUT
+#       seconds for a free one. Strings and bytes are stored as they are,
+#       other values pickled, and values of at least REDIS_COMPRESS_MIN_LENGTH
+#       bytes zlib-compressed.
 if REDIS_URL:
-    CACHES["default"]["BACKEND"] = "redis_cache.RedisCache"
+    CACHES["default"]["BACKEND"] = "app.devoff.cache.TwoTierCache"
     CACHES["default"]["LOCATION"] = REDIS_URL
+    CACHES["default"]["OPTIONS"] = {
+        "CONNECTION_POOL_CLASS": "redis.BlockingConnectionPool",
+        "CONNECTION_POOL_CLASS_KWARGS": {
+            "max_connections": env.int("REDIS_MAX_CONNECTIONS", default=50),
+            "timeout": env.float("REDIS_POOL_TIMEOUT", default=5.0),
+        },
+        "SOCKET_TIMEOUT": env.float("REDIS_SOCKET_TIMEOUT", default=5.0),
+        "SOCKET_CONNECT_TIMEOUT": env.float(
+            "REDIS_SOCKET_CONNECT_TIMEOUT", default=2.0
+        ),
+        "SERIALIZER_CLASS": env(
+            "REDIS_SERIALIZER", default="app.devoff.cache.Serializer"
+        ),
+        "COMPRESSOR_CLASS": "app.devoff.cache.Compressor",
+        "COMPRESSOR_CLASS_KWARGS": {
+            "min_length": env.int("REDIS_COMPRESS_MIN_LENGTH", default=16 * 1024),
+            "level": env.int("REDIS_COMPRESS_LEVEL", default=1),
+        },
+        "LOCAL_ENTRIES": env.int("CACHE_LOCAL_ENTRIES", default=1024),
+        "LOCAL_TIMEOUT": env.float("CACHE_LOCAL_TIMEOUT", default=5.0),
+        "LOCAL_MAX_LENGTH": env.int("CACHE_LOCAL_MAX_LENGTH", default=1024 * 1024),
+    }
 
 
 # Celery
 # =====================================
+# NOTE: Without REDIS_URL tasks run eagerly, in-process.
+
+CELERY_BROKER_URL = REDIS_URL or "memory://"
+
+CELERY_RESULT_BACKEND = REDIS_URL or "cache+memory://"
 
-CELERY_BROKER_URL = REDIS_URL
+CELERY_TASK_ALWAYS_EAGER = env.bool("CELERY_TASK_ALWAYS_EAGER", default=not REDIS_URL)
 
-CELERY_RESULT_BACKEND = REDIS_URL
+CELERY_TASK_STORE_EAGER_RESULT = True
+
+CELERY_RESULT_EXPIRES = env.int("CELERY_RESULT_EXPIRES", default=60 * 60)
 
 # Parler
 # =====================================
@@ -397,9 +450,195 @@ REST_FRAMEWORK = {
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_PARSER_CLASSES": ["rest_framework.parsers.JSONParser",],
-    "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
+    "DEFAULT_RENDERER_CLASSES": ["app.devoff.renderers.JSONRenderer"],
+    "DEFAULT_CONTENT_NEGOTIATION_CLASS": (
+        "app.devoff.negotiation.MirrorContentNegotiation"
+    ),
+    "DEFAULT_THROTTLE_CLASSES": [
+        "app.devoff.throttling.ClientRateThrottle",
+        "app.devoff.throttling.TokenRateThrottle",
+    ],
+    # NOTE: Per endpoint URL name, per client address (".ip") and per token
+    #       (".token"), e.g. THROTTLE_RATES=encrypt.ip=600/min,decrypt.ip=600/min
+    #       See app/devoff/throttling.py.
+    "DEFAULT_THROTTLE_RATES": env.dict("THROTTLE_RATES", default={}),
+    # NOTE: Proxies in front of the app, 1 behind the Heroku router. Clients
+    #       are told apart by REMOTE_ADDR when 0, otherwise by the address
+    #       the last proxy added to X-Forwarded-For, which clients can't forge.
+    "NUM_PROXIES": env.int("NUM_PROXIES", default=0),
+}
+
+# Dev Off
+# =====================================
+
+# NOTE: Upper bound, in bytes, for the cached Scytale permutation tables.
+#       Each table takes 4 bytes per character of the message.
+SCYTALE_PERMUTATION_CACHE_BYTES = env.int(
+    "SCYTALE_PERMUTATION_CACHE_BYTES", default=64 * 1024 * 1024
+)
+
+# NOTE: Cipher implementation, one of: reference, buffer, numpy.
+#       See app/devoff/backends.py.
+SCYTALE_BACKEND = env("SCYTALE_BACKEND", default="reference")
+
+# NOTE: Max number of messages accepted by the batch endpoints.
+SCYTALE_BATCH_MAX_ITEMS = env.int("SCYTALE_BATCH_MAX_ITEMS", default=1000)
+
+# NOTE: Characters held in memory at once by the streaming endpoints.
+SCYTALE_STREAM_CHUNK_SIZE = env.int("SCYTALE_STREAM_CHUNK_SIZE", default=64 * 1024)
+
+# NOTE: Largest cipher request body accepted, in bytes. Larger ones get a 413.
+SCYTALE_MAX_BODY_SIZE = env.int("SCYTALE_MAX_BODY_SIZE", default=128 * 1024 * 1024)
+
+# NOTE: Serve POST /encrypt and /decrypt straight from the WSGI or ASGI entry
+#       point, skipping MIDDLEWARE (see app/devoff/fastpath.py and
+#       app/devoff/asgi.py). Responses on those routes won't carry CORS,
+#       security or cache headers.
+SCYTALE_FAST_PATH = env.bool("SCYTALE_FAST_PATH", default=False)
+
+# NOTE: On the ASGI fast path (app/config/asgi.py), cipher requests with a
+#       body larger than this many bytes are handled in a thread, off the
+#       event loop. With REDIS_URL or jobs enabled every request is.
+SCYTALE_ASGI_INLINE_MAX_LENGTH = env.int(
+    "SCYTALE_ASGI_INLINE_MAX_LENGTH", default=64 * 1024
+)
+
+# NOTE: Memoize encrypt/decrypt results for CACHE_TIMEOUT seconds, in the
+#       default cache when REDIS_URL is set or in a per-process LRU otherwise.
+#       Messages longer than SCYTALE_RESULT_CACHE_MAX_LENGTH aren't stored.
+SCYTALE_RESULT_CACHE = env.bool("SCYTALE_RESULT_CACHE", default=True)
+
+SCYTALE_RESULT_CACHE_MAX_LENGTH = env.int(
+    "SCYTALE_RESULT_CACHE_MAX_LENGTH", default=64 * 1024
+)
+
+SCYTALE_RESULT_CACHE_LOCAL_ENTRIES = env.int(
+    "SCYTALE_RESULT_CACHE_LOCAL_ENTRIES", default=1024
+)
+
+# NOTE: Messages longer than this are ciphered by a Celery worker and the
+#       request returns a job to poll instead. 0 disables background jobs.
+SCYTALE_ASYNC_MIN_LENGTH = env.int("SCYTALE_ASYNC_MIN_LENGTH", default=0)
+
+# NOTE: Cipher cost budgets, see app/devoff/limits.py. A request costs its
+#       length plus SCYTALE_COST_PER_STEP per Python-level step. Requests over
+#       SCYTALE_COST_MAX get a 413, those over SCYTALE_COST_ASYNC_MIN become
+#       background jobs. 0 disables either.
+SCYTALE_COST_PER_STEP = env.int("SCYTALE_COST_PER_STEP", default=64)
+
+SCYTALE_COST_MAX = env.int("SCYTALE_COST_MAX", default=128 * 1024 * 1024)
+
+SCYTALE_COST_ASYNC_MIN = env.int("SCYTALE_COST_ASYNC_MIN", default=0)
+
+# NOTE: Cipher requests a client may have in flight, counted in the default
+#       cache (per process without REDIS_URL). Slots are freed after
+#       SCYTALE_CLIENT_SLOT_TIMEOUT seconds if a worker dies holding them.
+#       0 disables the limit.
+SCYTALE_CLIENT_CONCURRENCY = env.int("SCYTALE_CLIENT_CONCURRENCY", default=0)
+
+SCYTALE_CLIENT_SLOT_TIMEOUT = env.int("SCYTALE_CLIENT_SLOT_TIMEOUT", default=60)
+
+# NOTE: Throttled requests take a token plus one per
+#       SCYTALE_THROTTLE_BYTES_PER_TOKEN bytes of body. With REDIS_URL a
+#       process admits requests without asking Redis for up to
+#       SCYTALE_THROTTLE_LOCAL_SECONDS after it last did, while the bucket is
+#       at least half full, spending at most SCYTALE_THROTTLE_LOCAL_SHARE of
+#       it. Buckets of at most SCYTALE_THROTTLE_LOCAL_ENTRIES clients are
+#       remembered per process.
+SCYTALE_THROTTLE_BYTES_PER_TOKEN = env.int(
+    "SCYTALE_THROTTLE_BYTES_PER_TOKEN", default=64 * 1024
+)
+
+SCYTALE_THROTTLE_LOCAL_SECONDS = env.float(
+    "SCYTALE_THROTTLE_LOCAL_SECONDS", default=1.0
+)
+
+SCYTALE_THROTTLE_LOCAL_SHARE = env.float("SCYTALE_THROTTLE_LOCAL_SHARE", default=0.1)
+
+SCYTALE_THROTTLE_LOCAL_ENTRIES = env.int(
+    "SCYTALE_THROTTLE_LOCAL_ENTRIES", default=10000
+)
+
+# NOTE: Upper bound for the steps of a pipeline request, see
+#       app/devoff/pipeline.py.
+SCYTALE_PIPELINE_MAX_STEPS = env.int("SCYTALE_PIPELINE_MAX_STEPS", default=32)
+
+# NOTE: The crack endpoint scores every candidate vueltas on its first
+#       SCYTALE_CRACK_SAMPLE_LENGTH characters with the language model at
+#       SCYTALE_CRACK_MODEL, and answers with the best candidates found within
+#       SCYTALE_CRACK_DEADLINE seconds. See app/devoff/crack.py.
+SCYTALE_CRACK_MODEL = env("SCYTALE_CRACK_MODEL", default="app.devoff.language.SPANISH")
+
+SCYTALE_CRACK_SAMPLE_LENGTH = env.int("SCYTALE_CRACK_SAMPLE_LENGTH", default=512)
+
+SCYTALE_CRACK_DEADLINE = env.float("SCYTALE_CRACK_DEADLINE", default=5.0)
+
+# NOTE: Responses of at least SCYTALE_COMPRESSION_MIN_LENGTH bytes are
+#       compressed with the first of SCYTALE_COMPRESSION_CODINGS the client
+#       accepts ("zstd" and "br" need the compression extra installed), see
+#       app/devoff/compression.py. Compressed cipher responses up to
+#       SCYTALE_COMPRESSION_CACHE_MAX_LENGTH bytes are cached, in the default
+#       cache when REDIS_URL is set or in a per-process LRU otherwise.
+SCYTALE_COMPRESSION_MIN_LENGTH = env.int("SCYTALE_COMPRESSION_MIN_LENGTH", default=1024)
+
+SCYTALE_COMPRESSION_CODINGS = env.list(
+    "SCYTALE_COMPRESSION_CODINGS", default=["zstd", "br", "gzip"]
+)
+
+SCYTALE_COMPRESSION_LEVELS = {
+    "gzip": env.int("SCYTALE_GZIP_LEVEL", default=6),
+    "br": env.int("SCYTALE_BROTLI_LEVEL", default=4),
+    "zstd": env.int("SCYTALE_ZSTD_LEVEL", default=3),
 }
 
+SCYTALE_COMPRESSION_CACHE_MAX_LENGTH = env.int(
+    "SCYTALE_COMPRESSION_CACHE_MAX_LENGTH", default=8 * 1024 * 1024
+)
+
+SCYTALE_COMPRESSION_CACHE_LOCAL_ENTRIES = env.int(
+    "SCYTALE_COMPRESSION_CACHE_LOCAL_ENTRIES", default=64
+)
+
+# NOTE: Messages longer than SCYTALE_PROCESS_POOL_MIN_LENGTH are ciphered in a
+#       pool of SCYTALE_PROCESS_POOL_SIZE processes, so they don't block the
+#       gevent worker. A size of 0 keeps every message inline.
+SCYTALE_PROCESS_POOL_SIZE = env.int("SCYTALE_PROCESS_POOL_SIZE", default=0)
+
+SCYTALE_PROCESS_POOL_MIN_LENGTH = env.int(
+    "SCYTALE_PROCESS_POOL_MIN_LENGTH", default=256 * 1024
+)
+
+SCYTALE_PROCESS_POOL_START_METHOD = env(
+    "SCYTALE_PROCESS_POOL_START_METHOD", default="forkserver"
+)
+
+# NOTE: Collect request metrics and expose them on /metrics, in the
+#       Prometheus text format, to requests with an
+#       "Authorization: Bearer <SCYTALE_METRICS_TOKEN>" header. /metrics is not
+#       found without a token. Metrics are per process unless
+#       SCYTALE_METRICS_DIR is set, then every worker writes its metrics there
+#       every SCYTALE_METRICS_WRITE_SECONDS and /metrics adds them all up.
+#       See app/devoff/metrics.py.
+SCYTALE_METRICS = env.bool("SCYTALE_METRICS", default=True)
+
+SCYTALE_METRICS_TOKEN = env("SCYTALE_METRICS_TOKEN", default="")
+
+SCYTALE_METRICS_DIR = env("SCYTALE_METRICS_DIR", default="")
+
+SCYTALE_METRICS_WRITE_SECONDS = env.float("SCYTALE_METRICS_WRITE_SECONDS", default=5.0)
+
+# NOTE: Profile SCYTALE_PROFILE_RATE (0 to 1) of the requests, and those with
+#       an "X-Scytale-Profile: <SCYTALE_PROFILE_TOKEN>" header, keeping the
+#       newest SCYTALE_PROFILE_KEEP in SCYTALE_PROFILE_DIR.
+#       See app/devoff/profiling.py and `manage.py profiles`.
+SCYTALE_PROFILE_RATE = env.float("SCYTALE_PROFILE_RATE", default=0.0)
+
+SCYTALE_PROFILE_TOKEN = env("SCYTALE_PROFILE_TOKEN", default="")
+
+SCYTALE_PROFILE_DIR = env("SCYTALE_PROFILE_DIR", default=PROJECT_PATH("profiles"))
+
+SCYTALE_PROFILE_KEEP = env.int("SCYTALE_PROFILE_KEEP", default=50)
+
 # Google
 # =====================================
 
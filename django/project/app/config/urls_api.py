@@ -0,0 +1,10 @@
+"""
+URLs of the cipher API, see app/config/settings/api.py.
+
+Same routes as the Dev Off part of app/config/urls.py, without the admin,
+i18n views or language prefixes.
+"""
+
+from django.urls import include, path
+
+urlpatterns = [path("", include("app.devoff.urls", namespace="devoff"))]
@@ -24,6 +24,18 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.config.settings.local")
 
 application = get_wsgi_application()
 
+from django.conf import settings  # noqa: E402 isort:skip
+
+from app.devoff import executors, metrics  # noqa: E402 isort:skip
+
+# Start the cipher process pool, if enabled, in every worker.
+executors.prefork()
+
+# Share the metrics of every worker, if enabled.
+metrics.share()
+
 # Apply WSGI middleware here.
-# from helloworld.wsgi import HelloWorldApplication
-# application = HelloWorldApplication(application)
+if settings.SCYTALE_FAST_PATH:
+    from app.devoff.fastpath import FastPathApplication
+
+    application = FastPathApplication(application)
@@ -0,0 +1,210 @@
+"""
+ASGI application for the cipher endpoints.
+
+``POST /encrypt`` and ``POST /decrypt`` with a JSON body are served by a
+coroutine, with the same parsing, validation and rendering as the WSGI fast
+path. Bodies larger than ``SCYTALE_ASGI_INLINE_MAX_LENGTH`` bytes are handled
+in a thread so the event loop keeps serving other requests meanwhile; the
+largest messages still go to the process pool (see ``app.devoff.executors``).
+So is every request that may wait on the network: with ``REDIS_URL``, for the
+result cache, or with jobs enabled (see ``app.devoff.tasks``). Requests are
+throttled and hold a slot of their client (see ``app.devoff.limits``) like on
+the WSGI fast path, both in a thread as they may wait on Redis. Every other
+request is handed to the wrapped ASGI application, usually Django's WSGI
+application wrapped by ``ThreadPoolWsgiToAsgi``.
+"""
+
+import asyncio
+import time
+from typing import Callable
+
+from django.conf import settings
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from rest_framework.exceptions import APIException
+
+from app.devoff import executors, fastpath, limits, metrics, parsers, tasks, throttling
+
+# NOTE: The headers the throttles and limits read, by their META key.
+META_HEADERS = {
+    b"authorization": "HTTP_AUTHORIZATION",
+    b"content-length": "CONTENT_LENGTH",
+    b"x-forwarded-for": "HTTP_X_FORWARDED_FOR",
+}
+
+
+def request_meta(scope: dict) -> dict:
+    """Return the part of a request's WSGI environ the throttles and limits read."""
+    client = scope.get("client")
+    meta = {"REMOTE_ADDR": client[0] if client else ""}
+    for name, value in scope["headers"]:
+        key = META_HEADERS.get(name.lower())
+        if key is not None:
+            meta[key] = value.decode("latin-1")
+    return meta
+
+
+def handle(meta: dict, direction: str, body: bytes, charset: str):
+    """``fastpath.handle`` holding a slot of the request's client."""
+    try:
+        with limits.slot(limits.client(meta)):
+            return fastpath.handle(direction, body, charset)
+    except APIException as exc:
+        return fastpath.render_error(exc)
+
+
+class ThreadPoolWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """A request to ``ThreadPoolWsgiToAsgi``."""
+
+    @sync_to_async(thread_sensitive=False)
+    def run_wsgi_app(self, body):
+        environ = self.build_environ(self.scope, body)
+        response = self.wsgi_application(environ, self.start_response)
+        try:
+            for output in response:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                self.sync_send(
+                    {"type": "http.response.body", "body": output, "more_body": True}
+                )
+        finally:
+            # NOTE: Ends Django's request and releases what the response holds,
+            #       like the client slot of a stream.
+            if hasattr(response, "close"):
+                response.close()
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({"type": "http.response.body"})
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """
+    asgiref's ``WsgiToAsgi``, running requests in the event loop's thread pool.
+
+    asgiref 3.4 runs every request in the same thread, one at a time, and
+    doesn't close WSGI responses.
+    """
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        await ThreadPoolWsgiToAsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+class LifespanApplication:
+    """
+    ASGI application starting the cipher process pool and sharing the metrics
+    of every worker, handing every request to the wrapped application.
+    """
+
+    def __init__(self, application: Callable):
+        self.application = application
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+
+        await self.application(scope, receive, send)
+
+    async def lifespan(self, receive: Callable, send: Callable) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Start the cipher process pool, if enabled, in every worker.
+                await loop.run_in_executor(None, executors.prefork)
+                # Share the metrics of every worker, if enabled.
+                metrics.share()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                executors.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+class CipherApplication(LifespanApplication):
+    """ASGI application serving the cipher routes before Django."""
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+
+        if scope["type"] == "http" and scope["method"] == "POST":
+            direction = fastpath.ROUTES.get(scope["path"])
+            headers = dict(scope["headers"])
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            charset = fastpath.json_charset(content_type)
+            if direction is not None and charset is not None:
+                await self.cipher(scope, direction, charset, receive, send)
+                return
+
+        await self.application(scope, receive, send)
+
+    async def cipher(
+        self,
+        scope: dict,
+        direction: str,
+        charset: str,
+        receive: Callable,
+        send: Callable,
+    ) -> None:
+        start = time.perf_counter()
+        loop = asyncio.get_event_loop()
+        chunks = []
+        size = 0
+        more_body = True
+        error = None
+        meta = request_meta(scope)
+        try:
+            await loop.run_in_executor(None, throttling.check, direction, meta)
+        except APIException as exc:
+            error = exc
+        while more_body and error is None:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more_body = message.get("more_body", False)
+            try:
+                if size > settings.SCYTALE_MAX_BODY_SIZE:
+                    raise parsers.PayloadTooLarge()
+                limits.check_body(size)
+            except APIException as exc:
+                error = exc
+
+        if error is not None:
+            status_line, headers, content = fastpath.render_error(error)
+        elif (
+            size > settings.SCYTALE_ASGI_INLINE_MAX_LENGTH
+            or settings.SCYTALE_CLIENT_CONCURRENCY
+            or settings.REDIS_URL
+            or tasks.offloading()
+        ):
+            status_line, headers, content = await loop.run_in_executor(
+                None, handle, meta, direction, b"".join(chunks), charset
+            )
+        else:
+            status_line, headers, content = fastpath.handle(
+                direction, b"".join(chunks), charset
+            )
+
+        status_code = status_line.split(" ", 1)[0]
+        if settings.SCYTALE_METRICS:
+            # NOTE: The URL names of the regular views match the directions.
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, direction)
+            metrics.REQUESTS.inc(direction, status_code)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": int(status_code),
+                "headers": [
+                    (name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in headers
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": content})
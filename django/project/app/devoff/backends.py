@@ -0,0 +1,157 @@
+"""
+Cipher backends.
+
+Every backend maps a direction (``scytale.ENCRYPT``/``DECRYPT``) to a function
+with the ``(mensaje, vueltas) -> str`` signature of the reference cipher.
+
+- ``reference``: ``str`` slicing, see ``app.devoff.scytale``.
+- ``buffer``: encodes the message to a fixed-width buffer (Latin-1 when
+  possible, UTF-32 otherwise) and moves code points with strided
+  ``memoryview`` copies. Standard library only.
+- ``numpy``: same buffers as ``buffer``, transposed with NumPy. Only available
+  when NumPy is installed.
+
+The backend is picked with the ``SCYTALE_BACKEND`` setting.
+"""
+
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from app.devoff import permutations, scytale
+from app.devoff.scytale import DECRYPT, ENCRYPT, column_start, grid
+
+log = logging.getLogger(__name__)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+Ciphers = Dict[str, Callable[[str, int], str]]
+
+# NOTE: "surrogatepass" keeps lone surrogates, which JSON strings may carry.
+ERRORS = "surrogatepass"
+
+
+def encode(mensaje: str) -> Tuple[bytearray, str, str]:
+    """Return a fixed-width buffer for ``mensaje``, its codec and item format."""
+    try:
+        return bytearray(mensaje.encode("latin-1")), "latin-1", "B"
+    except UnicodeEncodeError:
+        return bytearray(mensaje.encode("utf-32-le", ERRORS)), "utf-32-le", "I"
+
+
+def _transpose(source: memoryview, target: memoryview, vueltas: int, direction: str):
+    rows, full = grid(len(source), vueltas)
+    # Ciphertext and plaintext grids are the same, only the layout in memory
+    # changes. Copy along the shorter side of the grid.
+    if direction == ENCRYPT:
+        plain, cipher = source, target
+    else:
+        plain, cipher = target, source
+    if vueltas <= rows:
+        for column in range(vueltas):
+            start = column_start(column, rows, full)
+            end = start + rows - (column >= full)
+            if direction == ENCRYPT:
+                cipher[start:end] = plain[column::vueltas]
+            else:
+                plain[column::vueltas] = cipher[start:end]
+    else:
+        for row in range(rows):
+            start = row * vueltas
+            pieces = [(slice(start, start + full), slice(row, full * rows, rows))]
+            if row < rows - 1:
+                pieces.append(
+                    (
+                        slice(start + full, start + vueltas),
+                        slice(full * rows + row, None, rows - 1),
+                    )
+                )
+            for plain_slice, cipher_slice in pieces:
+                if direction == ENCRYPT:
+                    cipher[cipher_slice] = plain[plain_slice]
+                else:
+                    plain[plain_slice] = cipher[cipher_slice]
+
+
+def _buffer_cipher(mensaje: str, vueltas: int, direction: str) -> str:
+    data, codec, fmt = encode(mensaje)
+    output = bytearray(len(data))
+    with memoryview(data) as raw, raw.cast(fmt) as source:
+        with memoryview(output) as out, out.cast(fmt) as target:
+            _transpose(source, target, vueltas, direction)
+    return output.decode(codec, ERRORS)
+
+
+def cipher_bytes(data: bytes, vueltas: int, direction: str) -> bytes:
+    """
+    Cipher text in a single-byte encoding, e.g. ASCII, without decoding it.
+
+    Every byte is a character, so the message is moved as is into a
+    preallocated buffer.
+    """
+    output = bytearray(len(data))
+    with memoryview(data) as source, memoryview(output) as target:
+        _transpose(source, target, vueltas, direction)
+    return bytes(output)
+
+
+def _numpy_cipher(mensaje: str, vueltas: int, direction: str) -> str:
+    length = len(mensaje)
+    rows, full = grid(length, vueltas)
+    data, codec, fmt = encode(mensaje)
+    source = numpy.frombuffer(data, dtype=numpy.uint8 if fmt == "B" else "<u4")
+    if full == vueltas:
+        # Full grid: a plain reshape and transpose.
+        shape = (rows, vueltas) if direction == ENCRYPT else (vueltas, rows)
+        output = source.reshape(shape).T.ravel()
+    else:
+        table = permutations.permutation(direction, length, vueltas)
+        output = source.take(numpy.frombuffer(table, dtype=numpy.uint32))
+    return output.tobytes().decode(codec, ERRORS)
+
+
+BACKENDS: Dict[str, Ciphers] = {
+    "reference": scytale.CIPHERS,
+    "buffer": {
+        ENCRYPT: lambda mensaje, vueltas: _buffer_cipher(mensaje, vueltas, ENCRYPT),
+        DECRYPT: lambda mensaje, vueltas: _buffer_cipher(mensaje, vueltas, DECRYPT),
+    },
+}
+
+if numpy is not None:
+    BACKENDS["numpy"] = {
+        ENCRYPT: lambda mensaje, vueltas: _numpy_cipher(mensaje, vueltas, ENCRYPT),
+        DECRYPT: lambda mensaje, vueltas: _numpy_cipher(mensaje, vueltas, DECRYPT),
+    }
+
+
+_warned = False
+
+
+def name() -> str:
+    """Return the configured backend name, falling back when NumPy is missing."""
+    global _warned
+    backend = settings.SCYTALE_BACKEND
+    if backend == "numpy" and numpy is None:
+        # NOTE: Once per process, this runs on every cipher call.
+        if not _warned:
+            _warned = True
+            log.warning("NumPy is not installed, using the buffer cipher backend.")
+        return "buffer"
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(
+            "Unknown SCYTALE_BACKEND {!r}, expected one of: {}.".format(
+                backend, ", ".join(sorted(set(BACKENDS) | {"numpy"}))
+            )
+        )
+    return backend
+
+
+def ciphers(backend: Optional[str] = None) -> Ciphers:
+    """Return the cipher functions of ``backend``, by default the configured one."""
+    return BACKENDS[backend or name()]
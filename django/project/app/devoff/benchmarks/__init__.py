@@ -0,0 +1,75 @@
+"""
+Benchmark helpers.
+
+Each benchmark module is runnable with ``python -m app.devoff.benchmarks.<name>``
+and writes its results as JSON (``{"meta": {...}, "results": {name: seconds}}``)
+so a run can be compared against a stored baseline.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def timed(func: Callable[[], object], repeat: int = 5, number: int = 1) -> float:
+    """Return the best time, in seconds, of a single call to ``func``."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def meta() -> dict:
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def dump(path: str, results: Dict[str, float]) -> None:
+    with open(path, "w") as file:
+        json.dump({"meta": meta(), "results": results}, file, indent=2, sort_keys=True)
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> List[Tuple[str, float, float, float]]:
+    """
+    Return the benchmarks slower than ``baseline`` by more than ``threshold`` %.
+
+    Each entry is ``(name, baseline, current, change %)``. Benchmarks missing
+    from either side are ignored.
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        change = (current - previous) / previous * 100
+        if change > threshold:
+            regressions.append((name, previous, current, change))
+    return regressions
+
+
+def report(results: Dict[str, float], baseline: Dict[str, float]) -> None:
+    for name, current in sorted(results.items()):
+        line = "{:<60} {:>12.6f}s".format(name, current)
+        previous = baseline.get(name)
+        if previous:
+            line += " {:>+8.1f}%".format((current - previous) / previous * 100)
+        print(line)
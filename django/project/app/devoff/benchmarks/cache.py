@@ -0,0 +1,115 @@
+"""
+Cache backend benchmark.
+
+Times serializing and deserializing typical cached values, a cipher result,
+a list of header names and a rendered response, with django-redis-cache's
+pickle serializer against ``app.devoff.cache.Serializer``, and the compressor
+at each threshold. With ``REDIS_URL`` set, also times cache hits of the
+default cache with its local tier against Redis alone.
+
+Usage:
+    REDIS_URL=redis://localhost:6379/1 python -m app.devoff.benchmarks.cache
+"""
+
+import argparse
+import sys
+from typing import Dict, List
+
+from app.devoff import benchmarks
+from app.devoff.benchmarks.cipher import message
+
+SIZES = [100, 10 * 1000, 1000 * 1000]
+
+MIN_LENGTHS = [1024, 16 * 1024, 1024 * 1024]
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=1000)
+    parser.add_argument("--output", default="cache-benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.http import HttpResponse
+    from redis_cache.serializers import PickleSerializer
+
+    from app.devoff import cache
+
+    values = {"headers": ["Accept-Encoding", "Accept-Language", "Cookie"]}
+    for size in SIZES:
+        values["result/n={}".format(size)] = message("ascii", size)
+        values["response/n={}".format(size)] = HttpResponse(message("ascii", size))
+
+    results: Dict[str, float] = {}
+    serializers = {"pickle": PickleSerializer(), "devoff": cache.Serializer()}
+    for name, value in values.items():
+        line = "{:<18}".format(name)
+        for serializer_name, serializer in serializers.items():
+            data = serializer.serialize(value)
+            timings = {
+                "serialize": benchmarks.timed(
+                    lambda: serializer.serialize(value), args.repeat, args.number
+                ),
+                "deserialize": benchmarks.timed(
+                    lambda: serializer.deserialize(data), args.repeat, args.number
+                ),
+            }
+            for timing, seconds in timings.items():
+                results[
+                    "cache/{}/{}/{}".format(timing, serializer_name, name)
+                ] = seconds
+                line += "  {}/{}: {:.2f}us".format(
+                    timing, serializer_name, seconds * 1e6
+                )
+        print(line)
+
+    for size in SIZES:
+        data = cache.Serializer().serialize(message("ascii", size))
+        line = "compress n={:<9}".format(size)
+        for min_length in MIN_LENGTHS:
+            compressor = cache.Compressor(min_length=min_length)
+            seconds = benchmarks.timed(
+                lambda: compressor.compress(data), args.repeat, args.number // 10
+            )
+            key = "cache/compress/min={}/n={}".format(min_length, size)
+            results[key] = seconds
+            line += "  min={}: {:.2f}us {:,} B".format(
+                min_length, seconds * 1e6, len(compressor.compress(data))
+            )
+        print(line)
+
+    if settings.REDIS_URL:
+        backend = caches["default"]
+        remote = cache.TwoTierCache(
+            backend.server,
+            {**backend.params, "OPTIONS": {**backend.options, "LOCAL_ENTRIES": 0}},
+        )
+        for size in SIZES:
+            backend.set("benchmark", message("ascii", size))
+            line = "get n={:<9}".format(size)
+            for name, instance in (("remote", remote), ("two-tier", backend)):
+                seconds = benchmarks.timed(
+                    lambda: instance.get("benchmark"), args.repeat, args.number
+                )
+                results["cache/get/{}/n={}".format(name, size)] = seconds
+                line += "  {}: {:.2f}us".format(name, seconds * 1e6)
+            print(line)
+        backend.delete("benchmark")
+        for tier in cache.tiers():
+            print("tier stats: {}".format(tier.stats()))
+
+    benchmarks.dump(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,159 @@
+"""
+Cipher benchmark suite.
+
+Times the Scytale core across message sizes, ``vueltas`` values and alphabets,
+plus the full encrypt/decrypt round trip through the Django test client.
+
+Usage:
+    python -m app.devoff.benchmarks.cipher --threshold 20
+    python -m app.devoff.benchmarks.cipher --update-baseline
+"""
+
+import argparse
+import itertools
+import json
+import math
+import sys
+from typing import Dict, Iterator, List
+
+from app.devoff import benchmarks
+
+ALPHABETS = {"ascii": "Devoff se puso ATR!. ", "unicode": "Ñandú über straße € 日本語 😀"}
+
+SIZES = [10, 1000, 100 * 1000, 1000 * 1000, 10 * 1000 * 1000, 50 * 1000 * 1000]
+
+
+def message(alphabet: str, size: int) -> str:
+    characters = ALPHABETS[alphabet]
+    repeats = -(-size // len(characters))
+    return (characters * repeats)[:size]
+
+
+def vueltas_for(size: int) -> List[int]:
+    """Return the turn counts exercised for a message size, from 1 to len."""
+    candidates = {1, 2, 7, int(math.sqrt(size)), size // 2, size}
+    return sorted(vueltas for vueltas in candidates if 1 <= vueltas <= size)
+
+
+def bench_core(
+    sizes: List[int], repeat: int, backend_names: List[str]
+) -> Iterator[tuple]:
+    from app.devoff import backends, scytale
+
+    for size, alphabet in itertools.product(sizes, ALPHABETS):
+        mensaje = message(alphabet, size)
+        for vueltas in vueltas_for(size):
+            encrypted = scytale.encrypt(mensaje, vueltas)
+            for backend in backend_names:
+                ciphers = backends.ciphers(backend)
+                name = "core/{}/{}/{}/n={}/v={}".format(
+                    backend, "{}", alphabet, size, vueltas
+                )
+                yield name.format("encrypt"), benchmarks.timed(
+                    lambda: ciphers[scytale.ENCRYPT](mensaje, vueltas), repeat
+                )
+                yield name.format("decrypt"), benchmarks.timed(
+                    lambda: ciphers[scytale.DECRYPT](encrypted, vueltas), repeat
+                )
+
+
+def bench_views(sizes: List[int], repeat: int) -> Iterator[tuple]:
+    import django
+    from django.test import Client
+    from django.test.utils import override_settings, setup_test_environment
+    from django.urls import reverse
+
+    django.setup()
+    setup_test_environment()
+    client = Client()
+    vueltas = 7
+    # NOTE: Every body is posted `repeat` times, results must not be cached.
+    with override_settings(SCYTALE_RESULT_CACHE=False):
+        for size, alphabet in itertools.product(sizes, ALPHABETS):
+            for direction in ("encrypt", "decrypt"):
+                body = json.dumps(
+                    {"mensaje": message(alphabet, size), "vueltas": vueltas}
+                )
+                url = reverse("devoff:{}".format(direction))
+
+                def post():
+                    response = client.post(
+                        url, data=body, content_type="application/json"
+                    )
+                    assert response.status_code == 200, response.content[:200]
+
+                name = "view/{}/{}/n={}/v={}".format(direction, alphabet, size, vueltas)
+                yield name, benchmarks.timed(post, repeat)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--max-size", type=int, default=SIZES[-1], help="Largest message, in chars."
+    )
+    parser.add_argument(
+        "--views-max-size",
+        type=int,
+        default=1000 * 1000,
+        help="Largest message sent through the test client.",
+    )
+    parser.add_argument("--no-views", action="store_true")
+    parser.add_argument(
+        "--backends",
+        default="reference",
+        help="Comma separated cipher backends to time, see app.devoff.backends.",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="cipher-benchmark.json")
+    parser.add_argument("--baseline", default=benchmarks.BASELINE_PATH)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=20.0,
+        help="Fail when a benchmark is slower than the baseline by this %%.",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store this run as the new baseline.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    sizes = [size for size in SIZES if size <= args.max_size]
+
+    results: Dict[str, float] = {}
+    suites = [bench_core(sizes, args.repeat, args.backends.split(","))]
+    if not args.no_views:
+        view_sizes = [size for size in sizes if size <= args.views_max_size]
+        suites.append(bench_views(view_sizes, args.repeat))
+    for name, seconds in itertools.chain(*suites):
+        results[name] = seconds
+
+    benchmarks.dump(args.output, results)
+    if args.update_baseline:
+        benchmarks.dump(args.baseline, results)
+        print("Baseline written to {}".format(args.baseline))
+        return 0
+
+    try:
+        baseline = benchmarks.load(args.baseline)["results"]
+    except FileNotFoundError:
+        print("No baseline at {}, run with --update-baseline.".format(args.baseline))
+        baseline = {}
+
+    benchmarks.report(results, baseline)
+    regressions = benchmarks.compare(results, baseline, args.threshold)
+    for name, previous, current, change in regressions:
+        print(
+            "REGRESSION {}: {:.6f}s -> {:.6f}s ({:+.1f}%)".format(
+                name, previous, current, change
+            )
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,106 @@
+"""
+Response compression benchmark.
+
+Compresses rendered ``POST /encrypt`` responses of increasing size with every
+installed coding and a range of levels, and reports the CPU time per response
+byte, uncached and through the compression cache, and the bytes saved.
+
+Usage:
+    python -m app.devoff.benchmarks.compression --max-size 10000000
+"""
+
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List
+
+from app.devoff import benchmarks
+from app.devoff.benchmarks.cipher import ALPHABETS, message
+
+SIZES = [1000, 100 * 1000, 1000 * 1000, 10 * 1000 * 1000]
+
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 11], "zstd": [1, 3, 19]}
+
+VUELTAS = 7
+
+
+def cpu(func: Callable[[], object], repeat: int) -> float:
+    """Return the least CPU time, in seconds, of a call to ``func``."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-size", type=int, default=SIZES[-2])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="compression-benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    import django
+
+    django.setup()
+    from django.test.utils import override_settings
+
+    from app.devoff import compression, scytale
+    from app.devoff.renderers import JSONRenderer
+
+    results: Dict[str, float] = {}
+    for size in [size for size in SIZES if size <= args.max_size]:
+        for alphabet in ALPHABETS:
+            encrypted = scytale.encrypt(message(alphabet, size), VUELTAS)
+            content = JSONRenderer().render({"mensaje": encrypted})
+            for coding in compression.CODERS:
+                for level in LEVELS[coding]:
+                    levels = {coding: level}
+                    with override_settings(
+                        SCYTALE_COMPRESSION_LEVELS=levels,
+                        SCYTALE_COMPRESSION_CACHE_MAX_LENGTH=len(content),
+                    ):
+                        compression._cache = None
+                        compressed = compression.compress(coding, content)
+                        uncached = cpu(
+                            lambda: compression.compress(coding, content), args.repeat
+                        )
+                        compression.compress(coding, content, cache=True)
+                        cached = cpu(
+                            lambda: compression.compress(coding, content, cache=True),
+                            args.repeat,
+                        )
+                    prefix = "compression/{}/l={}/{}/n={}".format(
+                        coding, level, alphabet, size
+                    )
+                    results[prefix + "/cpu_ns_per_byte"] = uncached / len(content) * 1e9
+                    results[prefix + "/cached_ns_per_byte"] = (
+                        cached / len(content) * 1e9
+                    )
+                    results[prefix + "/saved_bytes"] = len(content) - len(compressed)
+                    print(
+                        "{:<7} {:<4} l={:<2} n={:<9} {:>12,} B -> {:>12,} B  "
+                        "{:>8.2f} ns/B  cached {:>8.2f} ns/B".format(
+                            alphabet,
+                            coding,
+                            level,
+                            size,
+                            len(content),
+                            len(compressed),
+                            uncached / len(content) * 1e9,
+                            cached / len(content) * 1e9,
+                        )
+                    )
+    compression._cache = None
+
+    benchmarks.dump(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
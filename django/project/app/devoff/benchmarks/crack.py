@@ -0,0 +1,92 @@
+"""
+Crack benchmark.
+
+Times cracking a ciphertext of unknown ``vueltas`` across message sizes, by
+decrypting and scoring every candidate in full (what clients did one
+``decrypt`` request at a time) and with ``app.devoff.crack``, inline and in
+the process pool.
+
+Usage:
+    python -m app.devoff.benchmarks.crack --max-size 10000 --pool-size 4
+"""
+
+import argparse
+import sys
+from typing import Dict, List
+
+from app.devoff import benchmarks
+
+SIZES = [100, 1000, 10 * 1000, 100 * 1000]
+
+TEXT = (
+    "El veloz murciélago hindú comía feliz cardillo y kiwi. La cigüeña tocaba "
+    "el saxofón detrás del palenque de paja. "
+)
+
+VUELTAS = 7
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-size", type=int, default=SIZES[-2])
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="crack-benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    from app.devoff import crack, executors, scytale
+
+    model = crack.get_model(settings.SCYTALE_CRACK_MODEL)
+
+    def full(mensaje: str) -> int:
+        return max(
+            crack.candidates(len(mensaje)),
+            key=lambda vueltas: model.score(
+                model.normalize(scytale.decrypt(mensaje, vueltas))
+            ),
+        )
+
+    results: Dict[str, float] = {}
+    # NOTE: No deadline, every run searches all candidates.
+    with override_settings(SCYTALE_CRACK_DEADLINE=3600, SCYTALE_COST_MAX=0):
+        for size in [size for size in SIZES if size <= args.max_size]:
+            plain = (TEXT * (size // len(TEXT) + 1))[:size]
+            mensaje = scytale.encrypt(plain, VUELTAS)
+            timings = {"full": benchmarks.timed(lambda: full(mensaje), args.repeat)}
+            with override_settings(SCYTALE_PROCESS_POOL_SIZE=0):
+                timings["inline"] = benchmarks.timed(
+                    lambda: crack.crack(mensaje, 5), args.repeat
+                )
+            with override_settings(
+                SCYTALE_PROCESS_POOL_SIZE=args.pool_size,
+                SCYTALE_PROCESS_POOL_MIN_LENGTH=0,
+            ):
+                executors.prefork()
+                try:
+                    timings["pool"] = benchmarks.timed(
+                        lambda: crack.crack(mensaje, 5), args.repeat
+                    )
+                finally:
+                    executors.shutdown()
+            line = "n={:<8}".format(size)
+            for name, seconds in timings.items():
+                results["crack/{}/n={}".format(name, size)] = seconds
+                line += "  {}: {:>10.4f}s".format(name, seconds)
+            print(line)
+
+    benchmarks.dump(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+"""
+WSGI fast path benchmark.
+
+Drives the Django WSGI application in-process, with and without
+``FastPathApplication`` in front of it, and reports requests/sec on the cipher
+routes. No server or network is involved, so the difference is the cost of the
+middleware stack and DRF.
+
+Usage:
+    python -m app.devoff.benchmarks.fastpath --requests 2000
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+from typing import Callable, Dict, List
+
+from app.devoff import benchmarks
+from app.devoff.benchmarks.cipher import message
+
+SIZES = [18, 1000, 100 * 1000]
+
+
+def environ_for(path: str, body: bytes) -> dict:
+    return {
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": path,
+        "SCRIPT_NAME": "",
+        "QUERY_STRING": "",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "HTTP_HOST": "testserver",
+        "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": False,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+
+
+def seconds_per_request(
+    application: Callable, path: str, body: bytes, requests: int
+) -> float:
+    def start_response(status, headers):
+        assert status.startswith("200"), status
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = application(environ_for(path, body), start_response)
+        b"".join(response)
+        if hasattr(response, "close"):
+            response.close()
+    return (time.perf_counter() - start) / requests
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--output", default="fastpath-benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    from django.core.wsgi import get_wsgi_application
+    from django.test.utils import setup_test_environment
+
+    from app.devoff.fastpath import FastPathApplication
+
+    django_application = get_wsgi_application()
+    setup_test_environment()
+    applications = {
+        "django": django_application,
+        "fastpath": FastPathApplication(django_application),
+    }
+
+    results: Dict[str, float] = {}
+    for size in SIZES:
+        body = json.dumps({"mensaje": message("ascii", size), "vueltas": 7}).encode()
+        requests = max(10, args.requests * SIZES[0] // size)
+        for path in ("/encrypt", "/decrypt"):
+            line = "{:<10} n={:<8}".format(path, size)
+            for name, application in applications.items():
+                seconds = seconds_per_request(application, path, body, requests)
+                results["wsgi/{}{}/n={}".format(name, path, size)] = seconds
+                line += " {:>9}: {:>10.1f} req/s".format(name, 1 / seconds)
+            print(line)
+
+    benchmarks.dump(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,275 @@
+"""
+Load test harness.
+
+Starts a local gunicorn per worker profile (or targets a running server with
+``--target``) and drives the cipher routes from a number of concurrent
+clients, for each concurrency level given. Message sizes are drawn from a
+weighted distribution and routes are picked at random, so every run mixes
+``/encrypt`` and ``/decrypt`` (and their ``/<language>/`` prefixed variants
+with ``--i18n``). Reports requests/sec, p50/p95/p99 latency and the error
+rate per profile, concurrency and route. The started servers run with the
+result cache off, turn it off on a ``--target`` too.
+
+Usage:
+    python -m app.devoff.benchmarks.loadtest \\
+        --profiles gevent,sync --concurrency 1,16,64 --sizes 100:90,100000:10
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from app.devoff import benchmarks
+from app.devoff.benchmarks.cipher import message
+from app.devoff.benchmarks.servers import free_port, percentile
+
+# NOTE: "gevent" matches the Dockerfile's default CMD, the others are
+#       alternatives to compare it against.
+PROFILES = {
+    "gevent": (["app.config.wsgi", "-k", "gevent"], {}),
+    "gevent-fastpath": (
+        ["app.config.wsgi", "-k", "gevent"],
+        {"SCYTALE_FAST_PATH": "True"},
+    ),
+    "sync": (["app.config.wsgi", "-k", "sync"], {}),
+    "gthread": (["app.config.wsgi", "-k", "gthread", "--threads", "8"], {}),
+    "uvicorn": (["app.config.asgi", "-k", "uvicorn.workers.UvicornWorker"], {}),
+    "uvicorn-fastpath": (
+        ["app.config.asgi", "-k", "uvicorn.workers.UvicornWorker"],
+        {"SCYTALE_FAST_PATH": "True"},
+    ),
+}
+
+ROUTES = ("/encrypt", "/decrypt")
+
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+def parse_sizes(value: str) -> Tuple[List[int], List[float]]:
+    """Parse ``size:weight,...`` into sizes and weights, weights default to 1."""
+    sizes, weights = [], []
+    for item in value.split(","):
+        size, _, weight = item.partition(":")
+        sizes.append(int(size))
+        weights.append(float(weight or 1))
+    return sizes, weights
+
+
+def routes_for(languages: List[str]) -> List[str]:
+    """Return the cipher routes, prefixed by each of ``languages`` if any."""
+    if not languages:
+        return list(ROUTES)
+    return [
+        "/{}{}".format(language, route) for language in languages for route in ROUTES
+    ]
+
+
+def start(profile: str, port: int, workers: int) -> subprocess.Popen:
+    argv, profile_env = PROFILES[profile]
+    # NOTE: Only a few distinct bodies are sent, with the result cache on
+    #       most requests would be cache hits.
+    env = dict(os.environ, SCYTALE_RESULT_CACHE="False", **profile_env)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", *argv]
+        + ["--bind", "127.0.0.1:{}".format(port), "--workers", str(workers)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("{} exited with {}".format(profile, process.returncode))
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("{} did not start on port {}".format(profile, port))
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    """Return the rps, latency percentiles and error rate of a run."""
+    total = len(latencies) + errors
+    stats = {
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "error_rate": errors / total if total else 0.0,
+    }
+    for key, fraction in PERCENTILES.items():
+        stats[key] = percentile(latencies, fraction) if latencies else float("nan")
+    return stats
+
+
+def drive(
+    host: str,
+    port: int,
+    routes: List[str],
+    bodies: List[bytes],
+    weights: List[float],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Post random ``bodies`` to random ``routes`` from ``concurrency`` clients.
+
+    Requests answered during the first ``warmup`` seconds aren't recorded.
+    Returns the stats of each route and of all of them (``"all"``).
+    """
+    latencies: Dict[str, List[float]] = {route: [] for route in routes}
+    errors = dict.fromkeys(routes, 0)
+    lock = threading.Lock()
+    record_from = time.monotonic() + warmup
+    stop = record_from + duration
+
+    def client():
+        connection = http.client.HTTPConnection(host, port, timeout=60)
+        headers = {"Content-Type": "application/json", "Host": "localhost"}
+        while time.monotonic() < stop:
+            route = random.choice(routes)
+            body = random.choices(bodies, weights)[0]
+            start = time.perf_counter()
+            try:
+                connection.request("POST", route, body, headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            elapsed = time.perf_counter() - start
+            if time.monotonic() < record_from:
+                continue
+            with lock:
+                if ok:
+                    latencies[route].append(elapsed)
+                else:
+                    errors[route] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = {
+        route: summarize(latencies[route], errors[route], duration) for route in routes
+    }
+    stats["all"] = summarize(
+        [value for values in latencies.values() for value in values],
+        sum(errors.values()),
+        duration,
+    )
+    return stats
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--profiles",
+        default="gevent",
+        help="Comma separated worker profiles: {}.".format(", ".join(PROFILES)),
+    )
+    parser.add_argument(
+        "--target",
+        help="HOST:PORT of a running server to drive instead of starting one.",
+    )
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument(
+        "--concurrency", default="1,16,64", help="Comma separated client counts."
+    )
+    parser.add_argument(
+        "--sizes",
+        default="100:90,10000:9,1000000:1",
+        help="Message size distribution, as comma separated CHARS:WEIGHT.",
+    )
+    parser.add_argument("--vueltas", type=int, default=7)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument(
+        "--i18n",
+        action="store_true",
+        help="Drive the /<language>/ prefixed routes (PREFIX_DEFAULT_LANGUAGE).",
+    )
+    parser.add_argument("--output", default="loadtest-benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    sizes, weights = parse_sizes(args.sizes)
+    bodies = [
+        json.dumps(
+            {"mensaje": message("unicode", size), "vueltas": args.vueltas}
+        ).encode()
+        for size in sizes
+    ]
+    languages = []
+    if args.i18n:
+        # NOTE: The default language is only prefixed when asked to, the
+        #       started servers inherit the environment.
+        os.environ["PREFIX_DEFAULT_LANGUAGE"] = "True"
+        from django.conf import settings
+
+        languages = [code for code, _ in settings.LANGUAGES]
+    routes = routes_for(languages)
+
+    results: Dict[str, float] = {}
+    profiles = ["target"] if args.target else args.profiles.split(",")
+    for profile in profiles:
+        if args.target:
+            host, _, port = args.target.rpartition(":")
+            process = None
+        else:
+            host, port = "127.0.0.1", free_port()
+            process = start(profile, port, args.workers)
+        try:
+            for concurrency in map(int, args.concurrency.split(",")):
+                stats = drive(
+                    host,
+                    int(port),
+                    routes,
+                    bodies,
+                    weights,
+                    concurrency,
+                    args.duration,
+                    args.warmup,
+                )
+                for route, route_stats in stats.items():
+                    for key, value in route_stats.items():
+                        name = "loadtest/{}/c{}/{}/{}".format(
+                            profile, concurrency, route.lstrip("/"), key
+                        )
+                        results[name] = value
+                print(
+                    "{:<16} c{:<4} {:>9.1f} req/s  p50 {:>8.4f}s  p95 {:>8.4f}s  "
+                    "p99 {:>8.4f}s  errors {:>6.2%}".format(
+                        profile,
+                        concurrency,
+                        stats["all"]["rps"],
+                        stats["all"]["p50"],
+                        stats["all"]["p95"],
+                        stats["all"]["p99"],
+                        stats["all"]["error_rate"],
+                    )
+                )
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    benchmarks.dump(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+"""
+Request memory benchmark.
+
+Serves JSON ``POST /encrypt`` requests through the WSGI handler with the view
+parsing them through DRF's ``JSONParser`` and through ``StreamingJSONParser``,
+and reports the peak memory allocated, as traced by ``tracemalloc``, while
+parsing the body and while serving the whole request. The body is read like
+off a socket: every read returns new bytes.
+
+Usage:
+    python -m app.devoff.benchmarks.memory --max-size 10000000
+"""
+
+import argparse
+import io
+import json
+import sys
+import tracemalloc
+from typing import Callable, Dict, List
+
+from app.devoff import benchmarks
+from app.devoff.benchmarks.cipher import ALPHABETS, message
+
+SIZES = [100 * 1000, 1000 * 1000, 10 * 1000 * 1000, 100 * 1000 * 1000]
+
+VUELTAS = 7
+
+
+class Socket(io.BytesIO):
+    """A request body handing out a copy of the data on every read."""
+
+    def read(self, size=-1):
+        return bytes(memoryview(super().read(size)))
+
+
+def peak(func: Callable[[], object]) -> int:
+    """Return the peak bytes allocated while calling ``func``."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-size", type=int, default=SIZES[-2])
+    parser.add_argument("--output", default="memory-benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.test.utils import override_settings
+    from rest_framework.parsers import JSONParser
+
+    from app.devoff import parsers, views
+
+    application = get_wsgi_application()
+    host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost"
+
+    def serve(body: bytes) -> int:
+        environ = {
+            "REQUEST_METHOD": "POST",
+            "PATH_INFO": "/encrypt",
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "HTTP_HOST": host,
+            "SERVER_NAME": host,
+            "SERVER_PORT": "80",
+            "wsgi.url_scheme": "http",
+            "wsgi.input": Socket(body),
+            "wsgi.errors": sys.stderr,
+        }
+        statuses = []
+        content = application(environ, lambda status, _: statuses.append(status))
+        b"".join(content)
+        assert statuses[0].startswith("200"), statuses
+
+    results: Dict[str, float] = {}
+    candidates = {"drf": JSONParser, "streaming": parsers.StreamingJSONParser}
+    # NOTE: Offloading or the limits would skip the work being measured.
+    with override_settings(
+        SCYTALE_ASYNC_MIN_LENGTH=0, SCYTALE_MAX_BODY_SIZE=2 ** 40, SCYTALE_COST_MAX=0
+    ):
+        for size in [size for size in SIZES if size <= args.max_size]:
+            for alphabet in ALPHABETS:
+                body = json.dumps(
+                    {"mensaje": message(alphabet, size), "vueltas": VUELTAS}
+                ).encode()
+                line = "{:<8} n={:<10} body {:>12,} B".format(alphabet, size, len(body))
+                for name, parser_class in candidates.items():
+                    views.encrypt.cls.parser_classes = [parser_class]
+                    parser = parser_class()
+                    parse = peak(
+                        lambda: parser.parse(
+                            Socket(body), parser_context={"encoding": "utf-8"}
+                        )
+                    )
+                    serve(body)  # Warm up.
+                    request = peak(lambda: serve(body))
+                    prefix = "memory/{}/{}/n={}".format(name, alphabet, size)
+                    results[prefix + "/parse"] = parse
+                    results[prefix + "/request"] = request
+                    line += "  {}: parse {:>12,} B request {:>12,} B".format(
+                        name, parse, request
+                    )
+                print(line)
+
+    benchmarks.dump(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,98 @@
+"""
+Pipeline benchmark.
+
+Times multi-step pipelines across message sizes and step counts, applying the
+steps one by one with each backend against ``app.devoff.pipeline``, whose
+``numpy`` backend runs them as one gather over a cached composed table. The
+time to compose the table on a cache miss is reported too.
+
+Usage:
+    python -m app.devoff.benchmarks.pipeline --max-size 10000000
+"""
+
+import argparse
+import sys
+from typing import Dict, List
+
+from app.devoff import benchmarks
+from app.devoff.benchmarks.cipher import ALPHABETS, message
+
+SIZES = [1000, 100 * 1000, 1000 * 1000, 10 * 1000 * 1000]
+
+VUELTAS = [7, 13, 101, 3, 1001, 29, 5, 211]
+
+STEPS = [2, 4, 8]
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-size", type=int, default=SIZES[-2])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="pipeline-benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    import django
+
+    django.setup()
+    from django.test.utils import override_settings
+
+    from app.devoff import backends, permutations, pipeline
+    from app.devoff.scytale import DECRYPT, ENCRYPT
+
+    results: Dict[str, float] = {}
+    # NOTE: Results are not cached, every run does the work being measured.
+    with override_settings(SCYTALE_RESULT_CACHE=False, SCYTALE_PROCESS_POOL_SIZE=0):
+        for size in [size for size in SIZES if size <= args.max_size]:
+            for alphabet in ALPHABETS:
+                mensaje = message(alphabet, size)
+                for count in STEPS:
+                    steps = [
+                        (ENCRYPT if index % 3 else DECRYPT, vueltas)
+                        for index, vueltas in enumerate(VUELTAS[:count])
+                    ]
+                    line = "{:<8} n={:<9} steps={}".format(alphabet, size, count)
+                    for backend in backends.BACKENDS:
+                        ciphers = backends.ciphers(backend)
+
+                        def sequential():
+                            output = mensaje
+                            for direction, vueltas in steps:
+                                output = ciphers[direction](output, vueltas)
+                            return output
+
+                        with override_settings(SCYTALE_BACKEND=backend):
+                            timings = {
+                                "sequential": benchmarks.timed(sequential, args.repeat),
+                                "pipeline": benchmarks.timed(
+                                    lambda: pipeline.run(mensaje, steps), args.repeat
+                                ),
+                            }
+                        for name, seconds in timings.items():
+                            key = "pipeline/{}/{}/{}/n={}/steps={}".format(
+                                name, backend, alphabet, size, count
+                            )
+                            results[key] = seconds
+                            line += "  {}/{}: {:.4f}s".format(name, backend, seconds)
+                    if backends.numpy is not None:
+                        simplified = pipeline.simplify(steps, size)
+                        compose = benchmarks.timed(
+                            lambda: pipeline._compose(size, simplified), args.repeat
+                        )
+                        key = "pipeline/compose/{}/n={}/steps={}".format(
+                            alphabet, size, count
+                        )
+                        results[key] = compose
+                        line += "  compose: {:.4f}s".format(compose)
+                    permutations.get_cache().clear()
+                    print(line)
+
+    benchmarks.dump(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,164 @@
+"""
+Server benchmark: gunicorn + gevent (WSGI) against gunicorn + uvicorn (ASGI).
+
+Starts each server on a local port with the same number of workers and
+drives ``POST /encrypt`` with a fixed number of concurrent clients for a
+while. Most requests carry a short message and a few a large one, so a
+blocking cipher shows up as tail latency on the short ones. Reports
+requests/sec and p50/p99 latency per server.
+
+Usage:
+    python -m app.devoff.benchmarks.servers --concurrency 32 --duration 10
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from app.devoff import benchmarks
+from app.devoff.benchmarks.cipher import message
+
+SERVERS = {
+    "gevent": ["app.config.wsgi", "-k", "gevent"],
+    "uvicorn": ["app.config.asgi", "-k", "uvicorn.workers.UvicornWorker"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start(server: str, port: int, workers: int, fast_path: bool) -> subprocess.Popen:
+    env = os.environ.copy()
+    # NOTE: The fast path serves the cipher routes outside of Django on
+    #       either server.
+    env["SCYTALE_FAST_PATH"] = str(fast_path)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", *SERVERS[server]]
+        + ["--bind", "127.0.0.1:{}".format(port), "--workers", str(workers)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("{} did not start on port {}".format(server, port))
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def drive(port: int, bodies: List[bytes], concurrency: int, duration: float) -> dict:
+    """Post random ``bodies`` from ``concurrency`` clients for ``duration``."""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def client():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        headers = {"Content-Type": "application/json", "Host": "localhost"}
+        while time.monotonic() < stop:
+            body = random.choice(bodies)
+            start = time.perf_counter()
+            try:
+                connection.request("POST", "/encrypt", body, headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.5) if latencies else float("nan"),
+        "p99": percentile(latencies, 0.99) if latencies else float("nan"),
+        "errors": errors[0],
+    }
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--servers", default=",".join(SERVERS))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument(
+        "--large-size", type=int, default=1000 * 1000, help="Chars of large messages."
+    )
+    parser.add_argument(
+        "--large-ratio", type=float, default=0.02, help="Share of large messages."
+    )
+    parser.add_argument(
+        "--no-fast-path",
+        action="store_true",
+        help="Serve the WSGI cipher routes through the Django middleware.",
+    )
+    parser.add_argument("--output", default="servers-benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    small = json.dumps({"mensaje": message("unicode", 100), "vueltas": 7}).encode()
+    large = json.dumps(
+        {"mensaje": message("unicode", args.large_size), "vueltas": 7}
+    ).encode()
+    large_count = max(1, round(100 * args.large_ratio))
+    bodies = [small] * (100 - large_count) + [large] * large_count
+
+    results: Dict[str, float] = {}
+    for server in args.servers.split(","):
+        port = free_port()
+        process = start(server, port, args.workers, not args.no_fast_path)
+        try:
+            stats = drive(port, bodies, args.concurrency, args.duration)
+        finally:
+            process.terminate()
+            process.wait()
+        for key in ("p50", "p99"):
+            results["server/{}/{}".format(server, key)] = stats[key]
+        print(
+            "{:<8} {:>9.1f} req/s  p50 {:>8.4f}s  p99 {:>8.4f}s  errors {}".format(
+                server, stats["rps"], stats["p50"], stats["p99"], stats["errors"]
+            )
+        )
+
+    benchmarks.dump(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
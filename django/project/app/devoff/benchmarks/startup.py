@@ -0,0 +1,134 @@
+"""
+Startup benchmark.
+
+Boots a fresh interpreter per settings module, with ``-X importtime``, up to
+the first ``POST /encrypt`` answered by the WSGI application. Reports the
+wall time to the first response, the time spent in ``django.setup()`` and
+the WSGI handler, the total import time and the slowest top-level imports.
+
+Usage:
+    python -m app.devoff.benchmarks.startup \\
+        --settings app.config.settings.prod,app.config.settings.api
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from app.devoff import benchmarks
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+# NOTE: Runs with `python -c` so nothing is imported before the clock starts.
+CHILD = """
+import io, json, sys, time
+
+start = time.perf_counter()
+import django
+
+django.setup()
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+setup = time.perf_counter() - start
+
+body = json.dumps({"mensaje": "Devoff se puso ATR", "vueltas": 4}).encode()
+environ = {
+    "REQUEST_METHOD": "POST",
+    "PATH_INFO": "/encrypt",
+    "CONTENT_TYPE": "application/json",
+    "CONTENT_LENGTH": str(len(body)),
+    "HTTP_HOST": settings.ALLOWED_HOSTS[0],
+    "SERVER_NAME": settings.ALLOWED_HOSTS[0],
+    "SERVER_PORT": "80",
+    "wsgi.url_scheme": "http",
+    "wsgi.input": io.BytesIO(body),
+    "wsgi.errors": sys.stderr,
+}
+statuses = []
+b"".join(application(environ, lambda status, headers: statuses.append(status)))
+assert statuses[0].startswith("200"), statuses
+print(json.dumps({"setup": setup, "first_response": time.perf_counter() - start - setup}))
+"""
+
+
+def parse_importtime(stderr: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """Return the total import seconds and the top-level imports' cumulative."""
+    total = 0.0
+    top_level = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        own, cumulative, indent, name = match.groups()
+        total += int(own) / 1e6
+        if len(indent) <= 1:
+            top_level.append((int(cumulative) / 1e6, name))
+    return total, sorted(top_level, reverse=True)
+
+
+def measure(settings_module: str) -> dict:
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    wall = time.perf_counter() - start
+    timings = json.loads(process.stdout.strip().splitlines()[-1])
+    imports, top_level = parse_importtime(process.stderr)
+    return {"wall": wall, "imports": imports, "top_level": top_level, **timings}
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--settings",
+        default="app.config.settings.prod,app.config.settings.api",
+        help="Comma separated settings modules to boot.",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", default="startup-benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    results: Dict[str, float] = {}
+    for settings_module in args.settings.split(","):
+        runs = [measure(settings_module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run["wall"])
+        for key in ("wall", "setup", "first_response", "imports"):
+            results["startup/{}/{}".format(settings_module, key)] = best[key]
+        print(
+            "{}: {:.3f}s to first response (setup {:.3f}s, first request {:.3f}s, "
+            "imports {:.3f}s)".format(
+                settings_module,
+                best["wall"],
+                best["setup"],
+                best["first_response"],
+                best["imports"],
+            )
+        )
+        for cumulative, name in best["top_level"][: args.top]:
+            print("    {:>8.3f}s  {}".format(cumulative, name))
+
+    benchmarks.dump(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,111 @@
+"""
+Wire format benchmark.
+
+Sends the same messages to ``/encrypt`` as JSON, msgpack and a raw
+``application/octet-stream`` body, and reports the bytes on the wire (request
+plus response) and the CPU time of a round trip, decoding the response
+included. JSON bodies are built with ``json.dumps`` defaults, so non-ASCII
+text travels as ``\\uXXXX`` escapes like most clients send it.
+
+Usage:
+    python -m app.devoff.benchmarks.wire --max-size 1000000
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from app.devoff import benchmarks
+from app.devoff.benchmarks.cipher import ALPHABETS, message
+
+SIZES = [1000, 100 * 1000, 1000 * 1000, 10 * 1000 * 1000]
+
+VUELTAS = 7
+
+
+def formats() -> Dict[str, Tuple[str, Callable, Callable]]:
+    """Return ``{name: (content type, encode request, decode response)}``."""
+    from app.devoff.parsers import msgpack
+
+    result = {
+        "json": (
+            "application/json",
+            lambda mensaje: json.dumps({"mensaje": mensaje, "vueltas": VUELTAS}),
+            lambda content: json.loads(content)["mensaje"],
+        ),
+        "raw": (
+            "application/octet-stream",
+            lambda mensaje: mensaje.encode("utf-8"),
+            lambda content: content.decode("utf-8"),
+        ),
+    }
+    if msgpack is not None:
+        result["msgpack"] = (
+            "application/msgpack",
+            lambda mensaje: msgpack.packb({"mensaje": mensaje, "vueltas": VUELTAS}),
+            lambda content: msgpack.unpackb(content)["mensaje"],
+        )
+    return result
+
+
+def cpu_seconds(func: Callable[[], object], repeat: int) -> float:
+    """Return the best process time, in seconds, of a single call to ``func``."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-size", type=int, default=SIZES[-2])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="wire-benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    import django
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    client = Client()
+
+    results: Dict[str, float] = {}
+    for size in [size for size in SIZES if size <= args.max_size]:
+        for alphabet in ALPHABETS:
+            mensaje = message(alphabet, size)
+            line = "{:<8} n={:<9}".format(alphabet, size)
+            for name, (content_type, encode, decode) in formats().items():
+                body = encode(mensaje)
+                if isinstance(body, str):
+                    body = body.encode("utf-8")
+                # NOTE: Raw bodies carry no vueltas, it goes in the query string.
+                url = "/encrypt?vueltas={}".format(VUELTAS)
+                response = client.post(url, data=body, content_type=content_type)
+                assert response.status_code == 200, response.content[:200]
+                wire = len(body) + len(response.content)
+
+                def round_trip():
+                    response = client.post(url, data=body, content_type=content_type)
+                    decode(response.content)
+
+                seconds = cpu_seconds(round_trip, args.repeat)
+                results["wire/{}/{}/n={}".format(name, alphabet, size)] = seconds
+                line += " {:>8}: {:>12,} B {:>9.4f}s cpu".format(name, wire, seconds)
+            print(line)
+
+    benchmarks.dump(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,397 @@
+"""
+Two-tier Redis cache backend.
+
+``TwoTierCache`` is django-redis-cache's ``RedisCache`` with a small
+per-process LRU in front of Redis, so repeated reads, like the cache
+middleware looking up the same pages on every GET, don't each take a round
+trip. Values are kept locally as Redis returned them, still serialized, so
+callers never share objects, for ``LOCAL_TIMEOUT`` seconds at most and never
+past their expiry in Redis, read along with them.
+
+Every write also publishes the keys it changed on a Redis pub/sub channel,
+in the same round trip, and each process listens to it in a background
+thread, dropping the keys other processes changed from its LRU. Messages are
+lost while a process reconnects, so the LRU is only read while subscribed,
+is emptied whenever the subscription drops, and its short timeout bounds how
+long a missed invalidation can serve a stale value.
+
+``OPTIONS`` of the cache, besides django-redis-cache's:
+
+- ``LOCAL_ENTRIES``: size of the LRU, ``0`` turns the local tier off.
+- ``LOCAL_TIMEOUT``: seconds a value is kept in the LRU.
+- ``LOCAL_MAX_LENGTH``: longest value, in bytes, kept in the LRU.
+- ``CHANNEL``: pub/sub channel of the invalidations.
+
+``Serializer`` and ``Compressor`` are meant as its ``SERIALIZER_CLASS`` and
+``COMPRESSOR_CLASS``. Both tag values with their first byte and read values
+of django-redis-cache's defaults, pickled and uncompressed, as before.
+"""
+
+import json
+import os
+import pickle
+import threading
+import uuid
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+import redis
+from redis_cache import RedisCache
+from redis_cache.backends.base import get_client
+
+from app.devoff.results import LocalCache
+
+CHANNEL = "devoff:cache:invalidate"
+
+POLL_SECONDS = 1.0
+
+RETRY_SECONDS = 1.0
+
+STR = b"s"
+BYTES = b"b"
+PICKLE = b"p"
+RAW = b"r"
+ZLIB = b"z"
+
+
+class Serializer:
+    """Strings and bytes as they are, pickle for anything else."""
+
+    def __init__(self, pickle_version: int = pickle.HIGHEST_PROTOCOL):
+        self.pickle_version = pickle_version
+
+    def serialize(self, value: Any) -> bytes:
+        # NOTE: Cipher results and compressed responses, most of the values,
+        #       skip pickle's framing. Subclasses, like SafeString, don't.
+        if type(value) is str:
+            return STR + value.encode("utf-8", "surrogatepass")
+        if type(value) is bytes:
+            return BYTES + value
+        return PICKLE + pickle.dumps(value, self.pickle_version)
+
+    def deserialize(self, value: bytes) -> Any:
+        tag = value[:1]
+        if tag == STR:
+            return str(memoryview(value)[1:], "utf-8", "surrogatepass")
+        if tag == BYTES:
+            return value[1:]
+        if tag == PICKLE:
+            return pickle.loads(memoryview(value)[1:])
+        return pickle.loads(value)
+
+
+class Compressor:
+    """zlib for values of at least ``min_length`` bytes, when it saves space."""
+
+    def __init__(self, min_length: int = 16 * 1024, level: int = 1):
+        self.min_length = min_length
+        self.level = level
+
+    def compress(self, value: bytes) -> bytes:
+        if len(value) >= self.min_length:
+            compressed = zlib.compress(value, self.level)
+            if len(compressed) < len(value):
+                return ZLIB + compressed
+        return RAW + value
+
+    def decompress(self, value: bytes) -> bytes:
+        tag = value[:1]
+        if tag == ZLIB:
+            return zlib.decompress(memoryview(value)[1:])
+        if tag == RAW:
+            return value[1:]
+        return value
+
+
+class LocalTier:
+    """Per-process LRU of a Redis cache, kept coherent by invalidations."""
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        channel: str,
+        max_entries: int,
+        timeout: float,
+        max_length: int,
+    ):
+        self.client = client
+        self.channel = channel
+        self.timeout = timeout
+        self.max_length = max_length
+        self.entries = LocalCache(max_entries)
+        self.origin = uuid.uuid4().hex
+        self.pid = os.getpid()
+        self.subscribed = False
+        # NOTE: Bumped on every invalidation, values read from Redis before
+        #       one may be stale and aren't kept.
+        self.generation = 0
+        self.local_hits = 0
+        self.local_misses = 0
+        self.remote_hits = 0
+        self.remote_misses = 0
+        self.invalidations = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._listen, name="devoff-cache-invalidations", daemon=True
+        )
+        self._thread.start()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value of ``key`` in the LRU, if subscribed."""
+        if not self.subscribed:
+            return None
+        value = self.entries.get(key)
+        if value is None:
+            self.local_misses += 1
+        else:
+            self.local_hits += 1
+        return value
+
+    def fetched(
+        self, key: str, value: Optional[bytes], ttl: int, generation: int
+    ) -> None:
+        """
+        Keep ``value``, read from Redis at ``generation``, in the LRU.
+
+        ``ttl`` is the key's PTTL, read along with it: milliseconds left, or a
+        negative number without an expiry.
+        """
+        if value is None:
+            self.remote_misses += 1
+            return
+        self.remote_hits += 1
+        if (
+            self.subscribed
+            and generation == self.generation
+            and len(value) <= self.max_length
+        ):
+            # NOTE: -1 is no expiry, -2 expired since it was read.
+            timeout = self.timeout if ttl == -1 else min(self.timeout, ttl / 1000)
+            self.entries.set(key, value, timeout)
+
+    def invalidate(self, keys: Optional[List[str]]) -> None:
+        """Drop ``keys``, or every key if ``None``, from the LRU."""
+        self.generation += 1
+        if keys is None:
+            self.entries.clear()
+            return
+        for key in keys:
+            self.entries.delete(key)
+
+    def message(self, keys: Optional[List[str]]) -> str:
+        return json.dumps([self.origin, keys])
+
+    def stop(self) -> None:
+        """Unsubscribe and stop the listening thread."""
+        self._stopped.set()
+        self._thread.join()
+
+    def _listen(self) -> None:
+        while not self._stopped.is_set():
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                self.subscribed = True
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=POLL_SECONDS)
+                    if message is None:
+                        continue
+                    origin, keys = json.loads(message["data"])
+                    if origin != self.origin:
+                        self.invalidations += 1
+                        self.invalidate(keys)
+            except redis.RedisError:
+                pass
+            finally:
+                # NOTE: Invalidations may have been missed.
+                self.subscribed = False
+                self.invalidate(None)
+                pubsub.close()
+            self._stopped.wait(RETRY_SECONDS)
+
+    def stats(self) -> dict:
+        local = self.local_hits + self.local_misses
+        remote = self.remote_hits + self.remote_misses
+        return {
+            "local_hits": self.local_hits,
+            "local_misses": self.local_misses,
+            "local_hit_rate": self.local_hits / local if local else 0.0,
+            "remote_hits": self.remote_hits,
+            "remote_misses": self.remote_misses,
+            "remote_hit_rate": self.remote_hits / remote if remote else 0.0,
+            "invalidations": self.invalidations,
+            "subscribed": int(self.subscribed),
+        }
+
+
+_tiers: Dict[Tuple, LocalTier] = {}
+
+_tiers_lock = threading.Lock()
+
+
+def tiers() -> List[LocalTier]:
+    """Return the local tiers of this process."""
+    pid = os.getpid()
+    return [tier for tier in list(_tiers.values()) if tier.pid == pid]
+
+
+class TwoTierCache(RedisCache):
+    """``RedisCache`` with a per-process LRU in front, see the module docstring."""
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self.local_entries = int(self.options.get("LOCAL_ENTRIES", 1024))
+        self.local_timeout = float(self.options.get("LOCAL_TIMEOUT", 5.0))
+        self.local_max_length = int(self.options.get("LOCAL_MAX_LENGTH", 1024 * 1024))
+        self.channel = self.options.get("CHANNEL", CHANNEL)
+
+    @property
+    def tier(self) -> Optional[LocalTier]:
+        """Return the local tier of this process, shared by every instance."""
+        if self.local_entries <= 0:
+            return None
+        # NOTE: Django makes a cache instance per thread and forked children
+        #       inherit no thread, so tiers are per process and server.
+        key = (self.master_client.connection_pool.connection_identifier, self.channel)
+        tier = _tiers.get(key)
+        if tier is None or tier.pid != os.getpid():
+            with _tiers_lock:
+                tier = _tiers.get(key)
+                if tier is None or tier.pid != os.getpid():
+                    tier = _tiers[key] = LocalTier(
+                        self.master_client,
+                        self.channel,
+                        self.local_entries,
+                        self.local_timeout,
+                        self.local_max_length,
+                    )
+        return tier
+
+    def _changed(
+        self, client, keys: Optional[List[str]], command: Callable[[Any], Any]
+    ) -> Any:
+        """Run ``command`` on ``client`` and invalidate ``keys`` everywhere."""
+        tier = self.tier
+        if tier is None:
+            return command(client)
+        pipeline = client.pipeline(transaction=False)
+        command(pipeline)
+        pipeline.publish(self.channel, tier.message(keys))
+        result = pipeline.execute()[0]
+        tier.invalidate(keys)
+        return result
+
+    def _get(self, client, key, default=None):
+        tier = self.tier
+        value = None if tier is None else tier.get(key)
+        if value is None:
+            if tier is None:
+                value = client.get(key)
+            else:
+                generation = tier.generation
+                pipeline = client.pipeline(transaction=False)
+                pipeline.get(key)
+                pipeline.pttl(key)
+                value, ttl = pipeline.execute()
+                tier.fetched(key, value, ttl, generation)
+            if value is None:
+                return default
+        return self.get_value(value)
+
+    def _get_many(self, client, original_keys, versioned_keys):
+        tier = self.tier
+        if tier is None:
+            return super()._get_many(client, original_keys, versioned_keys)
+
+        recovered_data = {}
+        missing = {}
+        for original, key in zip(original_keys, versioned_keys):
+            value = tier.get(key)
+            if value is None:
+                missing[key] = original
+            else:
+                recovered_data[original] = self.get_value(value)
+        if missing:
+            generation = tier.generation
+            pipeline = client.pipeline(transaction=False)
+            pipeline.mget(list(missing))
+            for key in missing:
+                pipeline.pttl(key)
+            values, *ttls = pipeline.execute()
+            for key, value, ttl in zip(missing, values, ttls):
+                tier.fetched(key, value, ttl, generation)
+                if value is not None:
+                    recovered_data[missing[key]] = self.get_value(value)
+        return recovered_data
+
+    def _set(self, client, key, value, timeout, _add_only=False):
+        if timeout is not None and timeout < 0:
+            return False
+        return self._changed(
+            client,
+            [key],
+            lambda pipeline: super(TwoTierCache, self)._set(
+                pipeline, key, value, timeout, _add_only
+            ),
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.get_timeout(timeout)
+        if timeout is not None and timeout < 0:
+            return
+
+        def command(pipeline):
+            for key, value in data.items():
+                value = self.prep_value(value)
+                versioned_key = self.make_key(key, version=version)
+                super(TwoTierCache, self)._set(pipeline, versioned_key, value, timeout)
+
+        keys = self.make_keys(data, version=version)
+        self._changed(self.master_client, keys, command)
+
+    @get_client(write=True)
+    def delete(self, client, key):
+        return self._changed(client, [key], lambda pipeline: pipeline.delete(key))
+
+    def _delete_many(self, client, keys):
+        return self._changed(client, keys, lambda pipeline: pipeline.delete(*keys))
+
+    def _clear(self, client):
+        return self._changed(client, None, lambda pipeline: pipeline.flushdb())
+
+    def _delete_pattern(self, client, pattern):
+        keys = [key.decode() for key in client.scan_iter(match=pattern)]
+        if keys:
+            self._delete_many(client, keys)
+
+    @get_client(write=True)
+    def incr(self, client, key, delta=1):
+        if not client.exists(key):
+            raise ValueError("Key '%s' not found" % key)
+        return self._changed(client, [key], lambda pipeline: pipeline.incr(key, delta))
+
+    def _incr_version(self, client, old, new, original, delta, version):
+        try:
+            self._changed(
+                client, [old, new], lambda pipeline: pipeline.rename(old, new)
+            )
+        except redis.ResponseError:
+            raise ValueError("Key '%s' not found" % original)
+        return version + delta
+
+    @get_client(write=True)
+    def touch(self, client, key, timeout=DEFAULT_TIMEOUT):
+        timeout = self.get_timeout(timeout)
+        if timeout is None:
+            return client.persist(key)
+        return self._changed(
+            client, [key], lambda pipeline: pipeline.expire(key, timeout)
+        )
+
+    @get_client(write=True)
+    def expire(self, client, key, timeout):
+        return self._changed(
+            client, [key], lambda pipeline: pipeline.expire(key, timeout)
+        )
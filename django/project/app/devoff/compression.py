@@ -0,0 +1,152 @@
+"""
+Response compression.
+
+Responses are compressed with the first coding of
+``SCYTALE_COMPRESSION_CODINGS`` the client accepts:
+
+- ``zstd``: Zstandard. Only available when ``zstandard`` is installed.
+- ``br``: Brotli. Only available when ``brotli`` is installed.
+
+Both come with the ``compression`` extra (``poetry install -E compression``),
+installed in the Docker image.
+- ``gzip``: standard library.
+
+Responses shorter than ``SCYTALE_COMPRESSION_MIN_LENGTH`` bytes are sent as
+is, compressing them costs more than it saves. Levels are set per coding in
+``SCYTALE_COMPRESSION_LEVELS``.
+
+Compressed cipher responses are cached, keyed by a hash of the coding, level
+and content, in the result cache's Redis or, without ``REDIS_URL``, in a small
+per-process LRU. Hashing is much cheaper than compressing, so repeated large
+responses are only compressed once.
+"""
+
+import hashlib
+import zlib
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from app.devoff.results import LocalCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+KEY_PREFIX = "devoff:compressed:"
+
+
+def _gzip(content: bytes, level: int) -> bytes:
+    # NOTE: Like Django's compress_string(), without a timestamp so the same
+    #       content always compresses to the same bytes.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(content) + compressor.flush()
+
+
+CODERS: Dict[str, Callable[[bytes, int], bytes]] = {"gzip": _gzip}
+
+if brotli is not None:
+    CODERS["br"] = lambda content, level: brotli.compress(content, quality=level)
+
+if zstandard is not None:
+    CODERS["zstd"] = lambda content, level: zstandard.ZstdCompressor(
+        level=level
+    ).compress(content)
+
+
+def accepted(header: str) -> Dict[str, float]:
+    """Return the codings of an ``Accept-Encoding`` header and their q-values."""
+    codings = {}
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def negotiate(header: str) -> Optional[str]:
+    """Return the preferred coding an ``Accept-Encoding`` header allows."""
+    codings = accepted(header)
+    for coding in settings.SCYTALE_COMPRESSION_CODINGS:
+        if coding in CODERS and codings.get(coding, codings.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+class CompressionCache:
+    """Memoizes compressed content and counts hits and misses."""
+
+    def __init__(self, backend, timeout: Optional[int], max_length: int):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_length = max_length
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(coding: str, level: int, content: bytes) -> str:
+        digest = hashlib.sha256("{}:{}:".format(coding, level).encode() + content)
+        return KEY_PREFIX + digest.hexdigest()
+
+    def get_or_compress(self, coding: str, level: int, content: bytes) -> bytes:
+        if len(content) > self.max_length:
+            return CODERS[coding](content, level)
+
+        key = self.key(coding, level, content)
+        compressed = self.backend.get(key)
+        if compressed is not None:
+            self.hits += 1
+            return compressed
+
+        self.misses += 1
+        compressed = CODERS[coding](content, level)
+        self.backend.set(key, compressed, self.timeout)
+        return compressed
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_cache: Optional[CompressionCache] = None
+
+
+def get_cache() -> CompressionCache:
+    """Return the process-wide compression cache built from settings."""
+    global _cache
+    if _cache is None:
+        if settings.REDIS_URL:
+            backend = caches["default"]
+        else:
+            backend = LocalCache(settings.SCYTALE_COMPRESSION_CACHE_LOCAL_ENTRIES)
+        timeout = settings.CACHE_TIMEOUT
+        _cache = CompressionCache(
+            backend,
+            None if timeout is None else int(timeout),
+            settings.SCYTALE_COMPRESSION_CACHE_MAX_LENGTH,
+        )
+    return _cache
+
+
+def compress(coding: str, content: bytes, cache: bool = False) -> bytes:
+    """Compress ``content`` with ``coding``, through the cache if ``cache``."""
+    level = settings.SCYTALE_COMPRESSION_LEVELS[coding]
+    if not cache:
+        return CODERS[coding](content, level)
+    return get_cache().get_or_compress(coding, level, content)
@@ -0,0 +1,158 @@
+"""
+Cracking Scytale ciphertext of unknown ``vueltas``.
+
+Every ``vueltas`` from 2 to ``len - 1`` is a candidate, 1 and ``len`` leave
+the message as is. Candidates are scored by the ``SCYTALE_CRACK_MODEL``
+language model (see ``app.devoff.language``) and only the best ones are
+decrypted in full. Work is shared between candidates:
+
+- The ciphertext is normalized for the model once.
+- Only the first ``SCYTALE_CRACK_SAMPLE_LENGTH`` plaintext characters of a
+  candidate are rebuilt, slicing no more of the ciphertext than that, and
+  scored, so each costs the same whatever the message length and ``vueltas``.
+
+Candidates are scored in chunks, in the process pool of ``app.devoff.executors``
+when it is enabled and the search is large enough. The search stops after
+``SCYTALE_CRACK_DEADLINE`` seconds with the candidates scored so far. Chunks
+already running in the pool finish in the background.
+"""
+
+import functools
+import heapq
+import time
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from app.devoff import executors, results, scytale
+from app.devoff.scytale import column_start, grid
+
+# NOTE: Chunks per pool process, so faster processes pick up more of them.
+CHUNKS_PER_PROCESS = 4
+
+INLINE_CHUNK_SIZE = 64
+
+Scores = List[Tuple[float, int]]
+
+
+@functools.lru_cache(maxsize=None)
+def get_model(path: str):
+    """Return the language model at the dotted ``path``."""
+    return import_string(path)
+
+
+def candidates(length: int) -> range:
+    """Return the ``vueltas`` worth trying on a message of ``length``."""
+    return range(2, length)
+
+
+def cost(length: int, top: int) -> int:
+    """
+    Return the cipher cost units of cracking a message of ``length``, scoring
+    every candidate and decrypting the ``top`` ones in full.
+    """
+    search = candidates(length)
+    sample = min(length, settings.SCYTALE_CRACK_SAMPLE_LENGTH)
+    return length + len(search) * sample + min(top, len(search)) * length
+
+
+def prefix(mensaje: str, vueltas: int, size: int) -> str:
+    """Return the first ``size`` characters of ``scytale.decrypt``."""
+    length = len(mensaje)
+    rows, full = grid(length, vueltas)
+    size = min(size, length)
+    if rows <= vueltas:
+        parts = []
+        left = size
+        for row in range(-(-size // vueltas)):
+            # NOTE: Slices stop at the characters still needed, a row holds
+            #       up to ``vueltas`` of them.
+            count = min(full, left)
+            parts.append(mensaje[row : row + rows * count : rows])
+            left -= count
+            if row < rows - 1:
+                start = full * rows + row
+                count = min(vueltas - full, left)
+                parts.append(mensaje[start : start + (rows - 1) * count : rows - 1])
+                left -= count
+        return "".join(parts)
+
+    output: List[str] = [""] * size
+    for column in range(min(vueltas, size)):
+        start = column_start(column, rows, full)
+        count = len(range(column, size, vueltas))
+        output[column::vueltas] = mensaje[start : start + count]
+    return "".join(output)
+
+
+def _score(model: str, mensaje: str, chunk: range, sample: int) -> Scores:
+    """Score the candidates of ``chunk`` on a normalized message."""
+    score = get_model(model).score
+    return [(score(prefix(mensaje, vueltas, sample)), vueltas) for vueltas in chunk]
+
+
+def _chunks(search: range, size: int) -> List[range]:
+    return [search[start : start + size] for start in range(0, len(search), size)]
+
+
+def _search(mensaje: str, search: range, sample: int, deadline: float):
+    """Return the scores of the candidates searched before the deadline."""
+    model = settings.SCYTALE_CRACK_MODEL
+    scores: Scores = []
+    searched = 0
+    if executors.enabled() and len(search) * sample > (
+        settings.SCYTALE_PROCESS_POOL_MIN_LENGTH
+    ):
+        processes = settings.SCYTALE_PROCESS_POOL_SIZE * CHUNKS_PER_PROCESS
+        chunks = _chunks(search, -(-len(search) // processes))
+        pool = executors.get_pool()
+        try:
+            futures = {
+                pool.submit(_score, model, mensaje, chunk, sample): chunk
+                for chunk in chunks
+            }
+            done, pending = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+            for future in pending:
+                future.cancel()
+            for future in done:
+                scores.extend(future.result())
+                searched += len(futures[future])
+            return scores, searched
+        except BrokenProcessPool:
+            # A pool process died, start over next time and search inline now.
+            executors.shutdown()
+            scores, searched = [], 0
+
+    for chunk in _chunks(search, INLINE_CHUNK_SIZE):
+        if time.monotonic() >= deadline:
+            break
+        scores.extend(_score(model, mensaje, chunk, sample))
+        searched += len(chunk)
+    return scores, searched
+
+
+def crack(mensaje: str, top: int) -> dict:
+    """Return the ``top`` most likely decryptions of ``mensaje``."""
+    deadline = time.monotonic() + settings.SCYTALE_CRACK_DEADLINE
+    search = candidates(len(mensaje))
+    normalized = get_model(settings.SCYTALE_CRACK_MODEL).normalize(mensaje)
+    scores, searched = _search(
+        normalized, search, settings.SCYTALE_CRACK_SAMPLE_LENGTH, deadline
+    )
+    # NOTE: Ties go to the smaller vueltas.
+    best = heapq.nsmallest(top, scores, key=lambda item: (-item[0], item[1]))
+    return {
+        "candidates": [
+            {
+                "vueltas": vueltas,
+                "mensaje": results.cipher(scytale.DECRYPT, mensaje, vueltas),
+                "score": round(score, 4),
+            }
+            for score, vueltas in best
+        ],
+        "searched": searched,
+        "complete": searched == len(search),
+    }
@@ -0,0 +1,86 @@
+"""
+Process pool for CPU-bound cipher work.
+
+Production runs gunicorn with gevent workers and the cipher never yields, so a
+single large message would stall every greenlet of its worker. Messages longer
+than ``SCYTALE_PROCESS_POOL_MIN_LENGTH`` are ciphered in a pool of
+``SCYTALE_PROCESS_POOL_SIZE`` processes instead, while short ones stay inline.
+"""
+
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from django.conf import settings
+
+from app.devoff import backends
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+_lock = threading.Lock()
+
+
+def _cipher(backend: str, direction: str, mensaje: str, vueltas: int) -> bytes:
+    # NOTE: Results come back as UTF-8 bytes, which pickle as a single copy.
+    function = backends.ciphers(backend)[direction]
+    return function(mensaje, vueltas).encode("utf-8", backends.ERRORS)
+
+
+def enabled() -> bool:
+    return settings.SCYTALE_PROCESS_POOL_SIZE > 0
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            method = settings.SCYTALE_PROCESS_POOL_START_METHOD
+            kwargs = {}
+            if sys.version_info >= (3, 7):
+                kwargs["mp_context"] = multiprocessing.get_context(method)
+            else:
+                # NOTE: Python 3.6 pools only use the default start method.
+                multiprocessing.set_start_method(method, force=True)
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.SCYTALE_PROCESS_POOL_SIZE, **kwargs
+            )
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def prefork() -> None:
+    """Start every process of the pool up front, e.g. at worker boot."""
+    if not enabled():
+        return
+    pool = get_pool()
+    futures = [pool.submit(int) for _ in range(settings.SCYTALE_PROCESS_POOL_SIZE)]
+    for future in futures:
+        future.result()
+
+
+def submit(direction: str, mensaje: str, vueltas: int) -> "Future[bytes]":
+    """Cipher a message in the pool, the future resolves to UTF-8 bytes."""
+    return get_pool().submit(_cipher, backends.name(), direction, mensaje, vueltas)
+
+
+def run(direction: str, mensaje: str, vueltas: int) -> str:
+    """Cipher a message, in the pool when it is large enough."""
+    if not enabled() or len(mensaje) <= settings.SCYTALE_PROCESS_POOL_MIN_LENGTH:
+        return backends.ciphers()[direction](mensaje, vueltas)
+    try:
+        result = submit(direction, mensaje, vueltas).result()
+    except BrokenProcessPool:
+        # A pool process died, start over next time and cipher inline now.
+        shutdown()
+        return backends.ciphers()[direction](mensaje, vueltas)
+    return result.decode("utf-8", backends.ERRORS)
@@ -0,0 +1,156 @@
+"""
+WSGI fast path for the cipher endpoints.
+
+``POST /encrypt`` and ``POST /decrypt`` with a JSON body are stateless, so they
+are served here without the Django middleware stack and DRF's request/response
+cycle. The body is parsed with the views' ``StreamingJSONParser``, validated
+with the same serializers and rendered like DRF's ``JSONRenderer``, so
+responses match the regular views. Every other request is handed to the
+wrapped Django application.
+"""
+
+import io
+import json
+import time
+from http import HTTPStatus
+from typing import Callable, Iterable, List, Tuple
+
+from django.conf import settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from app.devoff import (
+    backends,
+    limits,
+    metrics,
+    parsers,
+    results,
+    scytale,
+    tasks,
+    throttling,
+)
+from app.devoff.serializers import AsciiSerializer, EncryptSerializer
+
+ROUTES = {"/encrypt": scytale.ENCRYPT, "/decrypt": scytale.DECRYPT}
+
+
+def _render(
+    status_code: int, data, *extra: Tuple[str, str]
+) -> Tuple[str, List[Tuple[str, str]], bytes]:
+    content = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    content = content.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+    body = content.encode("utf-8")
+    headers = [
+        ("Content-Type", "application/json"),
+        ("Content-Length", str(len(body))),
+        ("Vary", "Accept"),
+        ("Allow", "POST, OPTIONS"),
+        *extra,
+    ]
+    return "{} {}".format(status_code, HTTPStatus(status_code).phrase), headers, body
+
+
+def handle(direction: str, body: bytes, charset: str):
+    """Return the ``(status, headers, body)`` of a cipher request."""
+    data = {}
+    if body:
+        try:
+            data = parsers.StreamingJSONParser().parse(
+                io.BytesIO(body), parser_context={"encoding": charset}
+            )
+        except LookupError as exc:
+            return _render(
+                status.HTTP_400_BAD_REQUEST,
+                {"detail": "JSON parse error - {}".format(exc)},
+            )
+        except APIException as exc:
+            return render_error(exc)
+
+    if isinstance(data, dict) and isinstance(data.get("mensaje"), bytearray):
+        serializer = AsciiSerializer(data=data)
+    else:
+        serializer = EncryptSerializer(data=data)
+    if not serializer.is_valid():
+        return _render(status.HTTP_422_UNPROCESSABLE_ENTITY, serializer.errors)
+    mensaje = serializer.validated_data["mensaje"]
+    vueltas = serializer.validated_data["vueltas"]
+    try:
+        limits.check(limits.cost(len(mensaje), vueltas))
+    except APIException as exc:
+        return render_error(exc)
+    metrics.MESSAGE_CHARS.observe(len(mensaje), direction)
+    if tasks.offload(mensaje, vueltas):
+        if not isinstance(mensaje, str):
+            mensaje = mensaje.decode("ascii")
+        job = tasks.cipher.delay(direction, mensaje, vueltas)
+        return _render(
+            status.HTTP_202_ACCEPTED,
+            {"job": job.id, "status": job.status},
+            ("Location", reverse("devoff:job", args=[job.id])),
+        )
+    if not isinstance(mensaje, str):
+        # NOTE: Like the views, ASCII messages skip the result cache.
+        result = backends.cipher_bytes(mensaje, vueltas, direction).decode("ascii")
+    else:
+        result = results.cipher(direction, mensaje, vueltas)
+    return _render(status.HTTP_200_OK, {"mensaje": result})
+
+
+def render_error(exc: APIException):
+    """Return the ``(status, headers, body)`` of an API exception."""
+    # Same as DRF's exception handler.
+    extra = []
+    if getattr(exc, "wait", None):
+        extra.append(("Retry-After", "%d" % exc.wait))
+    if not isinstance(exc.detail, (list, dict)):
+        return _render(exc.status_code, {"detail": exc.detail}, *extra)
+    return _render(exc.status_code, exc.detail, *extra)
+
+
+def json_charset(content_type: str):
+    """Return the charset of a JSON content type, or None for anything else."""
+    media_type, _, params = content_type.partition(";")
+    if media_type.strip().lower() != "application/json":
+        return None
+    for param in params.split(";"):
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "charset":
+            return value.strip().strip('"')
+    return "utf-8"
+
+
+class FastPathApplication:
+    """WSGI application serving the cipher routes before Django."""
+
+    def __init__(self, application: Callable):
+        self.application = application
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        direction = ROUTES.get(environ.get("PATH_INFO", ""))
+        charset = json_charset(environ.get("CONTENT_TYPE", ""))
+        if direction is None or charset is None or environ["REQUEST_METHOD"] != "POST":
+            return self.application(environ, start_response)
+
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        start = time.perf_counter()
+        try:
+            if length > settings.SCYTALE_MAX_BODY_SIZE:
+                raise parsers.PayloadTooLarge()
+            limits.check_body(length)
+            throttling.check(direction, environ)
+            with limits.slot(limits.client(environ)):
+                body = environ["wsgi.input"].read(length) if length > 0 else b""
+                status_line, headers, content = handle(direction, body, charset)
+        except APIException as exc:
+            status_line, headers, content = render_error(exc)
+        if settings.SCYTALE_METRICS:
+            # NOTE: The URL names of the regular views match the directions.
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, direction)
+            metrics.REQUESTS.inc(direction, status_line.split(" ", 1)[0])
+        start_response(status_line, headers)
+        return [content]
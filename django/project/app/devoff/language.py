@@ -0,0 +1,84 @@
+"""
+Language models scoring the candidate plaintexts of ``app.devoff.crack``.
+
+A model has two methods:
+
+- ``normalize(text)``: maps every character of a text on its own, e.g. to
+  lower case. Transpositions commute with it, so ``crack`` normalizes the
+  ciphertext once rather than every candidate.
+- ``score(text)``: the likelihood of a normalized text, the higher the more
+  likely. Only compared between texts of the same length.
+
+The model is picked with the ``SCYTALE_CRACK_MODEL`` setting, the dotted path
+of a model instance. This module has no Django dependencies so the process
+pool can load models without setting Django up.
+"""
+
+import math
+import operator
+from itertools import repeat
+from typing import Dict
+
+# NOTE: Case and accents carry no information the bigrams need.
+FOLD = str.maketrans(
+    {
+        "á": "a",
+        "é": "e",
+        "í": "i",
+        "ó": "o",
+        "ú": "u",
+        "ü": "u",
+        "ñ": "n",
+        "\t": " ",
+        "\n": " ",
+        "\r": " ",
+    }
+)
+
+# NOTE: The most common bigrams of Spanish text, folded, most common first.
+#       "_" stands for a space.
+SPANISH_BIGRAMS = """
+e_ a_ _d de s_ o_ _e es _l en el la n_ _p os _c ue l_ er ra ar re on _a nt as
+y_ _s qu _y ta co do r_ or ci an te ad st to al se un ie io _m ro ca ne _q _t
+ri di lo ma po pa _u _n ec em tr me na so ti li ac ic da _r _i _h _f _v _o mo
+in le ni ll ia tu ol am id it si pr mi ce su ha va ba nd ve be ga ua gu is ns
+us sa uo z_ ez za rt rm ja ju je ed ig im cu cc ct ab eb ob oc ut ur ul ei ai
+au eg og ag hi ho hu fu fi fe fa vi vo cr gr br bl pl fl cl d_ t_ ya ye yo
+"""
+
+
+class BigramModel:
+    """
+    Mean log-likelihood of the bigrams of a text.
+
+    ``bigrams`` are ranked most common first and weighted by Zipf's law,
+    bigrams missing from the table get half the weight of the last one.
+    """
+
+    def __init__(self, bigrams: str):
+        ranked = [bigram.replace("_", " ") for bigram in bigrams.split()]
+        self.weights: Dict[str, float] = {}
+        for rank, bigram in enumerate(ranked, 1):
+            self.weights.setdefault(bigram, -math.log(rank))
+        self.floor = -math.log(2 * len(ranked))
+
+    def normalize(self, text: str) -> str:
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # NOTE: A few characters lower to more than one, e.g. "İ". They are
+            #       kept as they are so positions still match the ciphertext.
+            lowered = "".join(
+                lower if len(lower) == 1 else char
+                for char, lower in zip(text, map(str.lower, text))
+            )
+        return lowered.translate(FOLD)
+
+    def score(self, text: str) -> float:
+        if len(text) < 2:
+            return self.floor
+        bigrams = map(operator.add, text, text[1:])
+        total = sum(map(self.weights.get, bigrams, repeat(self.floor)))
+        return total / (len(text) - 1)
+
+
+SPANISH = BigramModel(SPANISH_BIGRAMS)
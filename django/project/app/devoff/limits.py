@@ -0,0 +1,124 @@
+"""
+Cost budgets and per-client concurrency limits of the cipher endpoints.
+
+Ciphering moves every character once, plus a Python-level step per column or
+row along the shorter side of the grid (see ``app.devoff.scytale``), so a
+message of ``length`` characters costs::
+
+    length + SCYTALE_COST_PER_STEP * min(vueltas, ceil(length / vueltas))
+
+Requests costing more than ``SCYTALE_COST_MAX`` are rejected with a 413 and
+those costing more than ``SCYTALE_COST_ASYNC_MIN`` are queued as jobs (see
+``tasks.offload``). The budget is checked before parsing, charging the body a
+character per ``MAX_BYTES_PER_CHARACTER`` bytes, again as soon as ``vueltas``
+is known and, exactly, once the request is validated.
+
+Every client may also have only ``SCYTALE_CLIENT_CONCURRENCY`` requests in
+flight, counted in the default cache, so in Redis and across workers when
+``REDIS_URL`` is set.
+"""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Iterator
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.throttling import BaseThrottle
+
+from app.devoff.scytale import grid
+
+# NOTE: The most bytes a character takes in a body, as the JSON "\uXXXX\uXXXX"
+#       escape of a surrogate pair, like "\ud83d\ude00" for U+1F600.
+MAX_BYTES_PER_CHARACTER = 12
+
+KEY_PREFIX = "devoff:inflight:"
+
+
+class CostExceeded(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Request exceeds the cipher cost budget."
+    default_code = "cost_exceeded"
+
+
+def cost(length: int, vueltas: int) -> int:
+    """Return the cost of ciphering ``length`` characters with ``vueltas``."""
+    rows, _ = grid(length, vueltas)
+    return length + settings.SCYTALE_COST_PER_STEP * min(vueltas, rows)
+
+
+def check(units: int) -> None:
+    """Raise ``CostExceeded`` if ``units`` go over ``SCYTALE_COST_MAX``."""
+    if 0 < settings.SCYTALE_COST_MAX < units:
+        raise CostExceeded()
+
+
+def check_body(content_length, vueltas=None) -> None:
+    """
+    Check the budget of a body of ``content_length`` bytes before parsing it.
+
+    Missing or invalid values are ignored, the serializers report them.
+    """
+    try:
+        length = int(content_length) // MAX_BYTES_PER_CHARACTER
+    except (TypeError, ValueError):
+        return
+    try:
+        vueltas = int(vueltas)
+    except (TypeError, ValueError):
+        vueltas = 0
+    # NOTE: The cost only grows with the length, this is a lower bound.
+    check(cost(length, vueltas) if vueltas > 0 else length)
+
+
+def client(meta: dict) -> str:
+    """Return the client of a request, told apart like DRF's throttles do."""
+    return BaseThrottle().get_ident(SimpleNamespace(META=meta)) or ""
+
+
+def _release(key: str) -> None:
+    try:
+        cache.decr(key)
+    except ValueError:
+        # Expired while held.
+        pass
+
+
+@contextmanager
+def slot(ident: str) -> Iterator[None]:
+    """
+    Hold one of the ``SCYTALE_CLIENT_CONCURRENCY`` request slots of a client.
+
+    Raises ``Throttled`` if the client has none free.
+    """
+    limit = settings.SCYTALE_CLIENT_CONCURRENCY
+    if not limit:
+        yield
+        return
+
+    key = KEY_PREFIX + ident
+    # NOTE: The timeout frees the slots held by workers that died.
+    cache.add(key, 0, settings.SCYTALE_CLIENT_SLOT_TIMEOUT)
+    try:
+        held = cache.incr(key)
+    except ValueError:
+        # Expired in between.
+        cache.add(key, 1, settings.SCYTALE_CLIENT_SLOT_TIMEOUT)
+        held = 1
+    if held > limit:
+        _release(key)
+        raise Throttled(
+            detail="Too many concurrent requests, at most {} allowed.".format(limit)
+        )
+    try:
+        yield
+    finally:
+        _release(key)
+
+
+def in_flight(ident: str) -> int:
+    """Return the number of slots a client holds."""
+    return cache.get(KEY_PREFIX + ident, 0)
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.devoff import profiling
+
+
+class Command(BaseCommand):
+    help = "List and render the request profiles saved by ProfilerMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "profile_id",
+            nargs="?",
+            help="Profile to render, or 'latest'. Lists the profiles when omitted.",
+        )
+        parser.add_argument(
+            "--sort",
+            default="cumulative",
+            help="pstats sort key, e.g. cumulative, tottime, calls.",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=30, help="Max number of functions shown."
+        )
+        parser.add_argument(
+            "--collapsed",
+            action="store_true",
+            help="Print collapsed caller;callee stacks, e.g. for flamegraph.pl.",
+        )
+
+    def handle(self, *args, **options):
+        profile_id = options["profile_id"]
+        if profile_id is None:
+            for entry in profiling.entries():
+                scytale = entry.get("scytale") or {}
+                self.stdout.write(
+                    "{id}  {method} {path}  {status}  {seconds:.4f}s  "
+                    "length={length} vueltas={vueltas}".format(
+                        id=entry["id"],
+                        method=entry.get("method", "-"),
+                        path=entry.get("path", "-"),
+                        status=entry.get("status", "-"),
+                        seconds=entry.get("seconds", 0.0),
+                        length=scytale.get("length", "-"),
+                        vueltas=scytale.get("vueltas", "-"),
+                    )
+                )
+            return
+
+        ids = profiling.ids()
+        if profile_id == "latest" and ids:
+            profile_id = ids[-1]
+        if profile_id not in ids:
+            raise CommandError("No profile {!r}.".format(profile_id))
+        if options["collapsed"]:
+            self.stdout.write(profiling.collapsed(profile_id), ending="")
+        else:
+            self.stdout.write(
+                profiling.render(profile_id, options["sort"], options["limit"])
+            )
@@ -0,0 +1,338 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Metrics are plain counters and fixed-bucket histograms kept per process, so
+observing a value is a ``bisect`` plus a couple of additions under a lock.
+They are exposed by the ``metrics`` view.
+
+Each gunicorn worker is a process of its own, so with ``SCYTALE_METRICS_DIR``
+set every worker writes its metrics to a file there (see ``share``) and the
+exposition adds up the files of every worker, stopped ones included, so
+counters don't depend on the worker answering the scrape. A worker writes its
+own file before reading the others, so the sums never go backwards.
+
+See:
+    - https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+CHARS_BUCKETS = (10, 100, 1000, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], **extra: str) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"),
+        )
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _number(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        """Return a copy of the values, by labels."""
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def add(values: Dict[Tuple[str, ...], float], labels: Tuple[str, ...], value):
+        """Add the ``value`` of another process to ``values``."""
+        values[labels] = values.get(labels, 0) + value
+
+    def expose(self, values: Optional[dict] = None) -> List[str]:
+        lines = [
+            "# HELP {} {}".format(self.name, self.help),
+            "# TYPE {} counter".format(self.name),
+        ]
+        if values is None:
+            values = self.values()
+        for labels, value in sorted(values.items()):
+            lines.append(
+                "{}{} {}".format(
+                    self.name, _labels(self.labelnames, labels), _number(value)
+                )
+            )
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.labelnames = tuple(labelnames)
+        # labels -> [per-bucket counts, sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def values(self) -> Dict[Tuple[str, ...], list]:
+        """Return a copy of the ``[per-bucket counts, sum]``, by labels."""
+        with self._lock:
+            return {labels: [list(c), s] for labels, (c, s) in self._values.items()}
+
+    def add(self, values: Dict[Tuple[str, ...], list], labels: Tuple[str, ...], value):
+        """Add the ``value`` of another process to ``values``."""
+        entry = values.get(labels)
+        if entry is None:
+            entry = values[labels] = [[0] * len(self.buckets), 0.0]
+        counts, total = value
+        entry[0] = [a + b for a, b in zip(entry[0], counts)]
+        entry[1] += total
+
+    def expose(self, values: Optional[dict] = None) -> List[str]:
+        lines = [
+            "# HELP {} {}".format(self.name, self.help),
+            "# TYPE {} histogram".format(self.name),
+        ]
+        if values is None:
+            values = self.values()
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(
+                    "{}_bucket{} {}".format(
+                        self.name,
+                        _labels(self.labelnames, labels, le=_number(bound)),
+                        cumulative,
+                    )
+                )
+            label_text = _labels(self.labelnames, labels)
+            lines.append("{}_sum{} {}".format(self.name, label_text, _number(total)))
+            lines.append("{}_count{} {}".format(self.name, label_text, cumulative))
+        return lines
+
+
+REQUESTS = Counter(
+    "devoff_requests_total", "Requests by endpoint and status.", ("endpoint", "status")
+)
+
+REQUEST_SECONDS = Histogram(
+    "devoff_request_seconds",
+    "Request latency by endpoint, middleware included.",
+    SECONDS_BUCKETS,
+    ("endpoint",),
+)
+
+STAGE_SECONDS = Histogram(
+    "devoff_stage_seconds",
+    "Time spent in each stage of a request.",
+    SECONDS_BUCKETS,
+    ("endpoint", "stage"),
+)
+
+MESSAGE_CHARS = Histogram(
+    "devoff_message_chars",
+    "Length of the ciphered messages.",
+    CHARS_BUCKETS,
+    ("endpoint",),
+)
+
+REGISTRY = [REQUESTS, REQUEST_SECONDS, STAGE_SECONDS, MESSAGE_CHARS]
+
+
+def endpoint(request) -> str:
+    """Return the URL name of ``request``, a bounded label value."""
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.url_name:
+        return "unmatched"
+    return match.url_name
+
+
+@contextmanager
+def stage(request, name: str) -> Iterator[None]:
+    """Record the time spent in the block as stage ``name`` of ``request``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint(request), name)
+
+
+def _cache_stats() -> List[str]:
+    from app.devoff import permutations, results
+    from app.devoff.cache import tiers
+
+    lines = []
+    caches = [("permutation", permutations._cache), ("result", results._cache)]
+    caches.extend(("redis", tier) for tier in tiers())
+    for cache_name, cache in caches:
+        if cache is None:
+            continue
+        for key, value in sorted(cache.stats().items()):
+            name = "devoff_{}_cache_{}".format(cache_name, key)
+            lines.append("# TYPE {} gauge".format(name))
+            lines.append("{} {}".format(name, _number(value)))
+    return lines
+
+
+# NOTE: (pid, path) of the file this process writes its metrics to.
+_shared: Optional[Tuple[int, str]] = None
+
+_write_lock = threading.Lock()
+
+
+def _write(path: str) -> None:
+    data = {
+        metric.name: [
+            [list(labels), value] for labels, value in metric.values().items()
+        ]
+        for metric in REGISTRY
+    }
+    with _write_lock:
+        temporary = path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(data, file)
+        os.replace(temporary, path)
+
+
+def _write_quietly(path: str) -> bool:
+    try:
+        _write(path)
+    except OSError:
+        log.exception("Could not write the metrics to %s", path)
+        return False
+    return True
+
+
+def _write_every(path: str, seconds: float) -> None:
+    while True:
+        time.sleep(seconds)
+        _write_quietly(path)
+
+
+def share() -> None:
+    """
+    Write the metrics of this process to ``SCYTALE_METRICS_DIR`` every
+    ``SCYTALE_METRICS_WRITE_SECONDS``, e.g. at worker boot.
+    """
+    global _shared
+    directory = settings.SCYTALE_METRICS_DIR
+    if not settings.SCYTALE_METRICS or not directory:
+        return
+    if _shared is not None and _shared[0] == os.getpid():
+        return
+    os.makedirs(directory, exist_ok=True)
+    # NOTE: Unique, a new worker reusing a pid must not replace the file of
+    #       a stopped one.
+    path = os.path.join(directory, "{}-{}.json".format(os.getpid(), uuid.uuid4().hex))
+    _shared = (os.getpid(), path)
+    threading.Thread(
+        target=_write_every,
+        args=(path, settings.SCYTALE_METRICS_WRITE_SECONDS),
+        name="devoff-metrics",
+        daemon=True,
+    ).start()
+    atexit.register(_write_quietly, path)
+
+
+def _shared_values() -> Iterator[dict]:
+    """Yield the metrics every other process sharing them last wrote."""
+    if _shared is None or _shared[0] != os.getpid():
+        return
+    own = _shared[1]
+    if not _write_quietly(own):
+        return
+    directory = os.path.dirname(own)
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.endswith(".json") or path == own:
+            continue
+        try:
+            with open(path) as file:
+                yield json.load(file)
+        except (OSError, ValueError):
+            # Removed meanwhile.
+            continue
+
+
+def collect() -> Dict[str, dict]:
+    """Return the values of every metric, summed over the sharing processes."""
+    totals = {metric.name: metric.values() for metric in REGISTRY}
+    for data in _shared_values():
+        for metric in REGISTRY:
+            for labels, value in data.get(metric.name, ()):
+                metric.add(totals[metric.name], tuple(labels), value)
+    return totals
+
+
+def expose(registry: Optional[Sequence] = None) -> str:
+    """Return every metric in the text exposition format."""
+    lines: List[str] = []
+    if registry is None:
+        totals = collect()
+        for metric in REGISTRY:
+            lines.extend(metric.expose(totals[metric.name]))
+        lines.extend(_cache_stats())
+    else:
+        for metric in registry:
+            lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
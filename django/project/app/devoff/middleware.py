@@ -0,0 +1,168 @@
+"""
+Request timing for ``app.devoff.metrics`` and profiling.
+
+``MetricsMiddleware`` goes first in ``MIDDLEWARE`` and ``MetricsViewMiddleware``
+last, so the difference between the two is the time spent in the middleware
+chain. ``CompressionMiddleware`` times the compression on its own.
+
+``ProfilerMiddleware`` profiles a sample of requests, see
+``app.devoff.profiling``.
+"""
+
+import cProfile
+import hmac
+import logging
+import random
+import threading
+import time
+from typing import Callable
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware import gzip
+from django.utils.cache import patch_vary_headers
+
+from app.devoff import compression, metrics, profiling
+
+log = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response: Callable):
+        if not settings.SCYTALE_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        endpoint = metrics.endpoint(request)
+        metrics.REQUEST_SECONDS.observe(elapsed, endpoint)
+        metrics.REQUESTS.inc(endpoint, str(response.status_code))
+        view = getattr(request, "_metrics_view_seconds", None)
+        if view is not None:
+            metrics.STAGE_SECONDS.observe(elapsed - view, endpoint, "middleware")
+        return response
+
+
+class MetricsViewMiddleware:
+    def __init__(self, get_response: Callable):
+        if not settings.SCYTALE_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        request._metrics_view_seconds = time.perf_counter() - start
+        return response
+
+
+class CompressionMiddleware(gzip.GZipMiddleware):
+    """
+    Compresses responses with the best coding the client accepts, see
+    ``app.devoff.compression``. Streaming responses are left to Django's
+    ``GZipMiddleware``. Timed as the ``compress`` stage.
+    """
+
+    def process_response(self, request, response):
+        with metrics.stage(request, "compress"):
+            if response.streaming:
+                return super().process_response(request, response)
+            return self.compress(request, response)
+
+    def compress(self, request, response):
+        if len(response.content) < settings.SCYTALE_COMPRESSION_MIN_LENGTH:
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = compression.negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+
+        # NOTE: Cipher responses repeat with their results, cache those.
+        cipher = getattr(request, "scytale", None) is not None
+        content = compression.compress(coding, response.content, cache=cipher)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        # Same as Django's GZipMiddleware, see RFC 7232 section 2.1.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = coding
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Profiles ``SCYTALE_PROFILE_RATE`` of the requests, and every request whose
+    ``X-Scytale-Profile`` header matches ``SCYTALE_PROFILE_TOKEN``.
+
+    ``cProfile`` hooks the whole thread, so only one request per process is
+    profiled at a time and, under gevent, the profile also contains whatever
+    other greenlets ran meanwhile.
+    """
+
+    HEADER = "HTTP_X_SCYTALE_PROFILE"
+
+    def __init__(self, get_response: Callable):
+        if settings.SCYTALE_PROFILE_RATE <= 0 and not settings.SCYTALE_PROFILE_TOKEN:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.lock = threading.Lock()
+
+    def requested(self, request) -> bool:
+        token = settings.SCYTALE_PROFILE_TOKEN
+        header = request.META.get(self.HEADER)
+        return bool(
+            token
+            and header
+            and hmac.compare_digest(header.encode("utf-8"), token.encode("utf-8"))
+        )
+
+    def __call__(self, request):
+        requested = self.requested(request)
+        if not requested and random.random() >= settings.SCYTALE_PROFILE_RATE:
+            return self.get_response(request)
+        if not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profile = cProfile.Profile()
+            start = time.perf_counter()
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+            elapsed = time.perf_counter() - start
+        finally:
+            self.lock.release()
+
+        try:
+            profile_id = profiling.save(
+                profile,
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "endpoint": metrics.endpoint(request),
+                    "status": response.status_code,
+                    "seconds": elapsed,
+                    "content_length": request.META.get("CONTENT_LENGTH") or None,
+                    # NOTE: Set by the cipher views.
+                    "scytale": getattr(request, "scytale", None),
+                },
+            )
+        except OSError:
+            # NOTE: E.g. SCYTALE_PROFILE_DIR not writable, the response stands.
+            log.exception("Could not save the profile of %s", request.path)
+            return response
+        if requested:
+            response["X-Scytale-Profile-Id"] = profile_id
+        return response
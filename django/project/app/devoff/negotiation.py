@@ -0,0 +1,19 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class MirrorContentNegotiation(DefaultContentNegotiation):
+    """
+    Answers in the format of the request body unless the client asks for
+    another one, so a raw or msgpack request gets a raw or msgpack response
+    without an ``Accept`` header.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        accept = request.META.get("HTTP_ACCEPT", "*/*").strip()
+        format_query = request.query_params.get(self.settings.URL_FORMAT_OVERRIDE)
+        if accept in ("", "*/*") and not (format_suffix or format_query):
+            media_type = request.content_type.partition(";")[0].strip().lower()
+            for renderer in renderers:
+                if renderer.media_type == media_type:
+                    return renderer, renderer.media_type
+        return super().select_renderer(request, renderers, format_suffix)
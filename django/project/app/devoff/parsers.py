@@ -0,0 +1,333 @@
+"""
+Parsers of the cipher API.
+
+Besides JSON, the cipher views accept msgpack and, as
+``application/octet-stream``, the bare UTF-8 message with ``vueltas`` in the
+query string or the ``X-Vueltas`` header. Both parse to the same data as the
+JSON body, so ``EncryptSerializer`` validates every format alike, except for
+ASCII messages that stay bytes (see ``AsciiSerializer``).
+
+Bodies over ``SCYTALE_MAX_BODY_SIZE`` bytes, or over the cost budget (see
+``app.devoff.limits``), are rejected before reading them.
+"""
+
+import codecs
+import json
+import re
+
+from django.conf import settings
+
+from rest_framework import parsers, status
+from rest_framework.exceptions import APIException, ParseError, ValidationError
+
+from app.devoff import limits
+from app.devoff.serializers import StreamSerializer, isascii
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class PayloadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Request body is too large."
+    default_code = "payload_too_large"
+
+
+class FieldError(ValidationError):
+    """A field rejected while parsing, answered like the views' own errors."""
+
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def _content_length(parser_context):
+    request = (parser_context or {}).get("request")
+    return request.META.get("CONTENT_LENGTH") if request is not None else None
+
+
+def check_length(parser_context, vueltas=None):
+    """
+    Raise ``PayloadTooLarge`` if the request announces an oversized body, or
+    ``limits.CostExceeded`` if it can't fit the cost budget.
+    """
+    length = _content_length(parser_context)
+    try:
+        oversized = int(length) > settings.SCYTALE_MAX_BODY_SIZE
+    except (TypeError, ValueError):
+        return
+    if oversized:
+        raise PayloadTooLarge()
+    limits.check_body(length, vueltas)
+
+
+class MessagePackParser(parsers.BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        check_length(parser_context)
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError("msgpack parse error - {}".format(exc))
+
+
+# NOTE: Encodings in which ASCII bytes are the same ASCII characters.
+ASCII_SUPERSETS = {"ascii", "utf-8", "iso8859-1", "cp1252"}
+
+
+class OctetStreamParser(parsers.BaseParser):
+    """
+    Parses a raw body. Pure ASCII bodies are kept as ``bytes`` so the cipher
+    runs on them without a decode/encode round trip.
+    """
+
+    media_type = "application/octet-stream"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context["request"]
+        vueltas = request.query_params.get(
+            "vueltas", request.META.get("HTTP_X_VUELTAS")
+        )
+        check_length(parser_context, vueltas)
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        body = stream.read()
+        try:
+            if isascii(body) and codecs.lookup(encoding).name in ASCII_SUPERSETS:
+                # NOTE: Kept as bytes, see AsciiSerializer.
+                mensaje = body
+            else:
+                mensaje = codecs.decode(body, encoding)
+        except (LookupError, UnicodeDecodeError) as exc:
+            raise ParseError("Body is not valid {} - {}".format(encoding, exc))
+
+        data = {"mensaje": mensaje}
+        if vueltas is not None:
+            data["vueltas"] = vueltas
+        return data
+
+
+WHITESPACE = frozenset(b" \t\n\r")
+
+QUOTE, BACKSLASH = ord('"'), ord("\\")
+
+CONTROL_CHARACTERS = re.compile(rb"[\x00-\x1f]")
+
+# NOTE: Any value other than the message is small, cap it.
+FIELD_MAX_BYTES = 4096
+
+
+def _parse_constant(value: str):
+    # Same as DRF's JSONParser: reject NaN and Infinity.
+    raise ValueError("Out of range float values are not JSON compliant: %r" % value)
+
+
+def _loads(raw):
+    try:
+        return json.loads(raw, parse_constant=_parse_constant)
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise ParseError("JSON parse error - {}".format(exc))
+
+
+def _string(raw: bytearray, keep_ascii: bool = False):
+    """
+    Return the value of a JSON string from its ``raw`` bytes, quotes excluded.
+
+    With ``keep_ascii``, ASCII strings without escapes are returned as is.
+    Otherwise ``raw`` is emptied once decoded, so it's freed before the value
+    is built.
+    """
+    plain = b"\\" not in raw and not CONTROL_CHARACTERS.search(raw)
+    if plain and keep_ascii and isascii(raw):
+        return raw
+    if not plain:
+        raw += b'"'
+    try:
+        text = raw.decode("utf-8")
+        raw.clear()
+        return text if plain else json.decoder.scanstring(text, 0)[0]
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise ParseError("JSON parse error - {}".format(exc))
+
+
+class JSONReader:
+    """
+    Reads a JSON body off a stream, ``chunk_size`` bytes at a time.
+
+    Only the pending chunk is held besides the values read so far, and
+    reading fails with ``PayloadTooLarge`` past ``max_bytes``.
+    """
+
+    def __init__(self, stream, chunk_size: int, max_bytes: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.read = 0
+        self.buffer = b""
+        self.position = 0
+
+    def fill(self) -> bool:
+        """Read the next chunk, return False at the end of the body."""
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.read += len(chunk)
+        if self.read > self.max_bytes:
+            raise PayloadTooLarge()
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> bytes:
+        """Return the next byte that isn't whitespace, or b"" at the end."""
+        while True:
+            buffer = self.buffer
+            while self.position < len(buffer) and buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(buffer):
+                return buffer[self.position : self.position + 1]
+            if not self.fill():
+                return b""
+
+    def expect(self, token: bytes):
+        found = self.peek()
+        if found != token:
+            raise ParseError(
+                "JSON parse error - Expecting {!r} at byte {}, found {!r}".format(
+                    token.decode(), self.read - len(self.buffer) + self.position, found
+                )
+            )
+        self.position += 1
+
+    def string(self, max_bytes: int = None) -> bytearray:
+        """Consume a string and return its raw bytes, escapes included."""
+        self.expect(b'"')
+        raw = bytearray()
+        while True:
+            end = self.buffer.find(b'"', self.position)
+            if end == -1:
+                raw += memoryview(self.buffer)[self.position :]
+                self.buffer, self.position = b"", 0
+                if max_bytes is not None and len(raw) > max_bytes:
+                    raise ParseError("JSON parse error - String too long")
+                if not self.fill():
+                    raise ParseError("JSON parse error - Unterminated string")
+                continue
+            raw += memoryview(self.buffer)[self.position : end]
+            self.position = end + 1
+            # NOTE: An odd run of backslashes escapes the quote.
+            backslashes = 0
+            while backslashes < len(raw) and raw[-1 - backslashes] == BACKSLASH:
+                backslashes += 1
+            if backslashes % 2:
+                raw += b'"'
+                continue
+            if max_bytes is not None and len(raw) > max_bytes:
+                raise ParseError("JSON parse error - String too long")
+            return raw
+
+    def value(self):
+        """Consume a value of up to ``FIELD_MAX_BYTES`` and return it parsed."""
+        if self.peek() == b'"':
+            return _string(self.string(FIELD_MAX_BYTES))
+        raw = bytearray()
+        depth, in_string, escaped = 0, False, False
+        while self.position < len(self.buffer) or self.fill():
+            byte = self.buffer[self.position]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif byte == BACKSLASH:
+                    escaped = True
+                elif byte == QUOTE:
+                    in_string = False
+            elif byte == QUOTE:
+                in_string = True
+            elif byte in b"[{":
+                depth += 1
+            elif depth == 0 and byte in b",]}":
+                break
+            elif byte in b"]}":
+                depth -= 1
+            raw.append(byte)
+            self.position += 1
+            if len(raw) > FIELD_MAX_BYTES:
+                raise ParseError("JSON parse error - Value too long")
+        return _loads(raw)
+
+    def rest(self) -> bytearray:
+        """Consume the rest of the body."""
+        raw = bytearray(memoryview(self.buffer)[self.position :])
+        self.buffer, self.position = b"", 0
+        while self.fill():
+            raw += self.buffer
+            self.buffer = b""
+        return raw
+
+
+class StreamingJSONParser(parsers.JSONParser):
+    """
+    Parses a JSON object without buffering the whole body.
+
+    The body is read a chunk at a time: ``vueltas`` is validated, and the cost
+    budget checked with it, as soon as it's read, any other field is capped at
+    ``FIELD_MAX_BYTES`` and ``mensaje`` is copied once, straight from the
+    chunks. An ASCII ``mensaje`` without escapes, too long for the result
+    cache, is handed over as a ``bytearray`` (see ``AsciiSerializer``).
+    Other JSON documents, e.g. lists, parse as usual.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        check_length(parser_context)
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            utf8 = codecs.lookup(encoding).name == "utf-8"
+        except LookupError:
+            utf8 = False
+        if not utf8:
+            return super().parse(stream, media_type, parser_context)
+
+        reader = JSONReader(
+            stream, settings.SCYTALE_STREAM_CHUNK_SIZE, settings.SCYTALE_MAX_BODY_SIZE
+        )
+        if reader.peek() != b"{":
+            return _loads(reader.rest())
+
+        reader.expect(b"{")
+        data = {}
+        if reader.peek() != b"}":
+            while True:
+                key = _string(reader.string(FIELD_MAX_BYTES))
+                reader.expect(b":")
+                if key == "mensaje" and reader.peek() == b'"':
+                    raw = reader.string()
+                    # NOTE: Shorter messages may be served from the result
+                    #       cache, which stores text.
+                    keep_ascii = len(raw) > settings.SCYTALE_RESULT_CACHE_MAX_LENGTH
+                    value = _string(raw, keep_ascii)
+                else:
+                    value = reader.value()
+                if key == "vueltas":
+                    try:
+                        StreamSerializer().fields["vueltas"].run_validation(value)
+                    except ValidationError as exc:
+                        raise FieldError({"vueltas": exc.detail})
+                    limits.check_body(_content_length(parser_context), value)
+                data[key] = value
+                if reader.peek() != b",":
+                    break
+                reader.expect(b",")
+        reader.expect(b"}")
+        if reader.peek():
+            raise ParseError("JSON parse error - Extra data after the object")
+        return data
+
+
+CIPHER_PARSERS = [StreamingJSONParser, OctetStreamParser]
+
+BATCH_PARSERS = [parsers.JSONParser]
+
+if msgpack is not None:
+    CIPHER_PARSERS.append(MessagePackParser)
+    BATCH_PARSERS.append(MessagePackParser)
@@ -0,0 +1,136 @@
+"""
+Precomputed Scytale permutation tables.
+
+A table maps every output position to the input position it is read from, so
+applying the cipher is a single gather over the table. Tables only depend on
+``(length, vueltas)`` and are kept in a bounded LRU cache.
+"""
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from django.conf import settings
+
+from app.devoff.scytale import DECRYPT, ENCRYPT, column_start, grid
+
+
+def encrypt_table(length: int, vueltas: int) -> array:
+    """Return the gather table of ``scytale.encrypt`` for a message length."""
+    rows, full = grid(length, vueltas)
+    table = array("I")
+    if vueltas <= rows:
+        for column in range(vueltas):
+            table.extend(range(column, length, vueltas))
+        return table
+
+    table = array("I", bytes(table.itemsize * length))
+    for row in range(rows):
+        start = row * vueltas
+        table[row : row + full * rows : rows] = array("I", range(start, start + full))
+        if row < rows - 1:
+            table[full * rows + row :: rows - 1] = array(
+                "I", range(start + full, start + vueltas)
+            )
+    return table
+
+
+def decrypt_table(length: int, vueltas: int) -> array:
+    """Return the gather table of ``scytale.decrypt`` for a message length."""
+    rows, full = grid(length, vueltas)
+    table = array("I")
+    if rows <= vueltas:
+        for row in range(rows):
+            table.extend(range(row, full * rows, rows))
+            if row < rows - 1:
+                table.extend(range(full * rows + row, length, rows - 1))
+        return table
+
+    table = array("I", bytes(table.itemsize * length))
+    for column in range(vueltas):
+        start = column_start(column, rows, full)
+        end = start + rows - (column >= full)
+        table[column::vueltas] = array("I", range(start, end))
+    return table
+
+
+BUILDERS: Dict[str, Callable[[int, int], array]] = {
+    ENCRYPT: encrypt_table,
+    DECRYPT: decrypt_table,
+}
+
+
+def gather(mensaje: str, table: array) -> str:
+    """Apply a permutation table to a message."""
+    return "".join([mensaje[index] for index in table])
+
+
+class PermutationCache:
+    """Thread-safe LRU of permutation tables bounded by their size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._tables: "OrderedDict[Hashable, array]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, build: Callable[[], array]) -> array:
+        """Return the table for ``key``, building and storing it on a miss."""
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+                self.hits += 1
+                return table
+            self.misses += 1
+
+        table = build()
+        nbytes = table.itemsize * len(table)
+        if nbytes > self.max_bytes:
+            return table
+
+        with self._lock:
+            if key not in self._tables:
+                self._tables[key] = table
+                self.size += nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self._tables.popitem(last=False)
+                self.size -= evicted.itemsize * len(evicted)
+                self.evictions += 1
+        return table
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._tables),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+_cache: Optional[PermutationCache] = None
+
+
+def get_cache() -> PermutationCache:
+    """Return the process-wide cache sized by ``SCYTALE_PERMUTATION_CACHE_BYTES``."""
+    global _cache
+    if _cache is None:
+        _cache = PermutationCache(settings.SCYTALE_PERMUTATION_CACHE_BYTES)
+    return _cache
+
+
+def permutation(direction: str, length: int, vueltas: int) -> array:
+    """Return the cached gather table for ``direction``."""
+    return get_cache().get(
+        (direction, length, vueltas), lambda: BUILDERS[direction](length, vueltas)
+    )
@@ -0,0 +1,73 @@
+"""
+Multi-step Scytale pipelines.
+
+A pipeline is an ordered list of ``(direction, vueltas)`` steps, each applied
+to the output of the previous one. Steps are simplified first: steps leaving
+the message as is (one row or one column) are dropped, and so are adjacent
+steps undoing each other.
+
+With the ``numpy`` backend the remaining steps are composed into a single
+permutation table, cached per ``(length, steps)`` in the permutation cache,
+and the whole pipeline runs as one gather over the input, without the
+intermediate strings. The other backends have no gather faster than their own
+slicing, so they run the steps one after the other, through the result cache.
+"""
+
+from array import array
+from typing import List, Sequence, Tuple
+
+from app.devoff import backends, permutations, results
+from app.devoff.scytale import DECRYPT, ENCRYPT, grid
+
+Step = Tuple[str, int]
+
+INVERSE = {ENCRYPT: DECRYPT, DECRYPT: ENCRYPT}
+
+
+def simplify(steps: Sequence[Step], length: int) -> Tuple[Step, ...]:
+    """Return ``steps`` without those that cancel out on ``length`` characters."""
+    simplified: List[Step] = []
+    for direction, vueltas in steps:
+        if vueltas == 1 or grid(length, vueltas)[0] <= 1:
+            continue
+        if simplified and simplified[-1] == (INVERSE[direction], vueltas):
+            simplified.pop()
+        else:
+            simplified.append((direction, vueltas))
+    return tuple(simplified)
+
+
+def _compose(length: int, steps: Tuple[Step, ...]) -> array:
+    numpy = backends.numpy
+    composed = None
+    for direction, vueltas in steps:
+        step = numpy.frombuffer(
+            permutations.permutation(direction, length, vueltas), dtype=numpy.uint32
+        )
+        # NOTE: Each step gathers from the output of the previous one, which
+        #       gathered from the input at the composed positions.
+        composed = step if composed is None else composed.take(step)
+    return array("I", composed.tobytes())
+
+
+def table(length: int, steps: Tuple[Step, ...]) -> array:
+    """Return the cached gather table of a simplified pipeline."""
+    return permutations.get_cache().get(
+        ("pipeline", length, steps), lambda: _compose(length, steps)
+    )
+
+
+def run(mensaje: str, steps: Sequence[Step]) -> str:
+    """Apply the cipher ``steps`` to ``mensaje``, in order."""
+    steps = simplify(steps, len(mensaje))
+    if len(steps) == 1:
+        return results.cipher(steps[0][0], mensaje, steps[0][1])
+    if steps and backends.name() == "numpy":
+        numpy = backends.numpy
+        data, codec, fmt = backends.encode(mensaje)
+        source = numpy.frombuffer(data, dtype=numpy.uint8 if fmt == "B" else "<u4")
+        gather = numpy.frombuffer(table(len(mensaje), steps), dtype=numpy.uint32)
+        return source.take(gather).tobytes().decode(codec, backends.ERRORS)
+    for direction, vueltas in steps:
+        mensaje = results.cipher(direction, mensaje, vueltas)
+    return mensaje
@@ -0,0 +1,100 @@
+"""
+On-disk ring buffer of request profiles.
+
+``ProfilerMiddleware`` profiles sampled requests with ``cProfile`` and saves
+them here: a ``<id>.prof`` file, loadable with ``pstats``, next to a
+``<id>.json`` file describing the request. Only the newest
+``SCYTALE_PROFILE_KEEP`` profiles are kept.
+
+Profiles are listed and rendered with ``manage.py profiles``.
+"""
+
+import io
+import json
+import os
+import pstats
+import time
+from pathlib import Path
+from typing import Iterator, List
+
+from django.conf import settings
+
+
+def directory() -> Path:
+    return Path(settings.SCYTALE_PROFILE_DIR)
+
+
+def save(profile, info: dict) -> str:
+    """Save a ``cProfile.Profile`` and its request info, return the profile id."""
+    path = directory()
+    path.mkdir(parents=True, exist_ok=True)
+    # NOTE: Ids sort by creation time, the pid keeps workers from clashing.
+    profile_id = "{:020d}-{}".format(int(time.time() * 1e9), os.getpid())
+    profile.dump_stats(str(path / (profile_id + ".prof")))
+    (path / (profile_id + ".json")).write_text(json.dumps(info))
+    prune(settings.SCYTALE_PROFILE_KEEP)
+    return profile_id
+
+
+def ids() -> List[str]:
+    """Return the stored profile ids, oldest first."""
+    if not directory().is_dir():
+        return []
+    return sorted(path.stem for path in directory().glob("*.prof"))
+
+
+def prune(keep: int) -> None:
+    """Delete all but the newest ``keep`` profiles."""
+    stale = ids()[:-keep] if keep > 0 else ids()
+    for profile_id in stale:
+        for suffix in (".prof", ".json"):
+            try:
+                (directory() / (profile_id + suffix)).unlink()
+            except FileNotFoundError:
+                # Another worker pruned it first.
+                pass
+
+
+def info(profile_id: str) -> dict:
+    try:
+        return json.loads((directory() / (profile_id + ".json")).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def entries() -> Iterator[dict]:
+    """Yield the request info of every stored profile, oldest first."""
+    for profile_id in ids():
+        yield {"id": profile_id, **info(profile_id)}
+
+
+def render(profile_id: str, sort: str = "cumulative", limit: int = 30) -> str:
+    """Return the ``pstats`` report of a profile."""
+    output = io.StringIO()
+    stats = pstats.Stats(str(directory() / (profile_id + ".prof")), stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def collapsed(profile_id: str) -> str:
+    """
+    Return a profile as collapsed stacks, e.g. for ``flamegraph.pl``.
+
+    ``cProfile`` only records caller/callee pairs, so each line is a single
+    ``caller;callee`` edge weighted by its inline time in microseconds.
+    """
+    stats = pstats.Stats(str(directory() / (profile_id + ".prof")))
+    lines = []
+    for (filename, line, name), value in stats.stats.items():
+        callee = "{}:{}({})".format(os.path.basename(filename), line, name)
+        callers = value[4]
+        if not callers:
+            lines.append((callee, value[2]))
+        for (c_filename, c_line, c_name), c_value in callers.items():
+            caller = "{}:{}({})".format(os.path.basename(c_filename), c_line, c_name)
+            lines.append(("{};{}".format(caller, callee), c_value[2]))
+    return "".join(
+        "{} {}\n".format(stack, int(seconds * 1e6))
+        for stack, seconds in sorted(lines)
+        if seconds > 0
+    )
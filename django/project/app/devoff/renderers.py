@@ -0,0 +1,97 @@
+"""
+Renderers of the cipher API.
+
+Besides JSON, the cipher views answer with msgpack or, for
+``application/octet-stream``, the bare cipher text as UTF-8. Renderers record
+their time as the ``render`` stage of ``app.devoff.metrics``.
+"""
+
+import re
+
+from rest_framework import renderers
+
+from app.devoff import backends, metrics
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# NOTE: Bytes that can't go in a JSON string as they are.
+JSON_UNSAFE = re.compile(rb'["\\\x00-\x1f\x80-\xff]')
+
+
+def _timed(renderer_context):
+    return metrics.stage((renderer_context or {}).get("request"), "render")
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    DRF's ``JSONRenderer``, timed as the ``render`` stage.
+
+    A cipher result still in bytes (see ``AsciiSerializer``) is spliced into
+    the rendered JSON instead of being decoded, dumped and encoded again.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with _timed(renderer_context):
+            if isinstance(data, dict) and isinstance(data.get("mensaje"), bytes):
+                mensaje = data["mensaje"]
+                if len(data) > 1 or JSON_UNSAFE.search(mensaje):
+                    data = dict(data, mensaje=mensaje.decode("ascii"))
+                else:
+                    skeleton = super().render(
+                        {"mensaje": ""}, accepted_media_type, renderer_context
+                    )
+                    head, tail = skeleton.rsplit(b'""', 1)
+                    return b"".join((head, b'"', mensaje, b'"', tail))
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with _timed(renderer_context):
+            return msgpack.packb(data, use_bin_type=True)
+
+
+class OctetStreamRenderer(renderers.BaseRenderer):
+    """
+    Renders a cipher result as its bare UTF-8 text.
+
+    Anything else, e.g. validation errors or a background job, has no raw form
+    and is rendered as JSON instead.
+    """
+
+    media_type = "application/octet-stream"
+    format = "bin"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None and response.status_code == 200:
+            mensaje = data["mensaje"]
+            if isinstance(mensaje, bytes):
+                # Already encoded, see AsciiSerializer.
+                return mensaje
+            with _timed(renderer_context):
+                return mensaje.encode("utf-8", backends.ERRORS)
+        if response is not None:
+            response["Content-Type"] = JSONRenderer.media_type
+        return JSONRenderer().render(data, None, renderer_context)
+
+
+CIPHER_RENDERERS = [JSONRenderer, OctetStreamRenderer]
+
+BATCH_RENDERERS = [JSONRenderer]
+
+if msgpack is not None:
+    CIPHER_RENDERERS.append(MessagePackRenderer)
+    BATCH_RENDERERS.append(MessagePackRenderer)
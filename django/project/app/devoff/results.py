@@ -0,0 +1,137 @@
+"""
+Content-addressed cache of cipher results.
+
+Results are keyed by a hash of the direction, ``vueltas`` and ``mensaje`` and
+stored in the configured Redis cache, or in a per-process LRU when
+``REDIS_URL`` is unset. Messages longer than
+``SCYTALE_RESULT_CACHE_MAX_LENGTH`` are never stored.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from app.devoff import backends, executors
+
+KEY_PREFIX = "devoff:cipher:"
+
+
+class LocalCache:
+    """Per-process LRU implementing the ``get``/``set`` subset of Django caches."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, timeout: Optional[float] = None) -> None:
+        # NOTE: Same as Django, a timeout of 0 means "don't cache".
+        if timeout is not None and timeout <= 0:
+            return
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class ResultCache:
+    """Memoizes cipher results and counts hits, misses and skipped messages."""
+
+    def __init__(self, backend: Any, timeout: Optional[int], max_length: int):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_length = max_length
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    @staticmethod
+    def key(direction: str, mensaje: str, vueltas: int) -> str:
+        digest = hashlib.sha256(
+            "{}:{}:".format(direction, vueltas).encode()
+            + mensaje.encode("utf-8", backends.ERRORS)
+        )
+        return KEY_PREFIX + digest.hexdigest()
+
+    def get_or_compute(
+        self, direction: str, mensaje: str, vueltas: int, compute: Callable[[], str]
+    ) -> str:
+        if len(mensaje) > self.max_length:
+            self.skipped += 1
+            return compute()
+
+        key = self.key(direction, mensaje, vueltas)
+        result = self.backend.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        result = compute()
+        self.backend.set(key, result, self.timeout)
+        return result
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_cache: Optional[ResultCache] = None
+
+
+def get_cache() -> ResultCache:
+    """Return the process-wide result cache built from settings."""
+    global _cache
+    if _cache is None:
+        if settings.REDIS_URL:
+            backend = caches["default"]
+        else:
+            backend = LocalCache(settings.SCYTALE_RESULT_CACHE_LOCAL_ENTRIES)
+        timeout = settings.CACHE_TIMEOUT
+        _cache = ResultCache(
+            backend,
+            None if timeout is None else int(timeout),
+            settings.SCYTALE_RESULT_CACHE_MAX_LENGTH,
+        )
+    return _cache
+
+
+def cipher(direction: str, mensaje: str, vueltas: int) -> str:
+    """Return ``scytale.<direction>(mensaje, vueltas)``, memoized when enabled."""
+    if not settings.SCYTALE_RESULT_CACHE:
+        return executors.run(direction, mensaje, vueltas)
+    return get_cache().get_or_compute(
+        direction, mensaje, vueltas, lambda: executors.run(direction, mensaje, vueltas)
+    )
@@ -0,0 +1,75 @@
+"""
+Scytale transposition cipher.
+
+The message is written row by row on a strip of ``vueltas`` columns and read
+column by column. With ``n`` characters the grid has ``rows = ceil(n / vueltas)``
+rows; the first ``full = n - (rows - 1) * vueltas`` columns hold ``rows``
+characters and the remaining ones hold ``rows - 1``.
+
+Both directions only slice along the shorter side of the grid, so the work is
+O(n) with O(min(vueltas, rows)) Python-level steps.
+"""
+from typing import Callable, Dict, List, Tuple
+
+ENCRYPT = "encrypt"
+
+DECRYPT = "decrypt"
+
+
+def grid(length: int, vueltas: int) -> Tuple[int, int]:
+    """Return the ``(rows, full)`` shape of the grid for a message length."""
+    if vueltas < 1:
+        raise ValueError("vueltas must be a positive integer.")
+    rows = -(-length // vueltas)
+    full = length - (rows - 1) * vueltas
+    return rows, full
+
+
+def column_start(column: int, rows: int, full: int) -> int:
+    """Return the ciphertext offset where ``column`` begins."""
+    return column * (rows - 1) + min(column, full)
+
+
+def encrypt(mensaje: str, vueltas: int) -> str:
+    """Encrypts a message using Scytale method."""
+    length = len(mensaje)
+    rows, full = grid(length, vueltas)
+    if vueltas <= rows:
+        return "".join([mensaje[column::vueltas] for column in range(vueltas)])
+
+    # Wide grid: scatter each plaintext row into its ciphertext positions.
+    output: List[str] = [""] * length
+    for row in range(rows):
+        start = row * vueltas
+        output[row : row + full * rows : rows] = mensaje[start : start + full]
+        if row < rows - 1:
+            output[full * rows + row :: rows - 1] = mensaje[
+                start + full : start + vueltas
+            ]
+    return "".join(output)
+
+
+def decrypt(mensaje: str, vueltas: int) -> str:
+    """Decrypts a message using Scytale method."""
+    length = len(mensaje)
+    rows, full = grid(length, vueltas)
+    if rows <= vueltas:
+        # Wide grid: every plaintext row is two strided reads of the input.
+        return "".join(
+            [
+                mensaje[row : full * rows : rows]
+                + (mensaje[full * rows + row :: rows - 1] if row < rows - 1 else "")
+                for row in range(rows)
+            ]
+        )
+
+    # Tall grid: each column is a contiguous run of the input.
+    output: List[str] = [""] * length
+    for column in range(vueltas):
+        start = column_start(column, rows, full)
+        end = start + rows - (column >= full)
+        output[column::vueltas] = mensaje[start:end]
+    return "".join(output)
+
+
+CIPHERS: Dict[str, Callable[[str, int], str]] = {ENCRYPT: encrypt, DECRYPT: decrypt}
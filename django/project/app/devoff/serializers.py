@@ -1,5 +1,141 @@
+import re
+
+from django.conf import settings
+
 from rest_framework import serializers
 
+from app.devoff.scytale import DECRYPT, ENCRYPT
+
+# NOTE: The ASCII characters str.strip() removes.
+ASCII_WHITESPACE = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+
+NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+
+def isascii(data) -> bool:
+    """Return whether ``data`` is ASCII, like ``bytes.isascii()`` of Python 3.7."""
+    return NON_ASCII.search(data) is None
+
+
+class BatchSerializer(serializers.ListSerializer):
+    """
+    Validates every item of a batch on its own.
+
+    Invalid items are kept in place as ``{"errors": ...}`` so a single bad item
+    doesn't fail the whole batch.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            message = self.error_messages["not_a_list"].format(
+                input_type=type(data).__name__
+            )
+            raise serializers.ValidationError(
+                {"non_field_errors": [message]}, code="not_a_list"
+            )
+        if not data:
+            raise serializers.ValidationError(
+                {"non_field_errors": [self.error_messages["empty"]]}, code="empty"
+            )
+        if len(data) > settings.SCYTALE_BATCH_MAX_ITEMS:
+            message = "Ensure this batch has no more than {} items.".format(
+                settings.SCYTALE_BATCH_MAX_ITEMS
+            )
+            raise serializers.ValidationError(
+                {"non_field_errors": [message]}, code="max_length"
+            )
+
+        items = []
+        for item in data:
+            try:
+                items.append(self.child.run_validation(item))
+            except serializers.ValidationError as exc:
+                items.append({"errors": exc.detail})
+        return items
+
+
 class EncryptSerializer(serializers.Serializer):
-    vueltas = serializers.IntegerField()
-    mensaje = serializers.CharField()
\ No newline at end of file
+    vueltas = serializers.IntegerField(min_value=1)
+    mensaje = serializers.CharField()
+
+    class Meta:
+        list_serializer_class = BatchSerializer
+
+
+class RawEncryptSerializer(EncryptSerializer):
+    """``EncryptSerializer`` of raw bodies, whose whitespace is part of the message."""
+
+    mensaje = serializers.CharField(trim_whitespace=False)
+
+
+class CrackSerializer(serializers.Serializer):
+    mensaje = serializers.CharField()
+    top = serializers.IntegerField(min_value=1, max_value=20, default=5)
+
+
+class StepSerializer(serializers.Serializer):
+    direction = serializers.ChoiceField(choices=[ENCRYPT, DECRYPT])
+    vueltas = serializers.IntegerField(min_value=1)
+
+
+class PipelineSerializer(serializers.Serializer):
+    mensaje = serializers.CharField()
+    steps = StepSerializer(many=True, allow_empty=False)
+
+    def validate_steps(self, steps):
+        if len(steps) > settings.SCYTALE_PIPELINE_MAX_STEPS:
+            raise serializers.ValidationError(
+                "Ensure this pipeline has no more than {} steps.".format(
+                    settings.SCYTALE_PIPELINE_MAX_STEPS
+                ),
+                code="max_length",
+            )
+        return [(step["direction"], step["vueltas"]) for step in steps]
+
+
+class StreamSerializer(serializers.Serializer):
+    vueltas = serializers.IntegerField(min_value=1)
+
+
+class AsciiField(serializers.Field):
+    """
+    ``mensaje`` as the bytes of an ASCII body, validated like ``CharField``.
+
+    The bytes (or bytearray) are not copied unless they need trimming.
+    """
+
+    default_error_messages = {
+        "blank": serializers.CharField.default_error_messages["blank"],
+        "null_characters": "Null characters are not allowed.",
+        "invalid": "Not a valid ASCII string.",
+    }
+
+    def __init__(self, **kwargs):
+        self.trim_whitespace = kwargs.pop("trim_whitespace", True)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        # NOTE: bytearray.strip() copies even when there's nothing to trim.
+        if self.trim_whitespace and (
+            not data or data[0] in ASCII_WHITESPACE or data[-1] in ASCII_WHITESPACE
+        ):
+            data = data.strip(ASCII_WHITESPACE)
+        if not data:
+            self.fail("blank")
+        if b"\x00" in data:
+            self.fail("null_characters")
+        # NOTE: Parsers only hand over ASCII bytes, but msgpack bin values are
+        # passed through as they come.
+        if not isascii(data):
+            self.fail("invalid")
+        return data
+
+
+class AsciiSerializer(StreamSerializer):
+    mensaje = AsciiField()
+
+
+class RawAsciiSerializer(StreamSerializer):
+    """``AsciiSerializer`` of raw bodies, whose whitespace is part of the message."""
+
+    mensaje = AsciiField(trim_whitespace=False)
@@ -0,0 +1,161 @@
+"""
+Streaming Scytale cipher for very large messages.
+
+The request body is decoded incrementally and spooled to a temporary file as
+UTF-32, so every character has a fixed width and the file can be memory-mapped
+and sliced like a ``str``. The output is then produced in tiles of at most
+``chunk_size`` characters: column by column when encrypting and row by row
+when decrypting. Peak memory depends on ``chunk_size``, not on the message.
+"""
+
+import codecs
+import mmap
+import tempfile
+from contextlib import ExitStack
+from typing import IO, Callable, Iterator, Optional, Tuple
+
+from app.devoff import parsers, scytale
+
+ENCODING = "utf-32-le"
+
+WIDTH = 4
+
+
+def spool(stream: IO[bytes], chunk_size: int, max_bytes: int) -> Tuple[IO[bytes], int]:
+    """
+    Copy a UTF-8 ``stream`` into a UTF-32 temporary file.
+
+    Returns the file and the number of characters written to it. Raises
+    ``UnicodeDecodeError`` if the stream is not valid UTF-8 and
+    ``PayloadTooLarge`` past ``max_bytes``.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    spooled = tempfile.TemporaryFile()
+    read = 0
+    try:
+        while True:
+            data = stream.read(chunk_size)
+            if not data:
+                break
+            read += len(data)
+            if read > max_bytes:
+                raise parsers.PayloadTooLarge()
+            spooled.write(decoder.decode(data).encode(ENCODING))
+        spooled.write(decoder.decode(b"", final=True).encode(ENCODING))
+        spooled.flush()
+    except Exception:
+        spooled.close()
+        raise
+    return spooled, spooled.tell() // WIDTH
+
+
+def _decode(view: memoryview) -> str:
+    return view.tobytes().decode(ENCODING)
+
+
+def _tile(size: int) -> memoryview:
+    return memoryview(bytearray(WIDTH * size)).cast("I")
+
+
+def encrypt_chunks(source: memoryview, vueltas: int, chunk_size: int) -> Iterator[str]:
+    """Yield the encrypted ``source`` column by column."""
+    length = len(source)
+    rows, full = scytale.grid(length, vueltas)
+    width = max(1, chunk_size // max(rows, 1))
+    if vueltas * -(-rows // chunk_size) <= -(-vueltas // width) * rows:
+        # Tall grid: each column is a strided read, split every chunk_size rows.
+        for column in range(vueltas):
+            height = rows if column < full else rows - 1
+            for top in range(0, height, chunk_size):
+                bottom = min(top + chunk_size, height)
+                yield _decode(
+                    source[column + top * vueltas : column + bottom * vueltas : vueltas]
+                )
+        return
+
+    # Wide grid: gather `width` short columns into a single tile.
+    for first, last, height in ((0, full, rows), (full, vueltas, rows - 1)):
+        if not height:
+            continue
+        for left in range(first, last, width):
+            right = min(left + width, last)
+            tile = _tile((right - left) * height)
+            for row in range(height):
+                start = row * vueltas
+                tile[row::height] = source[start + left : start + right]
+            yield _decode(tile)
+
+
+def decrypt_chunks(source: memoryview, vueltas: int, chunk_size: int) -> Iterator[str]:
+    """Yield the decrypted ``source`` row by row."""
+    length = len(source)
+    rows, full = scytale.grid(length, vueltas)
+    height = max(1, chunk_size // vueltas)
+    if rows * (2 + vueltas // chunk_size) <= -(-rows // height) * vueltas:
+        # Wide grid: each row is two strided reads, split every chunk_size columns.
+        for row in range(rows):
+            last = vueltas if row < rows - 1 else full
+            for first, stop, step, base in (
+                (0, full, rows, 0),
+                (full, last, rows - 1, full * rows),
+            ):
+                for left in range(first, stop, chunk_size):
+                    right = min(left + chunk_size, stop)
+                    offset = base + (left - first) * step + row
+                    yield _decode(
+                        source[offset : offset + (right - left) * step : step]
+                    )
+        return
+
+    # Tall grid: interleave a block of `height` rows from every column.
+    for top in range(0, rows - 1, height):
+        bottom = min(top + height, rows - 1)
+        tile = _tile((bottom - top) * vueltas)
+        for column in range(vueltas):
+            start = scytale.column_start(column, rows, full)
+            tile[column::vueltas] = source[start + top : start + bottom]
+        yield _decode(tile)
+    if rows:
+        yield _decode(source[rows - 1 : full * rows : rows])
+
+
+CHUNKERS = {scytale.ENCRYPT: encrypt_chunks, scytale.DECRYPT: decrypt_chunks}
+
+
+class SpooledCipher:
+    """
+    Iterable over the ciphered chunks of a spooled message.
+
+    The contexts entered in ``held``, like a client slot, are exited on
+    ``close``, once the response is sent.
+    """
+
+    def __init__(
+        self,
+        spooled: IO[bytes],
+        length: int,
+        chunker: Callable[[memoryview, int, int], Iterator[str]],
+        vueltas: int,
+        chunk_size: int,
+        held: Optional[ExitStack] = None,
+    ):
+        self.spooled = spooled
+        self.length = length
+        self.chunker = chunker
+        self.vueltas = vueltas
+        self.chunk_size = chunk_size
+        self.held = held
+
+    def __iter__(self) -> Iterator[str]:
+        if not self.length:
+            return
+        with mmap.mmap(self.spooled.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as raw, raw.cast("I") as source:
+                yield from self.chunker(source, self.vueltas, self.chunk_size)
+
+    def close(self) -> None:
+        try:
+            self.spooled.close()
+        finally:
+            if self.held is not None:
+                self.held.close()
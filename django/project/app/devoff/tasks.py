@@ -0,0 +1,23 @@
+from django.conf import settings
+
+from celery import shared_task
+
+from app.devoff import backends, limits
+
+
+@shared_task
+def cipher(direction: str, mensaje: str, vueltas: int) -> str:
+    """Runs the Scytale cipher in a worker."""
+    return backends.ciphers()[direction](mensaje, vueltas)
+
+
+def offload(mensaje: str, vueltas: int) -> bool:
+    """Returns whether a message is long or costly enough for a worker."""
+    if 0 < settings.SCYTALE_ASYNC_MIN_LENGTH < len(mensaje):
+        return True
+    return 0 < settings.SCYTALE_COST_ASYNC_MIN < limits.cost(len(mensaje), vueltas)
+
+
+def offloading() -> bool:
+    """Returns whether any message may be offloaded to a worker."""
+    return settings.SCYTALE_ASYNC_MIN_LENGTH > 0 or settings.SCYTALE_COST_ASYNC_MIN > 0
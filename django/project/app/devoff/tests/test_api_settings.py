@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+# NOTE: Settings can't be swapped within the test process, boot a new one.
+SCRIPT = """
+import json, sys
+import django
+
+django.setup()
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+setup_test_environment()
+response = Client().post(
+    "/encrypt",
+    {"mensaje": "Devoff se puso ATR", "vueltas": 4},
+    content_type="application/json",
+)
+print(json.dumps({"status": response.status_code, "body": response.json(),
+                  "modules": sorted(sys.modules)}))
+"""
+
+
+def test_api_settings_boot_slim():
+    """Tests that the API profile serves the cipher without the site's apps."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="app.config.settings.api")
+    env.setdefault("SECRET_KEY", "test")
+    process = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        env=env,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    assert result["status"] == 200
+    assert result["body"] == {"mensaje": "DfesTef oRv p osuA"}
+
+    loaded = set(result["modules"])
+    for module in (
+        "django.contrib.gis",
+        "django.contrib.auth.models",
+        "django.contrib.sessions",
+        "filer",
+        "parler",
+        "crispy_forms",
+    ):
+        assert module not in loaded
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from app.devoff import fastpath, limits, results, throttling
+from app.devoff.asgi import (
+    CipherApplication,
+    LifespanApplication,
+    ThreadPoolWsgiToAsgi,
+    request_meta,
+)
+
+
+def run(coroutine):
+    # NOTE: asyncio.run() needs Python 3.7.
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def fallback(scope, receive, send):
+    await send({"type": "http.response.start", "status": 418, "headers": []})
+    await send({"type": "http.response.body", "body": b"django"})
+
+
+def call(
+    path,
+    body,
+    content_type="application/json",
+    method="POST",
+    headers=(),
+    application_class=CipherApplication,
+):
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(b"content-type", content_type.encode()), *headers],
+        "client": ("127.0.0.1", 50000),
+    }
+    # NOTE: The body comes in two messages, like a chunked request.
+    messages = [
+        {"type": "http.request", "body": body[:5], "more_body": True},
+        {"type": "http.request", "body": body[5:]},
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    run(application_class(fallback)(scope, receive, send))
+    start, body = sent
+    return start["status"], dict(start["headers"]), body["body"]
+
+
+@pytest.mark.parametrize("inline_max_length", [0, 1024])
+def test_cipher(settings, inline_max_length):
+    """Tests that ciphers run inline or in a thread give the same response."""
+    settings.SCYTALE_ASGI_INLINE_MAX_LENGTH = inline_max_length
+    body = json.dumps({"mensaje": "Devoff se puso ATR", "vueltas": 4}).encode()
+
+    status, headers, content = call("/encrypt", body)
+    assert status == 200
+    assert headers[b"content-type"] == b"application/json"
+    assert json.loads(content) == {"mensaje": "DfesTef oRv p osuA"}
+
+
+@pytest.mark.parametrize(
+    "setting, value",
+    [("REDIS_URL", "redis://redis:6379"), ("SCYTALE_ASYNC_MIN_LENGTH", 1000)],
+)
+def test_network_off_the_loop(settings, monkeypatch, setting, value):
+    """Tests that small requests run in a thread when they may wait on Redis."""
+    settings.SCYTALE_ASGI_INLINE_MAX_LENGTH = 1024
+    setattr(settings, setting, value)
+    monkeypatch.setattr(results, "_cache", None)
+    threads = []
+    handle = fastpath.handle
+
+    def record(*args):
+        threads.append(threading.current_thread())
+        return handle(*args)
+
+    monkeypatch.setattr(fastpath, "handle", record)
+    body = json.dumps({"mensaje": "Devoff se puso ATR", "vueltas": 4}).encode()
+    assert call("/encrypt", body)[0] == 200
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_invalid_body():
+    """Tests that validation errors match the regular views."""
+    status, _, content = call("/decrypt", b'{"mensaje": "Devoff", "vueltas": 0}')
+    assert status == 422
+    assert "vueltas" in json.loads(content)
+
+
+def test_oversized_body(settings):
+    """Tests that the body isn't read past SCYTALE_MAX_BODY_SIZE."""
+    settings.SCYTALE_MAX_BODY_SIZE = 4
+    status, _, _ = call("/encrypt", b'{"mensaje": "Devoff", "vueltas": 2}')
+    assert status == 413
+
+
+def test_request_meta():
+    """Tests that the throttles and limits see the request like under WSGI."""
+    scope = {
+        "headers": [
+            (b"content-length", b"42"),
+            (b"authorization", b"Token secret"),
+            (b"x-forwarded-for", b"10.0.0.2"),
+            (b"accept", b"*/*"),
+        ],
+        "client": ("10.0.0.1", 50000),
+    }
+    assert request_meta(scope) == {
+        "REMOTE_ADDR": "10.0.0.1",
+        "CONTENT_LENGTH": "42",
+        "HTTP_AUTHORIZATION": "Token secret",
+        "HTTP_X_FORWARDED_FOR": "10.0.0.2",
+    }
+    assert request_meta({"headers": [], "client": None}) == {"REMOTE_ADDR": ""}
+
+
+def test_throttled(settings, monkeypatch):
+    """Tests that requests are throttled like on the WSGI fast path."""
+    monkeypatch.setattr(throttling, "_buckets", None)
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {"encrypt.ip": "1/min", "decrypt.token": "1/min"},
+    }
+    body = json.dumps({"mensaje": "Devoff se puso ATR", "vueltas": 4}).encode()
+    assert [call("/encrypt", body)[0] for _ in range(2)] == [200, 429]
+    _, headers, _ = call("/encrypt", body)
+    assert 0 < int(headers[b"retry-after"]) <= 60
+
+    token = [(b"authorization", b"Token secret")]
+    assert [call("/decrypt", body, headers=token)[0] for _ in range(2)] == [200, 429]
+    assert call("/decrypt", body)[0] == 200
+
+
+def test_concurrent_requests(settings):
+    """Tests that requests over the client's concurrency get a 429."""
+    settings.SCYTALE_CLIENT_CONCURRENCY = 1
+    body = json.dumps({"mensaje": "Devoff se puso ATR", "vueltas": 4}).encode()
+    with limits.slot("127.0.0.1"):
+        assert call("/encrypt", body)[0] == 429
+    assert call("/encrypt", body)[0] == 200
+    assert limits.in_flight("127.0.0.1") == 0
+
+
+@pytest.mark.parametrize(
+    "path, content_type, method",
+    [
+        ("/", "application/json", "POST"),
+        ("/encrypt", "text/plain", "POST"),
+        ("/encrypt", "application/json", "GET"),
+    ],
+)
+def test_falls_through(path, content_type, method):
+    """Tests that anything but a JSON cipher request reaches Django."""
+    assert call(path, b"{}", content_type, method)[0] == 418
+
+
+def test_without_fast_path():
+    """Tests that without the fast path the cipher routes reach Django."""
+    body = json.dumps({"mensaje": "Devoff se puso ATR", "vueltas": 4}).encode()
+    assert call("/encrypt", body, application_class=LifespanApplication)[0] == 418
+
+
+@pytest.mark.parametrize("application_class", [CipherApplication, LifespanApplication])
+def test_lifespan(application_class):
+    """Tests that startup and shutdown are acknowledged."""
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    run(application_class(fallback)({"type": "lifespan"}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+
+def test_wsgi_in_thread_pool():
+    """Tests that WSGI requests run side by side and their responses are closed."""
+    closed = []
+
+    class Response(list):
+        def close(self):
+            closed.append(True)
+
+    def wsgi_application(environ, start_response):
+        time.sleep(0.2)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return Response([b"dev", b"off"])
+
+    application = ThreadPoolWsgiToAsgi(wsgi_application)
+
+    async def request():
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "query_string": b"",
+            "http_version": "1.1",
+            "headers": [],
+        }
+        sent = []
+
+        async def receive():
+            return {"type": "http.request"}
+
+        async def send(message):
+            sent.append(message)
+
+        await application(scope, receive, send)
+        return sent
+
+    async def requests():
+        return await asyncio.gather(*(request() for _ in range(4)))
+
+    start = time.perf_counter()
+    responses = run(requests())
+    assert time.perf_counter() - start < 0.6
+    for sent in responses:
+        assert sent[0]["status"] == 200
+        assert b"".join(message.get("body", b"") for message in sent[1:]) == b"devoff"
+    assert closed == [True] * 4
@@ -0,0 +1,55 @@
+import random
+
+from django.core.exceptions import ImproperlyConfigured
+
+import pytest
+
+from app.devoff import backends, scytale
+
+
+@pytest.mark.parametrize("backend", sorted(backends.BACKENDS))
+def test_equivalent_to_reference(backend):
+    """Tests every backend against the reference cipher."""
+    ciphers = backends.ciphers(backend)
+    for alphabet in ("Devoff ATR", "Ñandú € 😀 \ud800"):
+        for length in range(0, 30):
+            mensaje = "".join(random.choice(alphabet) for _ in range(length))
+            for vueltas in range(1, length + 3):
+                encrypted = ciphers[scytale.ENCRYPT](mensaje, vueltas)
+                assert encrypted == scytale.encrypt(mensaje, vueltas)
+                assert ciphers[scytale.DECRYPT](encrypted, vueltas) == mensaje
+
+
+def test_cipher_bytes():
+    """Tests the bytes cipher against the reference cipher."""
+    for length in range(0, 30):
+        mensaje = "".join(random.choice("Devoff ATR") for _ in range(length))
+        for vueltas in range(1, length + 3):
+            encrypted = backends.cipher_bytes(mensaje.encode(), vueltas, "encrypt")
+            assert encrypted == scytale.encrypt(mensaje, vueltas).encode()
+            decrypted = backends.cipher_bytes(encrypted, vueltas, "decrypt")
+            assert decrypted == mensaje.encode()
+
+
+def test_backend_from_settings(settings):
+    """Tests that the backend is chosen by settings."""
+    settings.SCYTALE_BACKEND = "buffer"
+    assert backends.ciphers() is backends.BACKENDS["buffer"]
+
+    settings.SCYTALE_BACKEND = "numpy"
+    assert backends.name() == ("numpy" if backends.numpy else "buffer")
+
+    settings.SCYTALE_BACKEND = "fortran"
+    with pytest.raises(ImproperlyConfigured):
+        backends.ciphers()
+
+
+def test_numpy_fallback_warns_once(settings, monkeypatch):
+    """Tests that the missing NumPy is only logged once per process."""
+    warnings = []
+    monkeypatch.setattr(backends, "numpy", None)
+    monkeypatch.setattr(backends, "_warned", False)
+    monkeypatch.setattr(backends.log, "warning", warnings.append)
+    settings.SCYTALE_BACKEND = "numpy"
+    assert [backends.name() for _ in range(3)] == ["buffer"] * 3
+    assert len(warnings) == 1
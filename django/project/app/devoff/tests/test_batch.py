@@ -0,0 +1,56 @@
+from rest_framework.reverse import reverse
+
+
+def test_encrypt_batch(client):
+    """Tests that every item of a batch is encrypted in order."""
+    body = [
+        {"mensaje": "Devoff se puso ATR", "vueltas": 4},
+        {"mensaje": "Devoff se puso ATR!.", "vueltas": 4},
+        {"mensaje": "Devoff se puso ATR", "vueltas": 4},
+    ]
+    response = client.post(
+        reverse("devoff:encrypt_batch"), data=body, content_type="application/json"
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {"mensaje": "DfesTef oRv p osuA"},
+        {"mensaje": "DfesTef oRv p !osuA."},
+        {"mensaje": "DfesTef oRv p osuA"},
+    ]
+
+
+def test_decrypt_batch_item_errors(client):
+    """Tests that invalid items don't fail the whole batch."""
+    body = [
+        {"mensaje": "DfesTef oRv p osuA", "vueltas": 4},
+        {"mensaje": "DfesTef oRv p osuA", "vueltas": "cuatro"},
+        {"vueltas": 2},
+    ]
+    response = client.post(
+        reverse("devoff:decrypt_batch"), data=body, content_type="application/json"
+    )
+    assert response.status_code == 200
+    response_json = response.json()
+    assert response_json[0] == {"mensaje": "Devoff se puso ATR"}
+    assert "vueltas" in response_json[1]["errors"]
+    assert "mensaje" in response_json[2]["errors"]
+
+
+def test_batch_not_a_list(client):
+    """Tests that the batch must be a non-empty list."""
+    for body in ({"mensaje": "Devoff", "vueltas": 2}, []):
+        response = client.post(
+            reverse("devoff:encrypt_batch"), data=body, content_type="application/json"
+        )
+        assert response.status_code == 422
+        assert "non_field_errors" in response.json()
+
+
+def test_batch_max_items(client, settings):
+    """Tests that the batch size is capped."""
+    settings.SCYTALE_BATCH_MAX_ITEMS = 1
+    body = [{"mensaje": "Devoff", "vueltas": 2}] * 2
+    response = client.post(
+        reverse("devoff:encrypt_batch"), data=body, content_type="application/json"
+    )
+    assert response.status_code == 422
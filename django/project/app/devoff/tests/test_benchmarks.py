@@ -0,0 +1,37 @@
+from app.devoff import benchmarks
+from app.devoff.benchmarks import cipher, loadtest
+
+
+def test_compare_threshold():
+    """Tests that only benchmarks over the threshold are regressions."""
+    baseline = {"fast": 1.0, "slow": 1.0, "gone": 1.0}
+    results = {"fast": 1.1, "slow": 1.5, "new": 9.0}
+    regressions = benchmarks.compare(results, baseline, threshold=20)
+    assert [name for name, *_ in regressions] == ["slow"]
+
+
+def test_vueltas_range():
+    """Tests that every size is benchmarked from 1 to len turns."""
+    assert cipher.vueltas_for(10) == [1, 2, 3, 5, 7, 10]
+    assert cipher.vueltas_for(1) == [1]
+
+
+def test_load_sizes_and_routes():
+    """Tests the load harness' size distribution and i18n routes."""
+    assert loadtest.parse_sizes("100:90,1000") == ([100, 1000], [90.0, 1.0])
+    assert loadtest.routes_for([]) == ["/encrypt", "/decrypt"]
+    assert loadtest.routes_for(["en", "es"]) == [
+        "/en/encrypt",
+        "/en/decrypt",
+        "/es/encrypt",
+        "/es/decrypt",
+    ]
+
+
+def test_load_summary():
+    """Tests that errors count towards the error rate but not the latencies."""
+    stats = loadtest.summarize([0.1] * 98 + [1.0, 2.0], errors=25, elapsed=10)
+    assert stats["rps"] == 10
+    assert stats["error_rate"] == 0.2
+    assert stats["p50"] == 0.1
+    assert stats["p99"] == 2.0
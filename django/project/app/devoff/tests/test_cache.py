@@ -0,0 +1,217 @@
+import json
+import time
+
+from django.utils.safestring import SafeString
+
+import pytest
+
+from app.devoff import cache, metrics
+
+OPTIONS = {"LOCAL_ENTRIES": 16, "LOCAL_TIMEOUT": 60, "LOCAL_MAX_LENGTH": 1024}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr(cache, "POLL_SECONDS", 0.05)
+    server = fakeredis.FakeServer()
+    yield server
+    for tier in cache._tiers.values():
+        tier.stop()
+    cache._tiers.clear()
+
+
+@pytest.fixture
+def make_cache(server):
+    import fakeredis
+
+    class FakeTwoTierCache(cache.TwoTierCache):
+        def create_client(self, location):
+            client = fakeredis.FakeStrictRedis(server=server)
+            client.connection_pool.connection_identifier = location
+            return client
+
+    def make(location="redis://fake:6379/1", **options):
+        return FakeTwoTierCache(location, {"OPTIONS": {**OPTIONS, **options}})
+
+    return make
+
+
+def subscribed(backend):
+    tier = backend.tier
+    for _ in range(100):
+        if tier.subscribed:
+            return tier
+        time.sleep(0.01)
+    raise AssertionError("Not subscribed")
+
+
+def eventually(predicate):
+    for _ in range(300):
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("Timed out")
+
+
+@pytest.mark.parametrize(
+    "value", ["mensaje", "\ud800", b"\x00\xff", {"a": [1, None]}, ("a", 1), 2 ** 70]
+)
+def test_serializer(value):
+    """Tests that values round trip with their types, msgpack or not."""
+    serializer = cache.Serializer()
+    result = serializer.deserialize(serializer.serialize(value))
+    assert result == value
+    assert type(result) is type(value)
+
+
+def test_serializer_tags():
+    """Tests that only strings and bytes skip pickle."""
+    serializer = cache.Serializer()
+    assert serializer.serialize("a") == cache.STR + b"a"
+    assert serializer.serialize(b"a") == cache.BYTES + b"a"
+    assert serializer.serialize(SafeString("a"))[:1] == cache.PICKLE
+    assert type(serializer.deserialize(serializer.serialize(SafeString("a")))) is (
+        SafeString
+    )
+
+
+def test_compressor():
+    """Tests that only long, compressible values are compressed."""
+    compressor = cache.Compressor(min_length=100)
+    short, long = b"a" * 99, b"a" * 1000
+    assert compressor.compress(short) == cache.RAW + short
+    assert compressor.compress(long)[:1] == cache.ZLIB
+    assert len(compressor.compress(long)) < 100
+    for value in (short, long):
+        assert compressor.decompress(compressor.compress(value)) == value
+
+
+def test_legacy_values():
+    """Tests that values of the default serializer and compressor are read."""
+    value = {"mensaje": "hola"}
+    pickled = cache.pickle.dumps(value)
+    assert cache.Serializer().deserialize(cache.Compressor().decompress(pickled)) == (
+        value
+    )
+
+
+def test_local_tier(make_cache):
+    """Tests that repeated reads are answered locally."""
+    backend = make_cache()
+    tier = subscribed(backend)
+    backend.set("key", "value")
+    assert backend.get("key") == "value"
+    assert backend.get("key") == "value"
+    assert backend.get("missing") is None
+    assert tier.stats()["local_hits"] == 1
+    assert tier.stats()["remote_hits"] == 1
+    assert tier.stats()["remote_misses"] == 1
+
+    backend.master_client.delete(backend.make_key("key"))
+    assert backend.get("key") == "value"
+
+
+def test_shared_tier(make_cache):
+    """Tests that the cache instances of each thread share the tier."""
+    assert make_cache().tier is make_cache().tier
+    assert make_cache(LOCAL_ENTRIES=0).tier is None
+
+
+def test_local_copies(make_cache):
+    """Tests that local hits return copies of the values."""
+    backend = make_cache()
+    subscribed(backend)
+    backend.set("key", {"a": [1]})
+    backend.get("key")["a"].append(2)
+    backend.get("key")["a"].append(2)
+    assert backend.get("key") == {"a": [1]}
+
+
+def test_own_writes(make_cache):
+    """Tests that writes are seen by the next read of the same process."""
+    backend = make_cache()
+    subscribed(backend)
+    backend.set_many({"a": 1, "b": "b"})
+    assert backend.get_many(["a", "b", "c"]) == {"a": 1, "b": "b"}
+    assert backend.get_many(["a", "b"]) == {"a": 1, "b": "b"}
+    assert backend.tier.stats()["local_hits"] == 2
+
+    backend.incr("a")
+    backend.set("b", "c")
+    assert backend.get_many(["a", "b"]) == {"a": 2, "b": "c"}
+    backend.delete("a")
+    assert backend.get("a") is None
+    backend.add("a", 3)
+    assert backend.get("a") == 3
+    backend.clear()
+    assert backend.get("a") is None
+
+
+def test_invalidation(make_cache):
+    """Tests that writes of other processes are invalidated locally."""
+    backend = make_cache()
+    tier = subscribed(backend)
+    backend.set("key", "old")
+    assert backend.get("key") == "old"
+
+    # NOTE: Written by another process.
+    key = backend.make_key("key")
+    backend.master_client.set(key, backend.prep_value("new"))
+    assert backend.get("key") == "old"
+    backend.master_client.publish(cache.CHANNEL, json.dumps(["other", [key]]))
+    eventually(lambda: backend.get("key") == "new")
+    assert tier.stats()["invalidations"] == 1
+
+    backend.master_client.publish(cache.CHANNEL, json.dumps(["other", None]))
+    eventually(lambda: tier.stats()["invalidations"] == 2)
+    assert tier.get(key) is None
+
+
+def test_stale_fill(make_cache):
+    """Tests that values read before an invalidation aren't kept."""
+    backend = make_cache()
+    tier = subscribed(backend)
+    tier.fetched("key", b"old", -1, tier.generation - 1)
+    assert tier.get("key") is None
+    tier.fetched("key", b"x" * 2048, -1, tier.generation)
+    assert tier.get("key") is None
+
+
+def test_redis_expiry(make_cache):
+    """Tests that values aren't kept locally past their expiry in Redis."""
+    backend = make_cache()
+    subscribed(backend)
+    for name in ("a", "b"):
+        key = backend.make_key(name)
+        backend.master_client.set(key, backend.prep_value(name), px=200)
+    assert backend.get("a") == "a"
+    assert backend.get_many(["b"]) == {"b": "b"}
+    assert backend.tier.get(backend.make_key("a")) == backend.prep_value("a")
+    time.sleep(0.25)
+    assert backend.get("a") is None
+    assert backend.get_many(["b"]) == {}
+
+
+def test_unsubscribed(make_cache):
+    """Tests that the local tier is not used while unsubscribed."""
+    backend = make_cache()
+    tier = subscribed(backend)
+    backend.set("key", "value")
+    backend.get("key")
+    tier.stop()
+    assert not tier.subscribed
+    backend.master_client.set(backend.make_key("key"), backend.prep_value("new"))
+    assert backend.get("key") == "new"
+
+
+def test_metrics(make_cache):
+    """Tests that tier hit rates are exposed."""
+    backend = make_cache()
+    subscribed(backend)
+    backend.set("key", "value")
+    backend.get("key")
+    backend.get("key")
+    exposed = metrics.expose()
+    assert "devoff_redis_cache_local_hit_rate 0.5" in exposed
+    assert "devoff_redis_cache_remote_hit_rate 1.0" in exposed
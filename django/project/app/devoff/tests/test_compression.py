@@ -0,0 +1,118 @@
+import gzip
+import json
+
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff import compression
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(compression, "_cache", None)
+
+
+@pytest.fixture
+def coders(monkeypatch):
+    """Registers fake "br" and "zstd" coders recording their calls."""
+    calls = []
+
+    def coder(name):
+        def compress(content, level):
+            calls.append((name, level))
+            return name.encode() + content[:10]
+
+        return compress
+
+    monkeypatch.setitem(compression.CODERS, "br", coder("br"))
+    monkeypatch.setitem(compression.CODERS, "zstd", coder("zstd"))
+    return calls
+
+
+def encrypt(client, mensaje, **extra):
+    return client.post(
+        reverse("devoff:encrypt"),
+        data={"mensaje": mensaje, "vueltas": 7},
+        content_type="application/json",
+        **extra,
+    )
+
+
+@pytest.mark.parametrize(
+    "header, coding",
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("GZIP, deflate", "gzip"),
+        ("gzip;q=0", None),
+        ("gzip, br", "br"),
+        ("gzip, br;q=0", "gzip"),
+        ("br;q=0.5, zstd;q=0.1", "zstd"),
+        ("*", "zstd"),
+        ("*, zstd;q=0", "br"),
+        ("br;q=x", None),
+    ],
+)
+def test_negotiate(coders, header, coding):
+    """Tests that the preferred accepted coding is picked."""
+    assert compression.negotiate(header) == coding
+
+
+def test_negotiate_installed_only():
+    """Tests that codings are only offered when their package is installed."""
+    assert compression.negotiate("zstd, br, gzip") == (
+        "zstd" if compression.zstandard else "br" if compression.brotli else "gzip"
+    )
+
+
+def test_small_responses(client):
+    """Tests that responses under the threshold are sent as is."""
+    response = encrypt(client, "Devoff se puso ATR", HTTP_ACCEPT_ENCODING="gzip")
+    assert not response.has_header("Content-Encoding")
+
+
+def test_large_responses(client, settings):
+    """Tests that large responses are compressed at the configured level."""
+    mensaje = "Devoff se puso ATR! " * 1000
+    expected = encrypt(client, mensaje).content
+    for level in (1, 9):
+        settings.SCYTALE_COMPRESSION_LEVELS = {"gzip": level}
+        response = encrypt(client, mensaje, HTTP_ACCEPT_ENCODING="gzip")
+        assert response["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response["Vary"]
+        assert int(response["Content-Length"]) == len(response.content)
+        assert gzip.decompress(response.content) == expected
+        assert response.content == compression._gzip(expected, level)
+
+
+def test_compressed_once(client, settings, coders):
+    """Tests that repeated cipher responses are not compressed again."""
+    settings.SCYTALE_COMPRESSION_LEVELS = {"br": 5}
+    mensaje = "Devoff se puso ATR! " * 1000
+    first = encrypt(client, mensaje, HTTP_ACCEPT_ENCODING="br")
+    second = encrypt(client, mensaje, HTTP_ACCEPT_ENCODING="br")
+    assert first["Content-Encoding"] == second["Content-Encoding"] == "br"
+    assert first.content == second.content
+    assert coders == [("br", 5)]
+    assert compression.get_cache().stats() == {"hits": 1, "misses": 1}
+
+    settings.SCYTALE_COMPRESSION_CACHE_MAX_LENGTH = 100
+    compression._cache = None
+    encrypt(client, mensaje, HTTP_ACCEPT_ENCODING="br")
+    assert len(coders) == 2
+
+
+def test_other_responses_not_cached(client, coders):
+    """Tests that only cipher responses go through the cache."""
+    item = {"mensaje": "Devoff se puso ATR! " * 100, "vueltas": 7}
+    for _ in range(2):
+        response = client.post(
+            reverse("devoff:encrypt_batch"),
+            data=json.dumps([item] * 2),
+            content_type="application/json",
+            HTTP_ACCEPT_ENCODING="zstd",
+        )
+        assert response["Content-Encoding"] == "zstd"
+    assert len(coders) == 2
+    assert compression.get_cache().stats() == {"hits": 0, "misses": 0}
@@ -0,0 +1,117 @@
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff import crack, executors, language, scytale
+
+PLAIN = (
+    "El veloz murciélago hindú comía feliz cardillo y kiwi. La cigüeña tocaba "
+    "el saxofón detrás del palenque de paja."
+)
+
+
+def post(client, data):
+    return client.post(
+        reverse("devoff:crack"), data=data, content_type="application/json"
+    )
+
+
+@pytest.mark.parametrize("length", [1, 2, 7, 30, 101])
+def test_prefix(length):
+    """Tests that prefixes match full decryption for every grid shape."""
+    mensaje = PLAIN[:length]
+    for vueltas in range(1, length + 2):
+        decrypted = scytale.decrypt(mensaje, vueltas)
+        for size in [0, 1, 5, length - 1, length, length + 3]:
+            assert crack.prefix(mensaje, vueltas, size) == decrypted[:size]
+
+
+class Sliced(str):
+    """A message counting the characters sliced out of it."""
+
+    sliced = 0
+
+    def __getitem__(self, key):
+        part = super().__getitem__(key)
+        self.sliced += len(part)
+        return part
+
+
+@pytest.mark.parametrize("vueltas", [2, 100, 5000, 9999])
+def test_prefix_slices_sample(vueltas):
+    """Tests that prefixes don't slice more than the sample of the message."""
+    mensaje = Sliced("x" * 10000)
+    crack.prefix(mensaje, vueltas, 50)
+    assert mensaje.sliced <= 50
+
+
+def test_model_prefers_language():
+    """Tests that plaintext scores above its transpositions."""
+    model = language.SPANISH
+    assert model.normalize("ÑANDÚ\nÜber") == "nandu uber"
+    # NOTE: "İ".lower() is two characters long.
+    assert model.normalize("İSTANBUL") == "İstanbul"
+    plain = model.score(model.normalize(PLAIN))
+    for vueltas in range(2, 10):
+        assert plain > model.score(model.normalize(scytale.encrypt(PLAIN, vueltas)))
+
+
+@pytest.mark.parametrize("vueltas", [2, 7, 40, len(PLAIN) - 1])
+def test_crack(client, vueltas):
+    """Tests that the plaintext is the top candidate."""
+    response = post(client, {"mensaje": scytale.encrypt(PLAIN, vueltas), "top": 3})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["candidates"][0]["mensaje"] == PLAIN
+    assert len(data["candidates"]) == 3
+    scores = [candidate["score"] for candidate in data["candidates"]]
+    assert scores == sorted(scores, reverse=True)
+    assert data["searched"] == len(PLAIN) - 2
+    assert data["complete"]
+
+
+def test_too_short(client):
+    """Tests that messages with no candidates get none."""
+    response = post(client, {"mensaje": "ab"})
+    assert response.json() == {"candidates": [], "searched": 0, "complete": True}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {},
+        {"mensaje": ""},
+        {"mensaje": "Devoff", "top": 0},
+        {"mensaje": "Devoff", "top": 21},
+    ],
+)
+def test_invalid(client, data):
+    assert post(client, data).status_code == 422
+
+
+def test_deadline(client, settings):
+    """Tests that the search stops at the deadline with what it found."""
+    settings.SCYTALE_CRACK_DEADLINE = 0
+    response = post(client, {"mensaje": scytale.encrypt(PLAIN, 7)})
+    assert response.json() == {"candidates": [], "searched": 0, "complete": False}
+
+
+def test_budget(client, settings):
+    """Tests that cracking is charged every candidate and the full decryptions."""
+    settings.SCYTALE_COST_MAX = crack.cost(len(PLAIN), 1)
+    assert post(client, {"mensaje": PLAIN, "top": 1}).status_code == 200
+    assert post(client, {"mensaje": PLAIN, "top": 2}).status_code == 413
+
+
+def test_pool(client, settings):
+    """Tests that the pool finds the same candidates as the inline search."""
+    mensaje = scytale.encrypt(PLAIN * 3, 11)
+    inline = post(client, {"mensaje": mensaje}).json()
+
+    settings.SCYTALE_PROCESS_POOL_SIZE = 2
+    settings.SCYTALE_PROCESS_POOL_MIN_LENGTH = 1000
+    executors.prefork()
+    try:
+        assert post(client, {"mensaje": mensaje}).json() == inline
+    finally:
+        executors.shutdown()
+    assert inline["candidates"][0]["mensaje"] == PLAIN * 3
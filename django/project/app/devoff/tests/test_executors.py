@@ -0,0 +1,54 @@
+import statistics
+import threading
+import time
+
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff import executors, scytale
+
+
+@pytest.fixture
+def pool(settings):
+    settings.SCYTALE_PROCESS_POOL_SIZE = 1
+    settings.SCYTALE_PROCESS_POOL_MIN_LENGTH = 1000
+    settings.SCYTALE_RESULT_CACHE = False
+    executors.prefork()
+    yield
+    executors.shutdown()
+
+
+def test_pool_round_trip(pool):
+    """Tests that pooled and inline results match, surrogates included."""
+    mensaje = ("Ñandú \ud800 😀 Devoff se puso ATR" * 100)[:5000]
+    encrypted = executors.run(scytale.ENCRYPT, mensaje, 7)
+    assert encrypted == scytale.encrypt(mensaje, 7)
+    assert executors.run(scytale.DECRYPT, encrypted, 7) == mensaje
+
+
+def test_small_requests_stay_fast(client, pool):
+    """Tests small-request latency while a large job runs in the pool."""
+    body = {"mensaje": "Devoff se puso ATR", "vueltas": 4}
+
+    def post():
+        start = time.perf_counter()
+        response = client.post(
+            reverse("devoff:encrypt"), data=body, content_type="application/json"
+        )
+        assert response.status_code == 200
+        return time.perf_counter() - start
+
+    baseline = statistics.median(post() for _ in range(5))
+
+    large = "Devoff se puso ATR " * 1000 * 1000
+    job = threading.Thread(target=executors.run, args=(scytale.DECRYPT, large, 3))
+    job.start()
+    latencies = []
+    while job.is_alive():
+        latencies.append(post())
+    job.join()
+
+    # NOTE: Handing the message to the pool holds the GIL for a moment, but
+    #       the typical small request doesn't wait for the large one.
+    assert latencies
+    assert statistics.median(latencies) < baseline * 5 + 0.005
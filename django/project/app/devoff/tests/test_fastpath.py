@@ -0,0 +1,49 @@
+import json
+
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff.tests.utils import call
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'{"mensaje": "Devoff se puso ATR", "vueltas": 4}',
+        b'{"mensaje": "DfesTef oRv p osuA", "vueltas": "4"}',
+        b'{"mensaje": "  \\u00d1and\\u00fa  ", "vueltas": 2}',
+        b'{"mensaje": "Devoff", "vueltas": 0}',
+        b'{"mensaje": "", "vueltas": "cuatro"}',
+        b'["Devoff", 4]',
+        b'{"mensaje": "Devoff", "vueltas": NaN}',
+        b"{",
+        b"",
+    ],
+)
+def test_matches_views(client, body):
+    """Tests that the fast path answers exactly like the DRF views."""
+    for name in ("encrypt", "decrypt"):
+        response = client.post(
+            reverse("devoff:{}".format(name)),
+            data=body,
+            content_type="application/json",
+        )
+        status, content = call("/{}".format(name), body)
+        assert status == response.status_code
+        assert json.loads(content) == response.json()
+
+
+def test_oversized_body(settings):
+    """Tests that oversized bodies are rejected without reading them."""
+    settings.SCYTALE_MAX_BODY_SIZE = 4
+    status, content = call("/encrypt", b'{"mensaje": "Devoff", "vueltas": 2}')
+    assert status == 413
+    assert "detail" in json.loads(content)
+
+
+def test_falls_back_to_django():
+    """Tests that other routes, methods and content types reach Django."""
+    body = b'{"mensaje": "Devoff", "vueltas": 2}'
+    assert call("/encrypt/batch", body) == (418, b"django")
+    assert call("/encrypt", body, method="GET") == (418, b"django")
+    assert call("/encrypt", body, content_type="text/plain") == (418, b"django")
@@ -0,0 +1,201 @@
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff import parsers, scytale
+from app.devoff.renderers import JSONRenderer
+
+MENSAJE = "Ñandú über straße"
+
+
+def test_raw_body_and_response(client):
+    """Tests that a raw body gets the bare cipher text back."""
+    response = client.post(
+        reverse("devoff:encrypt") + "?vueltas=4",
+        data=MENSAJE.encode(),
+        content_type="application/octet-stream",
+    )
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/octet-stream"
+    assert response.content.decode() == scytale.encrypt(MENSAJE, 4)
+
+    roundtrip = client.post(
+        reverse("devoff:decrypt"),
+        data=response.content,
+        content_type="application/octet-stream",
+        HTTP_X_VUELTAS="4",
+    )
+    assert roundtrip.content.decode() == MENSAJE
+
+
+@pytest.mark.parametrize("vueltas", [1, 2, 4, 7, 30])
+def test_raw_ascii(client, vueltas):
+    """Tests that ASCII bodies, ciphered as bytes, match the reference."""
+    mensaje = "Devoff se puso ATR!"
+    response = client.post(
+        reverse("devoff:encrypt") + "?vueltas={}".format(vueltas),
+        data=mensaje.encode(),
+        content_type="application/octet-stream",
+    )
+    assert response.content == scytale.encrypt(mensaje, vueltas).encode()
+
+    roundtrip = client.post(
+        reverse("devoff:decrypt") + "?vueltas={}".format(vueltas),
+        data=response.content,
+        content_type="application/octet-stream",
+    )
+    assert roundtrip.content == mensaje.encode()
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [(b"", True), (b"Devoff\x00\x7f", True), (b"\x80", False), ("Ñ".encode(), False)],
+)
+def test_isascii(data, expected):
+    """Tests the ASCII check of raw bodies."""
+    assert parsers.isascii(data) is expected
+    assert parsers.isascii(bytearray(data)) is expected
+
+
+def test_raw_ascii_validation_matches_text(client):
+    """Tests that ASCII bodies are validated like text."""
+    for body, expected in ((b"hola", 200), (b"a\x00b", 422)):
+        responses = [
+            client.post(
+                reverse("devoff:encrypt"),
+                data=data,
+                content_type=content_type,
+                HTTP_X_VUELTAS="2",
+                HTTP_ACCEPT="application/json",
+            )
+            for data, content_type in (
+                (body, "application/octet-stream"),
+                ({"mensaje": body.decode(), "vueltas": 2}, "application/json"),
+            )
+        ]
+        assert [response.status_code for response in responses] == [expected] * 2
+        assert responses[0].json() == responses[1].json()
+
+
+@pytest.mark.parametrize("mensaje", ["a b", "  hola\n", " \t ", " Ñandú "])
+def test_raw_keeps_whitespace(client, mensaje):
+    """Tests that raw bodies are ciphered with their whitespace."""
+    response = client.post(
+        reverse("devoff:encrypt") + "?vueltas=2",
+        data=mensaje.encode(),
+        content_type="application/octet-stream",
+    )
+    assert response.content.decode() == scytale.encrypt(mensaje, 2)
+
+    roundtrip = client.post(
+        reverse("devoff:decrypt") + "?vueltas=2",
+        data=response.content,
+        content_type="application/octet-stream",
+    )
+    assert roundtrip.content.decode() == mensaje
+
+
+def test_raw_matches_json(client):
+    """Tests that the raw and JSON formats cipher alike."""
+    raw = client.post(
+        reverse("devoff:encrypt") + "?vueltas=3",
+        data=MENSAJE.encode(),
+        content_type="application/octet-stream",
+    )
+    as_json = client.post(
+        reverse("devoff:encrypt"),
+        data={"mensaje": MENSAJE, "vueltas": 3},
+        content_type="application/json",
+    )
+    assert raw.content.decode() == as_json.json()["mensaje"]
+
+
+def test_raw_errors_are_json(client):
+    """Tests that validation errors have no raw form and render as JSON."""
+    response = client.post(
+        reverse("devoff:encrypt"),
+        data=MENSAJE.encode(),
+        content_type="application/octet-stream",
+    )
+    assert response.status_code == 422
+    assert response["Content-Type"] == "application/json"
+    assert "vueltas" in response.json()
+
+
+def test_raw_invalid_utf8(client):
+    """Tests that a raw body must be valid text."""
+    response = client.post(
+        reverse("devoff:encrypt") + "?vueltas=2",
+        data=b"\xff\xfe",
+        content_type="application/octet-stream",
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("mensaje", ["Devoff se puso ATR", 'comillas " y \\\n'])
+@pytest.mark.parametrize(
+    "media_type", ["application/json", "application/json; indent=2"]
+)
+def test_json_renders_bytes_as_text(mensaje, media_type):
+    """Tests that ASCII bytes results render exactly like text."""
+    renderer = JSONRenderer()
+    assert renderer.render({"mensaje": mensaje.encode()}, media_type) == (
+        renderer.render({"mensaje": mensaje}, media_type)
+    )
+
+
+def test_accept_overrides_request_format(client):
+    """Tests that the Accept header picks the response format."""
+    response = client.post(
+        reverse("devoff:encrypt"),
+        data={"mensaje": MENSAJE, "vueltas": 3},
+        content_type="application/json",
+        HTTP_ACCEPT="application/octet-stream",
+    )
+    assert response["Content-Type"] == "application/octet-stream"
+    assert response.content.decode() == scytale.encrypt(MENSAJE, 3)
+
+
+def test_msgpack(client):
+    """Tests that msgpack requests get msgpack responses."""
+    msgpack = pytest.importorskip("msgpack")
+    response = client.post(
+        reverse("devoff:encrypt"),
+        data=msgpack.packb({"mensaje": "Devoff se puso ATR", "vueltas": 4}),
+        content_type="application/msgpack",
+    )
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == {"mensaje": "DfesTef oRv p osuA"}
+
+
+def test_msgpack_batch(client):
+    """Tests that the batch endpoints speak msgpack."""
+    msgpack = pytest.importorskip("msgpack")
+    response = client.post(
+        reverse("devoff:encrypt_batch"),
+        data=msgpack.packb([{"mensaje": "Devoff se puso ATR", "vueltas": 4}]),
+        content_type="application/msgpack",
+    )
+    assert response.status_code == 200
+    assert msgpack.unpackb(response.content) == [{"mensaje": "DfesTef oRv p osuA"}]
+
+
+def test_msgpack_malformed(client):
+    """Tests that a malformed msgpack body is a parse error."""
+    pytest.importorskip("msgpack")
+    response = client.post(
+        reverse("devoff:encrypt"), data=b"\xc1", content_type="application/msgpack"
+    )
+    assert response.status_code == 400
+
+
+def test_msgpack_non_ascii_bin(client):
+    """Tests that a msgpack bin message that isn't ASCII is a validation error."""
+    msgpack = pytest.importorskip("msgpack")
+    response = client.post(
+        reverse("devoff:encrypt"),
+        data=msgpack.packb({"mensaje": b"\xff\xfeDevoff", "vueltas": 3}),
+        content_type="application/msgpack",
+    )
+    assert response.status_code == 422
+    assert "mensaje" in msgpack.unpackb(response.content)
@@ -76,3 +76,13 @@ def test_decrypt_2(client):
     response_json = response.json()
     assert "mensaje" in response_json
     assert response_json["mensaje"] == "Devoff se puso ATR!."
+
+
+def test_decrypt_vueltas_zero(client):
+    """Tests that 'vueltas' must be positive."""
+    body = {"mensaje": "DfesTef oRv p osuA", "vueltas": 0}
+    response = client.post(
+        reverse("devoff:decrypt"), data=body, content_type="application/json",
+    )
+    assert response.status_code == 422
+    assert "vueltas" in response.json()
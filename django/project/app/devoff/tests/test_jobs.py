@@ -0,0 +1,54 @@
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff.tests.utils import call
+
+
+@pytest.fixture
+def offload(settings):
+    # NOTE: Without REDIS_URL Celery runs tasks eagerly (see settings).
+    settings.SCYTALE_ASYNC_MIN_LENGTH = 10
+
+
+def test_large_message_becomes_a_job(client, offload):
+    """Tests that large messages are submitted and can be polled."""
+    body = {"mensaje": "Devoff se puso ATR", "vueltas": 4}
+    response = client.post(
+        reverse("devoff:encrypt"), data=body, content_type="application/json"
+    )
+    assert response.status_code == 202
+    job = response.json()["job"]
+    assert response["Location"] == reverse("devoff:job", args=[job])
+
+    response = client.get(response["Location"])
+    assert response.status_code == 200
+    assert response.json() == {
+        "job": job,
+        "status": "SUCCESS",
+        "mensaje": "DfesTef oRv p osuA",
+    }
+
+
+def test_small_message_is_inline(client, offload):
+    """Tests that messages under the threshold are answered right away."""
+    body = {"mensaje": "Devoff", "vueltas": 2}
+    response = client.post(
+        reverse("devoff:encrypt"), data=body, content_type="application/json"
+    )
+    assert response.status_code == 200
+    assert response.json() == {"mensaje": "Dvfeof"}
+
+
+def test_fast_path_submits_jobs(offload):
+    """Tests that the WSGI fast path offloads the same messages."""
+    status, content = call(
+        "/decrypt", b'{"mensaje": "DfesTef oRv p osuA", "vueltas": 4}'
+    )
+    assert status == 202
+
+
+def test_unknown_job_is_pending(client):
+    """Tests polling a job id that was never submitted."""
+    job = "6f1c6b2e-0000-4000-8000-000000000000"
+    response = client.get(reverse("devoff:job", args=[job]))
+    assert response.json() == {"job": job, "status": "PENDING"}
@@ -0,0 +1,166 @@
+import json
+from types import SimpleNamespace
+
+from django.core.cache import cache
+
+import pytest
+from rest_framework.exceptions import Throttled
+from rest_framework.reverse import reverse
+
+from app.devoff import limits, scytale
+from app.devoff.parsers import StreamingJSONParser
+from app.devoff.tests.utils import Stream, call
+
+MENSAJE = "Devoff se puso ATR"
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def encrypt(client, mensaje, vueltas):
+    return client.post(
+        reverse("devoff:encrypt"),
+        data={"mensaje": mensaje, "vueltas": vueltas},
+        content_type="application/json",
+    )
+
+
+@pytest.mark.parametrize(
+    "vueltas", [1, len(MENSAJE) - 1, len(MENSAJE), len(MENSAJE) + 1, 10 ** 30]
+)
+def test_vueltas_edges(client, vueltas):
+    """Tests that any positive vueltas is served, up to huge ones."""
+    response = encrypt(client, MENSAJE, vueltas)
+    assert response.status_code == 200
+    assert response.json() == {"mensaje": scytale.encrypt(MENSAJE, vueltas)}
+
+
+@pytest.mark.parametrize("vueltas", [0, -1, "1.5", "", None, "9" * 2000])
+def test_invalid_vueltas(client, vueltas):
+    """Tests that invalid vueltas never reach the cipher."""
+    response = encrypt(client, MENSAJE, vueltas)
+    assert response.status_code in (400, 422)
+
+
+@pytest.mark.parametrize(
+    "length, vueltas, steps",
+    [(0, 1, 0), (10, 1, 1), (10, 10, 1), (100, 10, 10), (100, 3, 3), (10, 10 ** 30, 1)],
+)
+def test_cost(settings, length, vueltas, steps):
+    """Tests that the cost counts the steps along the shorter side."""
+    assert (
+        limits.cost(length, vueltas) == length + settings.SCYTALE_COST_PER_STEP * steps
+    )
+
+
+@pytest.mark.parametrize("vueltas", [1, 4, len(MENSAJE)])
+def test_budget_edges(client, settings, vueltas):
+    """Tests that requests costing exactly the budget pass and no more."""
+    settings.SCYTALE_COST_MAX = limits.cost(len(MENSAJE), vueltas)
+    assert encrypt(client, MENSAJE, vueltas).status_code == 200
+    body = json.dumps({"mensaje": MENSAJE, "vueltas": vueltas}).encode()
+    assert call("/encrypt", body)[0] == 200
+
+    settings.SCYTALE_COST_MAX -= 1
+    response = encrypt(client, MENSAJE, vueltas)
+    assert response.status_code == 413
+    assert response.json()["detail"] == limits.CostExceeded.default_detail
+    assert call("/encrypt", body)[0] == 413
+
+
+def test_batch_budget(client, settings):
+    """Tests that batches are charged the cost of all their items."""
+    settings.SCYTALE_COST_MAX = 2 * limits.cost(len(MENSAJE), 4) - 1
+    item = {"mensaje": MENSAJE, "vueltas": 4}
+    response = client.post(
+        reverse("devoff:encrypt_batch"),
+        data=[item, item],
+        content_type="application/json",
+    )
+    assert response.status_code == 413
+
+
+def test_rejected_before_reading(settings):
+    """Tests that a costly body is rejected before its message is read."""
+    body = b'{"vueltas": 2, "mensaje": "' + b"x" * 10000 + b'"}'
+    settings.SCYTALE_STREAM_CHUNK_SIZE = 16
+    # NOTE: Within the budget until vueltas is read.
+    length = len(body) // limits.MAX_BYTES_PER_CHARACTER
+    settings.SCYTALE_COST_MAX = limits.cost(length, 2) - 1
+    stream = Stream(body)
+    context = {"request": SimpleNamespace(META={"CONTENT_LENGTH": len(body)})}
+    with pytest.raises(limits.CostExceeded):
+        StreamingJSONParser().parse(stream, parser_context=context)
+    assert stream.consumed < 100
+
+    status, content = call("/encrypt", body)
+    assert status == 413
+
+
+@pytest.mark.parametrize("character", ["Ñ", "\U0001f600"])
+def test_body_bound_is_conservative(settings, character):
+    """Tests that escaped characters are not overcharged before parsing."""
+    mensaje = character * 100
+    body = json.dumps({"mensaje": mensaje, "vueltas": 2}).encode()
+    settings.SCYTALE_COST_MAX = limits.cost(len(mensaje), 2)
+    assert len(body) > settings.SCYTALE_COST_MAX
+    assert call("/encrypt", body)[0] == 200
+
+
+def test_costly_requests_become_jobs(client, settings):
+    """Tests that requests over the async cost are queued."""
+    # NOTE: Without REDIS_URL Celery runs tasks eagerly (see settings).
+    settings.SCYTALE_COST_ASYNC_MIN = limits.cost(len(MENSAJE), 4) - 1
+    assert encrypt(client, MENSAJE, 4).status_code == 202
+    assert encrypt(client, MENSAJE, 1).status_code == 200
+
+
+@pytest.mark.parametrize("num_proxies, expected", [(0, "10.0.0.1"), (1, "10.0.0.3")])
+def test_client(settings, num_proxies, expected):
+    """Tests that clients can't pick their address with X-Forwarded-For."""
+    settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, "NUM_PROXIES": num_proxies}
+    meta = {"REMOTE_ADDR": "10.0.0.1", "HTTP_X_FORWARDED_FOR": "10.0.0.2, 10.0.0.3"}
+    assert limits.client(meta) == expected
+
+
+def test_slots(settings):
+    """Tests that clients hold at most their slots and get them back."""
+    settings.SCYTALE_CLIENT_CONCURRENCY = 2
+    with limits.slot("10.0.0.1"), limits.slot("10.0.0.1"):
+        assert limits.in_flight("10.0.0.1") == 2
+        with pytest.raises(Throttled):
+            with limits.slot("10.0.0.1"):
+                pass
+        with limits.slot("10.0.0.2"):
+            pass
+    assert limits.in_flight("10.0.0.1") == 0
+
+    with pytest.raises(RuntimeError):
+        with limits.slot("10.0.0.1"):
+            raise RuntimeError
+    assert limits.in_flight("10.0.0.1") == 0
+
+
+def test_expired_slot(settings):
+    """Tests that slots expiring while held are let go quietly."""
+    settings.SCYTALE_CLIENT_CONCURRENCY = 1
+    with limits.slot("10.0.0.1"):
+        cache.delete(limits.KEY_PREFIX + "10.0.0.1")
+    with limits.slot("10.0.0.1"):
+        pass
+
+
+def test_concurrent_requests(client, settings):
+    """Tests that requests over the client's concurrency get a 429."""
+    settings.SCYTALE_CLIENT_CONCURRENCY = 1
+    body = json.dumps({"mensaje": MENSAJE, "vueltas": 4}).encode()
+    with limits.slot("127.0.0.1"):
+        assert encrypt(client, MENSAJE, 4).status_code == 429
+        with limits.slot(""):
+            assert call("/encrypt", body)[0] == 429
+    assert encrypt(client, MENSAJE, 4).status_code == 200
+    assert call("/encrypt", body)[0] == 200
@@ -0,0 +1,145 @@
+import json
+import re
+
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff import metrics
+
+
+def sample(text, name, **labels):
+    """Returns the value of a sample in an exposition, or None."""
+    label_text = ",".join('{}="{}"'.format(k, v) for k, v in labels.items())
+    pattern = r"^{}{} (\S+)$".format(
+        re.escape(name), re.escape("{" + label_text + "}" if labels else "")
+    )
+    match = re.search(pattern, text, re.MULTILINE)
+    return None if match is None else float(match.group(1))
+
+
+def test_histogram_exposition():
+    """Tests that buckets are cumulative and end with +Inf."""
+    histogram = metrics.Histogram("test_seconds", "Test.", (0.1, 1), ("kind",))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, "a")
+
+    text = metrics.expose([histogram])
+    assert "# TYPE test_seconds histogram" in text
+    assert sample(text, "test_seconds_bucket", kind="a", le="0.1") == 1
+    assert sample(text, "test_seconds_bucket", kind="a", le="1.0") == 2
+    assert sample(text, "test_seconds_bucket", kind="a", le="+Inf") == 3
+    assert sample(text, "test_seconds_count", kind="a") == 3
+    assert sample(text, "test_seconds_sum", kind="a") == 5.55
+
+
+def test_label_values_are_escaped():
+    """Tests that quotes, backslashes and newlines can't break the format."""
+    counter = metrics.Counter("test_total", "Test.", ("name",))
+    counter.inc('a"b\\c\nd')
+    assert 'test_total{name="a\\"b\\\\c\\nd"} 1.0' in metrics.expose([counter])
+
+
+@pytest.fixture
+def token(settings):
+    settings.SCYTALE_METRICS_TOKEN = "secret"
+    return {"HTTP_AUTHORIZATION": "Bearer secret"}
+
+
+@pytest.fixture
+def shared(settings, tmp_path, monkeypatch):
+    """Shares the metrics of this process in a temporary directory."""
+    monkeypatch.setattr(metrics, "_shared", None)
+    monkeypatch.setattr(metrics.atexit, "register", lambda *args: None)
+    settings.SCYTALE_METRICS_DIR = str(tmp_path)
+    settings.SCYTALE_METRICS_WRITE_SECONDS = 3600
+    metrics.share()
+    return tmp_path
+
+
+def test_cipher_request_is_measured(client, token):
+    """Tests that a request records its latency, size and stages."""
+    before = metrics.expose()
+    response = client.post(
+        reverse("devoff:encrypt"),
+        data={"mensaje": "Devoff se puso ATR", "vueltas": 4},
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+
+    response = client.get(reverse("devoff:metrics"), **token)
+    assert response.status_code == 200
+    assert response["Content-Type"] == metrics.CONTENT_TYPE
+    text = response.content.decode()
+
+    def delta(name, **labels):
+        return (sample(text, name, **labels) or 0) - (
+            sample(before, name, **labels) or 0
+        )
+
+    assert delta("devoff_requests_total", endpoint="encrypt", status="200") == 1
+    assert delta("devoff_request_seconds_count", endpoint="encrypt") == 1
+    assert delta("devoff_message_chars_sum", endpoint="encrypt") == 18
+    for stage in ("parse", "validate", "cipher", "render", "compress", "middleware"):
+        assert delta("devoff_stage_seconds_count", endpoint="encrypt", stage=stage) == 1
+
+
+# NOTE: 404 responses go through RedirectFallbackMiddleware, which queries.
+@pytest.mark.django_db
+def test_metrics_can_be_disabled(client, settings):
+    """Tests that /metrics is not found when metrics are disabled."""
+    settings.SCYTALE_METRICS = False
+    response = client.get(reverse("devoff:metrics"))
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "metrics_token, authorization",
+    [
+        ("", ""),
+        ("", "Bearer "),
+        ("secret", ""),
+        ("secret", "Bearer wrong"),
+        ("secret", "Bearer señal"),
+    ],
+)
+def test_metrics_need_the_token(client, settings, metrics_token, authorization):
+    """Tests that /metrics is only exposed to requests with the token."""
+    settings.SCYTALE_METRICS_TOKEN = metrics_token
+    response = client.get(reverse("devoff:metrics"), HTTP_AUTHORIZATION=authorization)
+    assert response.status_code == 404
+
+
+def test_workers_are_added_up(shared):
+    """Tests that the metrics other workers wrote are added to this one's."""
+    before = metrics.expose()
+    other = {
+        metrics.REQUESTS.name: [[["encrypt", "200"], 2]],
+        metrics.MESSAGE_CHARS.name: [
+            [["encrypt"], [[1] + [0] * len(metrics.CHARS_BUCKETS), 5.0]]
+        ],
+    }
+    (shared / "1-other.json").write_text(json.dumps(other))
+    (shared / "2-other.json.tmp").write_text("{")
+    text = metrics.expose()
+
+    def delta(name, **labels):
+        return (sample(text, name, **labels) or 0) - (
+            sample(before, name, **labels) or 0
+        )
+
+    assert delta("devoff_requests_total", endpoint="encrypt", status="200") == 2
+    assert delta("devoff_message_chars_count", endpoint="encrypt") == 1
+    assert delta("devoff_message_chars_bucket", endpoint="encrypt", le="10.0") == 1
+    assert delta("devoff_message_chars_sum", endpoint="encrypt") == 5
+
+
+def test_own_metrics_are_written(shared):
+    """Tests that exposing writes this worker's metrics first."""
+    metrics.REQUESTS.inc("encrypt", "200")
+    metrics.expose()
+    (path,) = shared.glob("*.json")
+    written = json.loads(path.read_text())[metrics.REQUESTS.name]
+    assert [["encrypt", "200"], metrics.REQUESTS.values()[("encrypt", "200")]] in (
+        written
+    )
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+from rest_framework.exceptions import ParseError
+from rest_framework.reverse import reverse
+
+from app.devoff import scytale
+from app.devoff.parsers import FieldError, PayloadTooLarge, StreamingJSONParser, isascii
+from app.devoff.tests.utils import Stream
+
+
+def parse(body: bytes):
+    return StreamingJSONParser().parse(Stream(body), parser_context={})
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(settings):
+    # NOTE: Tiny chunks split every token across reads.
+    settings.SCYTALE_STREAM_CHUNK_SIZE = 3
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'{"mensaje": "Devoff se puso ATR", "vueltas": 4}',
+        b' {\n"vueltas" : "4" ,"mensaje":"Devoff"}\n',
+        b'{"mensaje": "comillas \\" y \\\\", "vueltas": 2}',
+        b'{"mensaje": "\\\\", "vueltas": 2}',
+        b'{"mensaje": "\\u00d1and\\u00fa \\ud83d\\ude00", "vueltas": 2}',
+        '{"mensaje": "Ñandú über 😀", "vueltas": 2}'.encode(),
+        b'{"mensaje": 12, "vueltas": 2, "extra": {"a": [1, "]}\\"", null]}}',
+        b'{"mensaje": "a", "mensaje": "b", "vueltas": 1.0}',
+        b"{}",
+        b'["Devoff", 4]',
+        b'"Devoff"',
+    ],
+)
+def test_matches_json(body):
+    """Tests that bodies parse to the same data as with json.loads."""
+    assert parse(body) == json.loads(body)
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"{",
+        b'{"mensaje": "Devoff',
+        b'{"mensaje": "Devoff", }',
+        b'{"mensaje" "Devoff"}',
+        b'{"mensaje": "Dev\x01off"}',
+        b'{"mensaje": "\\x"}',
+        b'{"mensaje": "Devoff"} []',
+        b'{"mensaje": "Devoff", "vueltas": NaN}',
+        b'{"mensaje": "Devoff", "extra": "' + b"x" * 5000 + b'"}',
+        b"",
+    ],
+)
+def test_malformed(body):
+    """Tests that malformed bodies are rejected."""
+    with pytest.raises(ParseError):
+        parse(body)
+
+
+def test_vueltas_rejected_early():
+    """Tests that an invalid vueltas fails before reading the message."""
+    stream = Stream(b'{"vueltas": 0, "mensaje": "' + b"x" * 10000 + b'"}')
+    with pytest.raises(FieldError) as info:
+        StreamingJSONParser().parse(stream, parser_context={})
+    assert stream.consumed < 100
+    assert info.value.status_code == 422
+    assert list(info.value.detail) == ["vueltas"]
+
+
+def test_oversized_body(client, settings):
+    """Tests that oversized bodies get a 413, with or without a length."""
+    settings.SCYTALE_MAX_BODY_SIZE = 32
+    body = json.dumps({"mensaje": "x" * 100, "vueltas": 2})
+    response = client.post(
+        reverse("devoff:encrypt"), data=body, content_type="application/json"
+    )
+    assert response.status_code == 413
+
+    with pytest.raises(PayloadTooLarge):
+        parse(body.encode())
+
+
+@pytest.mark.parametrize("mensaje", ["Devoff se puso ATR!" * 10, "Ñandú" * 40])
+def test_long_messages(client, settings, mensaje):
+    """Tests that messages too long for the result cache cipher alike."""
+    settings.SCYTALE_RESULT_CACHE_MAX_LENGTH = 16
+    data = parse(json.dumps({"mensaje": mensaje, "vueltas": 7}).encode())
+    ascii = isascii(mensaje.encode())
+    assert isinstance(data["mensaje"], bytearray if ascii else str)
+
+    response = client.post(
+        reverse("devoff:encrypt"),
+        data={"mensaje": mensaje, "vueltas": 7},
+        content_type="application/json",
+    )
+    assert response.status_code == 200
+    assert response.json() == {"mensaje": scytale.encrypt(mensaje, 7)}
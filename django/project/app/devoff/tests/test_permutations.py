@@ -0,0 +1,54 @@
+from app.devoff import permutations, scytale
+
+
+def test_tables_match_cipher():
+    """Tests that gathering over a table equals the sliced cipher."""
+    for length in range(0, 30):
+        mensaje = "".join(chr(97 + index % 26) for index in range(length))
+        for vueltas in range(1, length + 3):
+            table = permutations.encrypt_table(length, vueltas)
+            assert permutations.gather(mensaje, table) == scytale.encrypt(
+                mensaje, vueltas
+            )
+            table = permutations.decrypt_table(length, vueltas)
+            assert permutations.gather(mensaje, table) == scytale.decrypt(
+                mensaje, vueltas
+            )
+
+
+def test_cache_counters():
+    """Tests hits, misses and evictions of the LRU."""
+    # Room for exactly two tables of 10 characters.
+    cache = permutations.PermutationCache(max_bytes=80)
+    build = lambda: permutations.encrypt_table(10, 3)  # noqa: E731
+
+    first = cache.get(("a", 10, 3), build)
+    assert cache.get(("a", 10, 3), build) is first
+    cache.get(("b", 10, 3), build)
+    cache.get(("c", 10, 3), build)
+
+    assert cache.stats() == {
+        "entries": 2,
+        "bytes": 80,
+        "max_bytes": 80,
+        "hits": 1,
+        "misses": 3,
+        "evictions": 1,
+    }
+
+
+def test_cache_skips_oversized_tables():
+    """Tests that tables over the memory ceiling are never stored."""
+    cache = permutations.PermutationCache(max_bytes=8)
+    cache.get("key", lambda: permutations.encrypt_table(10, 3))
+    assert cache.stats()["entries"] == 0
+
+
+def test_permutation_uses_settings(settings):
+    """Tests that the process cache is sized from settings."""
+    settings.SCYTALE_PERMUTATION_CACHE_BYTES = 1024
+    permutations._cache = None
+    table = permutations.permutation(permutations.DECRYPT, 18, 4)
+    assert permutations.gather("DfesTef oRv p osuA", table) == "Devoff se puso ATR"
+    assert permutations.get_cache().max_bytes == 1024
+    permutations._cache = None
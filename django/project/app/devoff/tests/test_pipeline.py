@@ -0,0 +1,112 @@
+import itertools
+
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff import backends, limits, permutations, pipeline, scytale
+from app.devoff.scytale import DECRYPT, ENCRYPT
+
+MENSAJE = "Ñandú 😀 Devoff se puso ATR!"
+
+
+def sequential(mensaje, steps):
+    for direction, vueltas in steps:
+        mensaje = scytale.CIPHERS[direction](mensaje, vueltas)
+    return mensaje
+
+
+def post(client, data, **extra):
+    return client.post(
+        reverse("devoff:pipeline"), data=data, content_type="application/json", **extra
+    )
+
+
+@pytest.mark.parametrize("backend", sorted(backends.BACKENDS))
+def test_matches_sequential(settings, backend):
+    """Tests that pipelines equal applying their steps one by one."""
+    settings.SCYTALE_BACKEND = backend
+    settings.SCYTALE_RESULT_CACHE = False
+    for length in [0, 1, 2, 7, len(MENSAJE)]:
+        mensaje = MENSAJE[:length]
+        steps = list(itertools.product([ENCRYPT, DECRYPT], [1, 2, 3, 5, length + 1]))
+        for count in range(4):
+            for chosen in itertools.combinations(steps, count):
+                assert pipeline.run(mensaje, chosen) == sequential(mensaje, chosen)
+
+
+@pytest.mark.parametrize(
+    "steps, simplified",
+    [
+        ([], ()),
+        ([(ENCRYPT, 1), (DECRYPT, 10), (ENCRYPT, 11)], ()),
+        ([(ENCRYPT, 3), (DECRYPT, 3)], ()),
+        ([(ENCRYPT, 3), (ENCRYPT, 4), (DECRYPT, 4), (DECRYPT, 3)], ()),
+        ([(ENCRYPT, 3), (ENCRYPT, 3)], ((ENCRYPT, 3), (ENCRYPT, 3))),
+        ([(ENCRYPT, 3), (DECRYPT, 4)], ((ENCRYPT, 3), (DECRYPT, 4))),
+    ],
+)
+def test_simplify(steps, simplified):
+    """Tests that steps leaving the message as is are dropped."""
+    assert pipeline.simplify(steps, 10) == simplified
+
+
+@pytest.mark.skipif(backends.numpy is None, reason="NumPy is not installed")
+def test_composed_table_is_cached(settings):
+    """Tests that a pipeline is composed once per length and steps."""
+    settings.SCYTALE_BACKEND = "numpy"
+    cache = permutations.get_cache()
+    cache.clear()
+    steps = ((ENCRYPT, 3), (ENCRYPT, 4), (DECRYPT, 2))
+    for _ in range(3):
+        assert pipeline.run(MENSAJE, steps) == sequential(MENSAJE, steps)
+    key = ("pipeline", len(MENSAJE), steps)
+    assert key in cache._tables
+    assert permutations.gather(MENSAJE, cache._tables[key]) == sequential(
+        MENSAJE, steps
+    )
+
+
+def test_pipeline_view(client):
+    """Tests that the endpoint runs the steps in order."""
+    steps = [
+        {"direction": "encrypt", "vueltas": 3},
+        {"direction": "encrypt", "vueltas": "4"},
+        {"direction": "decrypt", "vueltas": 2},
+    ]
+    response = post(client, {"mensaje": MENSAJE, "steps": steps})
+    assert response.status_code == 200
+    expected = sequential(MENSAJE, [(ENCRYPT, 3), (ENCRYPT, 4), (DECRYPT, 2)])
+    assert response.json() == {"mensaje": expected}
+
+    response = post(
+        client,
+        {"mensaje": MENSAJE, "steps": steps},
+        HTTP_ACCEPT="application/octet-stream",
+    )
+    assert response.content == expected.encode()
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"mensaje": MENSAJE},
+        {"mensaje": MENSAJE, "steps": []},
+        {"mensaje": MENSAJE, "steps": [{"direction": "rot13", "vueltas": 2}]},
+        {"mensaje": MENSAJE, "steps": [{"direction": "encrypt", "vueltas": 0}]},
+        {"mensaje": "", "steps": [{"direction": "encrypt", "vueltas": 2}]},
+        {"mensaje": MENSAJE, "steps": [{"direction": "encrypt", "vueltas": 2}] * 33},
+    ],
+)
+def test_invalid(client, data):
+    assert post(client, data).status_code == 422
+
+
+def test_budget(client, settings):
+    """Tests that pipelines are charged every step that is run."""
+    steps = [{"direction": "encrypt", "vueltas": vueltas} for vueltas in (2, 3)]
+    settings.SCYTALE_COST_MAX = limits.cost(len(MENSAJE), 2) + limits.cost(
+        len(MENSAJE), 3
+    )
+    assert post(client, {"mensaje": MENSAJE, "steps": steps}).status_code == 200
+    settings.SCYTALE_COST_MAX -= 1
+    assert post(client, {"mensaje": MENSAJE, "steps": steps}).status_code == 413
@@ -0,0 +1,88 @@
+from django.core.management import call_command
+
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff import profiling
+
+
+@pytest.fixture
+def profiles(settings, tmp_path):
+    settings.SCYTALE_PROFILE_DIR = str(tmp_path)
+    settings.SCYTALE_PROFILE_RATE = 0.0
+    settings.SCYTALE_PROFILE_TOKEN = "secret"
+    settings.SCYTALE_PROFILE_KEEP = 3
+    return settings
+
+
+def encrypt(client, **extra):
+    return client.post(
+        reverse("devoff:encrypt"),
+        data={"mensaje": "Devoff se puso ATR", "vueltas": 4},
+        content_type="application/json",
+        **extra,
+    )
+
+
+def test_profile_on_header(client, profiles):
+    """Tests that a request with the token header is profiled."""
+    response = encrypt(client, HTTP_X_SCYTALE_PROFILE="secret")
+    assert response.status_code == 200
+
+    profile_id = response["X-Scytale-Profile-Id"]
+    assert profiling.ids() == [profile_id]
+    info = profiling.info(profile_id)
+    assert info["endpoint"] == "encrypt"
+    assert info["scytale"] == {"length": 18, "vueltas": 4}
+    assert "encrypt" in profiling.render(profile_id)
+
+
+def test_unwritable_profile_dir(client, profiles, tmp_path, caplog):
+    """Tests that a profile that can't be saved doesn't fail the request."""
+    (tmp_path / "file").write_text("")
+    profiles.SCYTALE_PROFILE_DIR = str(tmp_path / "file" / "profiles")
+    response = encrypt(client, HTTP_X_SCYTALE_PROFILE="secret")
+    assert response.status_code == 200
+    assert "X-Scytale-Profile-Id" not in response
+    assert "Could not save the profile" in caplog.text
+
+
+def test_wrong_token_is_not_profiled(client, profiles):
+    """Tests that only the configured token triggers a profile."""
+    response = encrypt(client, HTTP_X_SCYTALE_PROFILE="guess")
+    assert "X-Scytale-Profile-Id" not in response
+    assert profiling.ids() == []
+
+
+def test_non_ascii_token_is_not_profiled(client, profiles):
+    """Tests that a header that isn't ASCII is a wrong token, not an error."""
+    response = encrypt(client, HTTP_X_SCYTALE_PROFILE="señal")
+    assert response.status_code == 200
+    assert "X-Scytale-Profile-Id" not in response
+    assert profiling.ids() == []
+
+
+def test_sampled_requests_are_bounded(client, profiles):
+    """Tests that the ring buffer keeps only the newest profiles."""
+    profiles.SCYTALE_PROFILE_RATE = 1.0
+    for _ in range(5):
+        encrypt(client)
+    assert len(profiling.ids()) == 3
+    assert len(list(profiling.directory().glob("*.json"))) == 3
+
+
+def test_profiles_command(client, profiles, capsys):
+    """Tests that the command lists and renders the profiles."""
+    profile_id = encrypt(client, HTTP_X_SCYTALE_PROFILE="secret")[
+        "X-Scytale-Profile-Id"
+    ]
+
+    call_command("profiles")
+    assert "length=18 vueltas=4" in capsys.readouterr().out
+
+    call_command("profiles", "latest", "--collapsed")
+    lines = capsys.readouterr().out.splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    call_command("profiles", profile_id, "--sort", "tottime", "--limit", "5")
+    assert "function calls" in capsys.readouterr().out
@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from rest_framework.reverse import reverse
+
+BODY = {"mensaje": "Devoff se puso ATR", "vueltas": 4}
+
+
+@pytest.mark.parametrize(
+    "name, data, content_type, extra",
+    [
+        ("devoff:encrypt", BODY, "application/json", {}),
+        ("devoff:decrypt", BODY, "application/json", {}),
+        ("devoff:encrypt", {"vueltas": 0}, "application/json", {}),
+        ("devoff:encrypt_batch", [BODY, BODY], "application/json", {}),
+        ("devoff:encrypt", b"Devoff", "application/octet-stream", {}),
+        # NOTE: A token must not be looked up on the cipher routes.
+        (
+            "devoff:encrypt",
+            BODY,
+            "application/json",
+            {"HTTP_AUTHORIZATION": "Token 0123456789abcdef"},
+        ),
+    ],
+)
+@pytest.mark.django_db
+def test_cipher_routes_dont_query(
+    client, django_assert_num_queries, name, data, content_type, extra
+):
+    """Tests that the cipher routes never touch the database."""
+    url = reverse(name)
+    if content_type == "application/octet-stream":
+        url += "?vueltas=2"
+    with django_assert_num_queries(0):
+        response = client.post(url, data=data, content_type=content_type, **extra)
+    assert response.status_code in (200, 422)
+
+
+# NOTE: Runs in a new process, the test database is already connected here.
+SCRIPT = """
+import io, json
+from django.conf import settings
+from django.db import connections
+
+import app.config.wsgi
+
+body = json.dumps({"mensaje": "Devoff se puso ATR", "vueltas": 4}).encode()
+environ = {
+    "REQUEST_METHOD": "POST",
+    "PATH_INFO": "/encrypt",
+    "CONTENT_TYPE": "application/json",
+    "CONTENT_LENGTH": str(len(body)),
+    "HTTP_HOST": settings.ALLOWED_HOSTS[0],
+    "SERVER_NAME": settings.ALLOWED_HOSTS[0],
+    "SERVER_PORT": "80",
+    "wsgi.url_scheme": "http",
+    "wsgi.input": io.BytesIO(body),
+}
+statuses = []
+b"".join(app.config.wsgi.application(environ, lambda s, h: statuses.append(s)))
+print(json.dumps({
+    "status": statuses[0],
+    "connected": [alias for alias in connections if connections[alias].connection],
+}))
+"""
+
+
+def test_worker_boot_doesnt_connect():
+    """Tests that booting a worker and serving a cipher opens no connection."""
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "test")
+    process = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        env=env,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    assert result["status"].startswith("200")
+    assert result["connected"] == []
@@ -0,0 +1,72 @@
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff import results, scytale
+
+
+@pytest.fixture
+def result_cache(settings):
+    settings.REDIS_URL = ""
+    settings.SCYTALE_RESULT_CACHE = True
+    settings.SCYTALE_RESULT_CACHE_MAX_LENGTH = 20
+    results._cache = None
+    yield results.get_cache()
+    results._cache = None
+
+
+def test_repeated_requests_hit(client, result_cache):
+    """Tests that a repeated request is served from the cache."""
+    body = {"mensaje": "Devoff se puso ATR", "vueltas": 4}
+    for _ in range(3):
+        response = client.post(
+            reverse("devoff:encrypt"), data=body, content_type="application/json"
+        )
+        assert response.json()["mensaje"] == "DfesTef oRv p osuA"
+
+    assert result_cache.stats() == {
+        "hits": 2,
+        "misses": 1,
+        "skipped": 0,
+        "hit_rate": 2 / 3,
+    }
+
+
+def test_key_depends_on_every_input():
+    """Tests that direction, vueltas and mensaje all change the key."""
+    keys = {
+        results.ResultCache.key("encrypt", "Devoff", 2),
+        results.ResultCache.key("decrypt", "Devoff", 2),
+        results.ResultCache.key("encrypt", "Devoff", 3),
+        results.ResultCache.key("encrypt", "Devofff", 2),
+    }
+    assert len(keys) == 4
+
+
+def test_lone_surrogates(result_cache):
+    """Tests that a message with lone surrogates is cached like any other."""
+    mensaje = "Devoff \ud800 ATR"
+    for _ in range(2):
+        assert results.cipher("encrypt", mensaje, 4) == scytale.encrypt(mensaje, 4)
+    assert result_cache.stats()["hits"] == 1
+
+
+def test_large_messages_are_not_stored(result_cache):
+    """Tests that messages over the size cap skip the cache."""
+    mensaje = "Devoff se puso ATR!!!"
+    assert results.cipher("encrypt", mensaje, 4) == scytale.encrypt(mensaje, 4)
+    assert result_cache.stats()["skipped"] == 1
+    assert result_cache.stats()["misses"] == 0
+
+
+def test_local_cache_lru_and_timeout():
+    """Tests the per-process fallback evicts and honours timeouts."""
+    cache = results.LocalCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    cache.set("d", "4", timeout=0)
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+    assert cache.get("d") is None
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from app.devoff import scytale
+
+
+def reference_encrypt(mensaje, vueltas):
+    return "".join([c for index in range(0, vueltas) for c in mensaje[index::vueltas]])
+
+
+def test_encrypt_example():
+    """Tests the encrypt example from the challenge."""
+    assert scytale.encrypt("Devoff se puso ATR", 4) == "DfesTef oRv p osuA"
+
+
+def test_decrypt_example():
+    """Tests the decrypt example from the challenge."""
+    assert scytale.decrypt("DfesTef oRv p !osuA.", 4) == "Devoff se puso ATR!."
+
+
+def test_round_trip():
+    """Tests that decrypt inverts encrypt for every shape of the grid."""
+    for length in range(0, 40):
+        mensaje = "".join(random.choice("abc ñ€") for _ in range(length))
+        for vueltas in range(1, length + 3):
+            encrypted = scytale.encrypt(mensaje, vueltas)
+            assert encrypted == reference_encrypt(mensaje, vueltas)
+            assert scytale.decrypt(encrypted, vueltas) == mensaje
+
+
+@pytest.mark.parametrize("vueltas", [0, -1])
+def test_invalid_vueltas(vueltas):
+    """Tests that 'vueltas' must be positive."""
+    with pytest.raises(ValueError):
+        scytale.encrypt("Devoff", vueltas)
+    with pytest.raises(ValueError):
+        scytale.decrypt("Devoff", vueltas)
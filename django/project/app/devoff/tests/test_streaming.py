@@ -0,0 +1,113 @@
+import io
+
+from django.core.cache import cache
+
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff import limits, parsers, scytale, streaming
+
+
+def stream(client, name, body, vueltas):
+    return client.post(
+        reverse(name) + "?vueltas={}".format(vueltas),
+        data=body.encode("utf-8"),
+        content_type="text/plain; charset=utf-8",
+    )
+
+
+def test_encrypt_stream(client, settings):
+    """Tests that the streamed ciphertext matches the regular endpoint."""
+    settings.SCYTALE_STREAM_CHUNK_SIZE = 3
+    response = stream(client, "devoff:encrypt_stream", "Devoff se puso ATR!.", 4)
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content).decode() == "DfesTef oRv p !osuA."
+
+
+def test_decrypt_stream(client, settings):
+    """Tests that a streamed decrypt handles non-ASCII text."""
+    settings.SCYTALE_STREAM_CHUNK_SIZE = 2
+    mensaje = "Ñandú über straße €"
+    response = stream(client, "devoff:decrypt_stream", scytale.encrypt(mensaje, 5), 5)
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content).decode() == mensaje
+
+
+def test_stream_validation(client):
+    """Tests that 'vueltas' and the body are validated before streaming."""
+    response = stream(client, "devoff:encrypt_stream", "Devoff", "cuatro")
+    assert response.status_code == 422
+    assert "vueltas" in response.json()
+
+    response = stream(client, "devoff:encrypt_stream", "", 4)
+    assert response.status_code == 422
+    assert "mensaje" in response.json()
+
+
+def test_stream_limits(client, settings):
+    """Tests that streams are held to the body size and the cost budget."""
+    settings.SCYTALE_MAX_BODY_SIZE = 10
+    response = stream(client, "devoff:encrypt_stream", "x" * 1000, 4)
+    assert response.status_code == 413
+    assert "detail" in response.json()
+
+    settings.SCYTALE_MAX_BODY_SIZE = 10000
+    settings.SCYTALE_COST_MAX = limits.cost(1000, 4) - 1
+    assert stream(client, "devoff:encrypt_stream", "x" * 999, 4).status_code == 200
+    assert stream(client, "devoff:encrypt_stream", "€" * 1000, 4).status_code == 413
+
+
+def test_spool_max_bytes():
+    """Tests that bodies of unknown length are spooled up to max_bytes."""
+    spooled, size = streaming.spool(io.BytesIO(b"x" * 10), 3, 10)
+    assert size == 10
+    spooled.close()
+    with pytest.raises(parsers.PayloadTooLarge):
+        streaming.spool(io.BytesIO(b"x" * 11), 3, 10)
+
+
+def test_stream_concurrency(client, settings):
+    """Tests that streams take a slot of the client."""
+    settings.SCYTALE_CLIENT_CONCURRENCY = 1
+    cache.clear()
+    settings.SCYTALE_STREAM_CHUNK_SIZE = 2
+    with limits.slot("127.0.0.1"):
+        response = stream(client, "devoff:encrypt_stream", "Devoff", 4)
+        assert response.status_code == 429
+
+    response = stream(client, "devoff:encrypt_stream", "Devoff", 4)
+    assert response.status_code == 200
+    chunks = iter(response.streaming_content)
+    next(chunks)
+    assert limits.in_flight("127.0.0.1") == 1
+    assert stream(client, "devoff:encrypt_stream", "Devoff", 4).status_code == 429
+    list(chunks)
+    assert limits.in_flight("127.0.0.1") == 0
+    assert stream(client, "devoff:encrypt_stream", "Devoff", 4).status_code == 200
+
+
+def test_chunks_match_cipher():
+    """Tests every tiling of the grid against the in-memory cipher."""
+    for length in range(0, 25):
+        mensaje = "".join(chr(0x61 + index % 5) for index in range(length))
+        for vueltas in range(1, length + 2):
+            for chunk_size in (1, 4, 64):
+                spooled, size = streaming.spool(
+                    io.BytesIO(mensaje.encode()), chunk_size, 1024
+                )
+                encrypted = "".join(
+                    streaming.SpooledCipher(
+                        spooled, size, streaming.encrypt_chunks, vueltas, chunk_size
+                    )
+                )
+                assert encrypted == scytale.encrypt(mensaje, vueltas)
+
+                spooled, size = streaming.spool(
+                    io.BytesIO(encrypted.encode()), chunk_size, 1024
+                )
+                decrypted = "".join(
+                    streaming.SpooledCipher(
+                        spooled, size, streaming.decrypt_chunks, vueltas, chunk_size
+                    )
+                )
+                assert decrypted == mensaje
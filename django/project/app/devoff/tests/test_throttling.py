@@ -0,0 +1,167 @@
+import json
+
+import pytest
+from rest_framework.reverse import reverse
+
+from app.devoff import throttling
+from app.devoff.tests.utils import call
+
+BODY = {"mensaje": "Devoff se puso ATR", "vueltas": 4}
+
+
+@pytest.fixture(autouse=True)
+def buckets(monkeypatch):
+    monkeypatch.setattr(throttling, "_buckets", None)
+
+
+@pytest.fixture
+def rates(settings):
+    def set_rates(**rates):
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {
+                "{}.{}".format(*scope.rsplit("_", 1)): rate
+                for scope, rate in rates.items()
+            },
+        }
+
+    return set_rates
+
+
+@pytest.fixture
+def redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeStrictRedis()
+
+
+def post(client, name="encrypt", data=BODY, **extra):
+    return client.post(
+        reverse("devoff:{}".format(name)),
+        data=json.dumps(data),
+        content_type="application/json",
+        **extra,
+    )
+
+
+def test_per_client(client, rates):
+    """Tests that clients are throttled on their own, per endpoint."""
+    rates(encrypt_ip="3/min")
+    assert [post(client).status_code for _ in range(3)] == [200] * 3
+    response = post(client)
+    assert response.status_code == 429
+    assert 0 < int(response["Retry-After"]) <= 20
+
+    assert post(client, HTTP_X_FORWARDED_FOR="10.0.0.3").status_code == 429
+    assert post(client, REMOTE_ADDR="10.0.0.2").status_code == 200
+    assert post(client, "decrypt").status_code == 200
+
+
+def test_per_token(client, rates):
+    """Tests that tokens are throttled on their own, when sent."""
+    rates(encrypt_token="2/min")
+    token = {"HTTP_AUTHORIZATION": "Token abc"}
+    assert [post(client, **token).status_code for _ in range(3)] == [200, 200, 429]
+    assert post(client, HTTP_AUTHORIZATION="Bearer xyz").status_code == 200
+    assert post(client).status_code == 200
+
+
+def test_streams(client, rates):
+    """Tests that the stream views are throttled like the others."""
+    rates(encrypt_stream_ip="1/min")
+    url = reverse("devoff:encrypt_stream") + "?vueltas=4"
+    body = "Devoff se puso ATR".encode()
+    response = client.post(url, data=body, content_type="text/plain")
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == b"DfesTef oRv p osuA"
+    response = client.post(url, data=body, content_type="text/plain")
+    assert response.status_code == 429
+    assert 0 < int(response["Retry-After"]) <= 60
+
+
+def test_weighted_by_size(client, rates, settings):
+    """Tests that large messages take more tokens."""
+    settings.SCYTALE_THROTTLE_BYTES_PER_TOKEN = 100
+    rates(encrypt_ip="4/min")
+    large = {"mensaje": "Devoff se puso ATR " * 12, "vueltas": 4}
+    assert throttling.weight({"CONTENT_LENGTH": len(json.dumps(large))}) == 3
+    assert post(client, data=large).status_code == 200
+    assert post(client).status_code == 200
+    assert post(client).status_code == 429
+
+    # NOTE: Messages larger than a bucket take all of it, not forever.
+    rates(encrypt_ip="2/min")
+    assert post(client, data=large, REMOTE_ADDR="10.0.0.2").status_code == 200
+
+
+def test_refill():
+    """Tests that buckets refill at their rate and cap at their size."""
+    buckets = throttling.LocalBuckets(max_entries=10)
+    assert buckets.take("a", 2, 1.0, 2, now=0) == (True, 0)
+    assert buckets.take("a", 2, 1.0, 1, now=0.5) == (False, 0.5)
+    assert buckets.take("a", 2, 1.0, 1, now=1) == (True, 0)
+    assert buckets.take("a", 2, 1.0, 1, now=100) == (True, 1)
+
+
+def test_fast_path(rates):
+    """Tests that the WSGI fast path is throttled like the views."""
+    rates(encrypt_ip="1/min")
+    body = json.dumps(BODY).encode()
+    assert call("/encrypt", body)[0] == 200
+    assert call("/encrypt", body)[0] == 429
+    assert call("/decrypt", body)[0] == 200
+
+
+def test_redis_script(redis):
+    """Tests the atomic bucket script against a Redis stand-in."""
+    buckets = throttling.RedisBuckets(redis, 0, 0, 10)
+    assert buckets.take("k", 2, 1.0, 2, now=1000) == (True, 0)
+    assert buckets.take("k", 2, 1.0, 1, now=1000.5) == (False, 0.5)
+    assert buckets.take("k", 2, 1.0, 1, now=1001) == (True, 0)
+    assert buckets.take("k", 2, 1.0, 1, now=2000) == (True, 1)
+    assert 0 < redis.ttl("k") <= 3
+    assert buckets.stats() == {"round_trips": 4, "local": 0}
+
+
+def test_local_pre_check(redis):
+    """Tests that clearly under-limit clients skip Redis, and pay later."""
+    buckets = throttling.RedisBuckets(redis, 1.0, 0.1, 10)
+    taken = [buckets.take("k", 100, 0.001, 3, now=1000)[0] for _ in range(10)]
+    assert all(taken)
+    # NOTE: A round trip, then 3 local takes per 10% of the bucket.
+    assert buckets.stats() == {"round_trips": 3, "local": 7}
+    # NOTE: The last take is not in Redis yet.
+    assert float(redis.hget("k", "tokens")) == 100 - 9 * 3
+
+    # Stale: ask Redis, charging the tokens spent locally meanwhile.
+    assert buckets.take("k", 100, 0.001, 1, now=1002) == (True, pytest.approx(69.002))
+    assert buckets.stats()["round_trips"] == 4
+
+    # Less than half full: ask Redis.
+    buckets = throttling.RedisBuckets(redis, 1.0, 1.0, 10)
+    assert buckets.take("h", 10, 0.001, 6, now=1000) == (True, 4)
+    assert buckets.take("h", 10, 0.001, 1, now=1000) == (True, 3)
+    assert buckets.stats() == {"round_trips": 2, "local": 0}
+
+
+def test_workers_share_buckets(redis):
+    """Tests that workers can't go much over a shared limit."""
+    workers = [throttling.RedisBuckets(redis, 1.0, 0.1, 10) for _ in range(4)]
+    taken = sum(
+        worker.take("k", 100, 0.001, 1, now=1000)[0]
+        for _ in range(100)
+        for worker in workers
+    )
+    # NOTE: Each worker spends at most 10% of the bucket before syncing.
+    assert 100 <= taken <= 100 + 4 * 10
+
+
+def test_redis_buckets_from_settings(settings, monkeypatch, redis):
+    """Tests that REDIS_URL puts buckets in the default cache's Redis."""
+    settings.REDIS_URL = "redis://redis:6379/0"
+
+    class Cache:
+        master_client = redis
+
+    monkeypatch.setattr(throttling, "caches", {"default": Cache()})
+    assert isinstance(throttling.get_buckets(), throttling.RedisBuckets)
@@ -0,0 +1,37 @@
+"""Helpers shared by the test modules."""
+
+import io
+
+from app.devoff.fastpath import FastPathApplication
+
+
+def fallback(environ, start_response):
+    start_response("418 I'm a Teapot", [])
+    return [b"django"]
+
+
+def call(path, body, content_type="application/json", method="POST"):
+    """Return the status and content of a request to the WSGI fast path."""
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "CONTENT_TYPE": content_type,
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+    }
+    started = {}
+
+    def start_response(status, headers):
+        started["status"] = int(status.split()[0])
+
+    content = b"".join(FastPathApplication(fallback)(environ, start_response))
+    return started["status"], content
+
+
+class Stream(io.BytesIO):
+    """A body that records how much of it was read."""
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.consumed = self.tell()
+        return chunk
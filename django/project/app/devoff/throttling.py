@@ -0,0 +1,241 @@
+"""
+Token bucket throttles of the API.
+
+A client gets a bucket of ``num`` tokens per endpoint, refilled at ``num``
+tokens per ``period``, for rates set in DRF's ``"num/period"`` format in
+``DEFAULT_THROTTLE_RATES`` under ``"<URL name>.ip"`` and ``"<URL name>.token"``,
+e.g. ``"encrypt.ip": "600/min"``. Endpoints without a rate aren't throttled.
+A request takes ``1 + Content-Length // SCYTALE_THROTTLE_BYTES_PER_TOKEN``
+tokens, at most a whole bucket, so large messages count for more.
+
+- ``ClientRateThrottle``: per client address, see ``limits.client``.
+- ``TokenRateThrottle``: per ``Authorization`` token. The cipher views skip
+  authentication to stay off the database, so the token is not checked, it
+  only tells clients apart. ``ClientRateThrottle`` still bounds clients making
+  up tokens.
+
+With ``REDIS_URL`` the buckets live in Redis, shared by every worker, and are
+updated atomically by a Lua script. Each process also remembers what Redis
+last said about a bucket and admits requests without a round trip while the
+bucket was synced within ``SCYTALE_THROTTLE_LOCAL_SECONDS`` and is at least
+half full, spending at most ``SCYTALE_THROTTLE_LOCAL_SHARE`` of it. Tokens
+spent locally are charged to Redis on the next round trip. Without
+``REDIS_URL`` buckets are kept per process.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from app.devoff import limits, metrics
+
+KEY_PREFIX = "devoff:throttle:"
+
+# NOTE: ARGV: capacity, refill per second, now, tokens spent locally, cost.
+#       Returns whether the cost was taken and the tokens left, as a string
+#       since Redis truncates Lua numbers to integers.
+SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "at")
+local tokens = tonumber(bucket[1]) or capacity
+local at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - at, 0) * refill)
+tokens = tokens - tonumber(ARGV[4])
+local taken = 0
+if tokens >= tonumber(ARGV[5]) then
+    tokens = tokens - tonumber(ARGV[5])
+    taken = 1
+end
+redis.call("HMSET", KEYS[1], "tokens", tokens, "at", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / refill) + 1)
+return {taken, tostring(tokens)}
+"""
+
+
+class LocalBuckets:
+    """Per-process token buckets, an LRU of at most ``max_entries``."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(
+        self, key: str, capacity: int, refill: float, cost: int, now: float
+    ) -> Tuple[bool, float]:
+        """Take ``cost`` tokens if there are enough, return the tokens left."""
+        with self._lock:
+            tokens, at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(now - at, 0) * refill)
+            taken = tokens >= cost
+            if taken:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return taken, tokens
+
+
+class RedisBuckets:
+    """Token buckets in Redis, admitting clearly under-limit clients locally."""
+
+    def __init__(self, client, local_seconds: float, local_share: float, max_entries):
+        self.script = client.register_script(SCRIPT)
+        self.local_seconds = local_seconds
+        self.local_share = local_share
+        self.max_entries = max_entries
+        self.round_trips = 0
+        self.local = 0
+        # NOTE: key -> [tokens when synced, tokens spent since, synced at].
+        self._synced: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(
+        self, key: str, capacity: int, refill: float, cost: int, now: float
+    ) -> Tuple[bool, float]:
+        """Take ``cost`` tokens if there are enough, return the tokens left."""
+        spent = 0
+        with self._lock:
+            synced = self._synced.get(key)
+            if synced is not None:
+                tokens, spent, at = synced
+                if (
+                    now - at < self.local_seconds
+                    and tokens - spent - cost >= capacity / 2
+                    and spent + cost <= capacity * self.local_share
+                ):
+                    synced[1] += cost
+                    self.local += 1
+                    return True, tokens - synced[1]
+                # NOTE: Charged to Redis below, whoever syncs next starts over.
+                synced[1] = 0
+
+        taken, tokens = self.script(
+            keys=[key], args=[capacity, refill, now, spent, cost]
+        )
+        tokens = float(tokens)
+        with self._lock:
+            self.round_trips += 1
+            self._synced[key] = [tokens, 0, now]
+            self._synced.move_to_end(key)
+            while len(self._synced) > self.max_entries:
+                self._synced.popitem(last=False)
+        return bool(taken), tokens
+
+    def stats(self) -> dict:
+        return {"round_trips": self.round_trips, "local": self.local}
+
+
+_buckets = None
+
+
+def get_buckets():
+    """Return the process-wide buckets built from settings."""
+    global _buckets
+    if _buckets is None:
+        if settings.REDIS_URL:
+            _buckets = RedisBuckets(
+                caches["default"].master_client,
+                settings.SCYTALE_THROTTLE_LOCAL_SECONDS,
+                settings.SCYTALE_THROTTLE_LOCAL_SHARE,
+                settings.SCYTALE_THROTTLE_LOCAL_ENTRIES,
+            )
+        else:
+            _buckets = LocalBuckets(settings.SCYTALE_THROTTLE_LOCAL_ENTRIES)
+    return _buckets
+
+
+def weight(meta: dict) -> int:
+    """Return the tokens a request takes, by the size of its body."""
+    try:
+        length = max(int(meta.get("CONTENT_LENGTH") or 0), 0)
+    except ValueError:
+        length = 0
+    return 1 + length // settings.SCYTALE_THROTTLE_BYTES_PER_TOKEN
+
+
+class BucketThrottle(SimpleRateThrottle):
+    """Token bucket throttle scoped by endpoint, see the module docstring."""
+
+    kind = ""
+
+    def __init__(self):
+        # Like ScopedRateThrottle, the rate depends on the endpoint, which is
+        # only known once called.
+        self.waiting = None
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_ident_of(self, meta: dict) -> Optional[str]:
+        raise NotImplementedError(".get_ident_of() must be overridden")
+
+    def allow_request(self, request, view):
+        return self.allow(metrics.endpoint(request), request.META)
+
+    def allow(self, endpoint: str, meta: dict) -> bool:
+        """Take the tokens of a request to ``endpoint``, if it is throttled."""
+        self.scope = "{}.{}".format(endpoint, self.kind)
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        ident = self.get_ident_of(meta)
+        if ident is None:
+            return True
+
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        refill = self.num_requests / self.duration
+        cost = min(weight(meta), self.num_requests)
+        taken, tokens = get_buckets().take(
+            "{}{}:{}".format(KEY_PREFIX, self.scope, ident),
+            self.num_requests,
+            refill,
+            cost,
+            time.time(),
+        )
+        self.waiting = None if taken else (cost - tokens) / refill
+        return taken
+
+    def wait(self):
+        return self.waiting
+
+
+class ClientRateThrottle(BucketThrottle):
+    kind = "ip"
+
+    def get_ident_of(self, meta: dict) -> Optional[str]:
+        return limits.client(meta)
+
+
+class TokenRateThrottle(BucketThrottle):
+    kind = "token"
+
+    def get_ident_of(self, meta: dict) -> Optional[str]:
+        keyword, _, token = meta.get("HTTP_AUTHORIZATION", "").partition(" ")
+        if keyword.lower() not in ("token", "bearer") or not token.strip():
+            return None
+        # NOTE: Tokens are secrets, keep them out of Redis keys.
+        return hashlib.sha256(token.strip().encode()).hexdigest()
+
+
+def check(endpoint: str, meta: dict) -> None:
+    """Raise ``Throttled`` if a request to ``endpoint`` is over a rate."""
+    waits = []
+    for throttle_class in (ClientRateThrottle, TokenRateThrottle):
+        throttle = throttle_class()
+        if not throttle.allow(endpoint, meta):
+            waits.append(throttle.wait())
+    if waits:
+        raise Throttled(wait=max(waits))
@@ -6,4 +6,12 @@ app_name = "devoff"
 urlpatterns = [
     path("encrypt", views.encrypt, name="encrypt"),
     path("decrypt", views.decrypt, name="decrypt"),
+    path("encrypt/batch", views.encrypt_batch, name="encrypt_batch"),
+    path("decrypt/batch", views.decrypt_batch, name="decrypt_batch"),
+    path("pipeline", views.pipeline_view, name="pipeline"),
+    path("crack", views.crack_view, name="crack"),
+    path("encrypt/stream", views.encrypt_stream, name="encrypt_stream"),
+    path("decrypt/stream", views.decrypt_stream, name="decrypt_stream"),
+    path("jobs/<uuid:job_id>", views.job, name="job"),
+    path("metrics", views.metrics_view, name="metrics"),
 ]
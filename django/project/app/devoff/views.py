@@ -1,45 +1,344 @@
-import math
+import hmac
+from collections import defaultdict
+from contextlib import ExitStack
 
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from celery.result import AsyncResult
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    parser_classes,
+    permission_classes,
+    renderer_classes,
+)
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.utils.mediatypes import media_type_matches
 
-from app.devoff.serializers import EncryptSerializer
+from app.devoff import (
+    backends,
+    crack,
+    limits,
+    metrics,
+    parsers,
+    pipeline,
+    renderers,
+    results,
+    scytale,
+    streaming,
+    tasks,
+    throttling,
+)
+from app.devoff.serializers import (
+    AsciiSerializer,
+    CrackSerializer,
+    EncryptSerializer,
+    PipelineSerializer,
+    RawAsciiSerializer,
+    RawEncryptSerializer,
+    StreamSerializer,
+)
 
 
-@api_view(["POST"])
-@permission_classes([AllowAny])
-def encrypt(request):
-    """Encrypts a message using Scytale method."""
-    serializer = EncryptSerializer(data=request.data)
-    if serializer.is_valid():
+def _cipher_bytes(request, direction, mensaje, vueltas):
+    """
+    Ciphers an ASCII message as is. The bytes go straight into a raw or JSON
+    response, other formats get them decoded.
+
+    NOTE: The result cache is skipped, hashing the message would cost about
+          as much as moving its bytes.
+    """
+    result = backends.cipher_bytes(mensaje, vueltas, direction)
+    if isinstance(
+        request.accepted_renderer,
+        (renderers.JSONRenderer, renderers.OctetStreamRenderer),
+    ):
+        return result
+    return result.decode("ascii")
+
+
+def _run_cipher(request, direction):
+    """Runs the cipher, or submits it as a job when the message is costly."""
+    with metrics.stage(request, "parse"):
+        data = request.data
+    # NOTE: Raw bodies are the message as is, whitespace included.
+    raw = media_type_matches(parsers.OctetStreamParser.media_type, request.content_type)
+    if isinstance(data, dict) and isinstance(data.get("mensaje"), (bytes, bytearray)):
+        serializer = (RawAsciiSerializer if raw else AsciiSerializer)(data=data)
+    else:
+        serializer = (RawEncryptSerializer if raw else EncryptSerializer)(data=data)
+    with metrics.stage(request, "validate"):
+        valid = serializer.is_valid()
+    if valid:
         mensaje = serializer.validated_data["mensaje"]
         vueltas = serializer.validated_data["vueltas"]
-        mensaje_encrypt = [
-            c for index in range(0, vueltas) for c in mensaje[index::vueltas]
-        ]
-        return Response({"mensaje": "".join(mensaje_encrypt)})
+        limits.check(limits.cost(len(mensaje), vueltas))
+        metrics.MESSAGE_CHARS.observe(len(mensaje), metrics.endpoint(request))
+        # NOTE: Picked up by ProfilerMiddleware.
+        request._request.scytale = {"length": len(mensaje), "vueltas": vueltas}
+        if tasks.offload(mensaje, vueltas):
+            if not isinstance(mensaje, str):
+                mensaje = mensaje.decode("ascii")
+            job = tasks.cipher.delay(direction, mensaje, vueltas)
+            return Response(
+                {"job": job.id, "status": job.status},
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Location": reverse("devoff:job", args=[job.id])},
+            )
+        with metrics.stage(request, "cipher"):
+            if not isinstance(mensaje, str):
+                result = _cipher_bytes(request, direction, mensaje, vueltas)
+            else:
+                result = results.cipher(direction, mensaje, vueltas)
+        return Response({"mensaje": result})
     else:
         return Response(serializer.errors, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
 
 @api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@parser_classes(parsers.CIPHER_PARSERS)
+@renderer_classes(renderers.CIPHER_RENDERERS)
+def encrypt(request):
+    """Encrypts a message using Scytale method."""
+    with limits.slot(limits.client(request.META)):
+        return _run_cipher(request, scytale.ENCRYPT)
+
+
+@api_view(["POST"])
+@authentication_classes([])
 @permission_classes([AllowAny])
+@parser_classes(parsers.CIPHER_PARSERS)
+@renderer_classes(renderers.CIPHER_RENDERERS)
 def decrypt(request):
     """Decrypts a message using Scytale method."""
-    serializer = EncryptSerializer(data=request.data)
-    if serializer.is_valid():
-        mensaje = serializer.validated_data["mensaje"]
-        vueltas = serializer.validated_data["vueltas"]
-        rows = math.ceil(len(mensaje) / vueltas)
-        for missing in range(1, rows * vueltas - len(mensaje)):
-            # Fill missing spaces
-            position = missing * rows
-            mensaje = mensaje[:-position] + " " + mensaje[-position:]
-        mensaje_decrypt = [c for index in range(0, rows) for c in mensaje[index::rows]]
-        # Joins the whole list and remove extra spaces.
-        mensaje_decrypt = "".join(mensaje_decrypt).strip()
-        return Response({"mensaje": mensaje_decrypt})
-    else:
+    with limits.slot(limits.client(request.META)):
+        return _run_cipher(request, scytale.DECRYPT)
+
+
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def job(request, job_id):
+    """Returns the status of a background cipher job and its result when done."""
+    result = AsyncResult(str(job_id), app=tasks.cipher.app)
+    data = {"job": str(job_id), "status": result.status}
+    if result.successful():
+        data["mensaje"] = result.result
+    return Response(data)
+
+
+def _run_batch(request, direction):
+    """Runs the cipher over a batch of items, grouped by 'vueltas'."""
+    serializer = EncryptSerializer(data=request.data, many=True)
+    if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    items = serializer.validated_data
+    limits.check(
+        sum(
+            limits.cost(len(item["mensaje"]), item["vueltas"])
+            for item in items
+            if "errors" not in item
+        )
+    )
+    outputs = [None] * len(items)
+    groups = defaultdict(list)
+    for position, item in enumerate(items):
+        if "errors" in item:
+            outputs[position] = item
+        else:
+            groups[item["vueltas"]].append(position)
+
+    for vueltas, positions in groups.items():
+        # Repeated messages within a group are only ciphered once.
+        done = {}
+        for position in positions:
+            mensaje = items[position]["mensaje"]
+            if mensaje not in done:
+                done[mensaje] = results.cipher(direction, mensaje, vueltas)
+            outputs[position] = {"mensaje": done[mensaje]}
+    return Response(outputs)
+
+
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@parser_classes(parsers.BATCH_PARSERS)
+@renderer_classes(renderers.BATCH_RENDERERS)
+def encrypt_batch(request):
+    """Encrypts a list of messages using Scytale method."""
+    with limits.slot(limits.client(request.META)):
+        return _run_batch(request, scytale.ENCRYPT)
+
+
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@parser_classes(parsers.BATCH_PARSERS)
+@renderer_classes(renderers.BATCH_RENDERERS)
+def decrypt_batch(request):
+    """Decrypts a list of messages using Scytale method."""
+    with limits.slot(limits.client(request.META)):
+        return _run_batch(request, scytale.DECRYPT)
+
+
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@parser_classes(parsers.BATCH_PARSERS)
+@renderer_classes(renderers.CIPHER_RENDERERS)
+def pipeline_view(request):
+    """Runs a message through a list of encrypt/decrypt steps, in order."""
+    with limits.slot(limits.client(request.META)):
+        serializer = PipelineSerializer(data=request.data)
+        with metrics.stage(request, "validate"):
+            valid = serializer.is_valid()
+        if not valid:
+            return Response(
+                serializer.errors, status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        mensaje = serializer.validated_data["mensaje"]
+        steps = pipeline.simplify(serializer.validated_data["steps"], len(mensaje))
+        limits.check(sum(limits.cost(len(mensaje), vueltas) for _, vueltas in steps))
+        metrics.MESSAGE_CHARS.observe(len(mensaje), metrics.endpoint(request))
+        # NOTE: Picked up by ProfilerMiddleware.
+        request._request.scytale = {"length": len(mensaje), "steps": steps}
+        with metrics.stage(request, "cipher"):
+            result = pipeline.run(mensaje, steps)
+        return Response({"mensaje": result})
+
+
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@parser_classes(parsers.BATCH_PARSERS)
+@renderer_classes(renderers.BATCH_RENDERERS)
+def crack_view(request):
+    """Decrypts a message of unknown 'vueltas', most likely candidates first."""
+    with limits.slot(limits.client(request.META)):
+        serializer = CrackSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors, status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        mensaje = serializer.validated_data["mensaje"]
+        top = serializer.validated_data["top"]
+        limits.check(crack.cost(len(mensaje), top))
+        return Response(crack.crack(mensaje, top))
+
+
+def _stream_error(exc):
+    """Renders an API exception of the stream views like DRF does."""
+    detail = exc.detail
+    if not isinstance(detail, (list, dict)):
+        detail = {"detail": detail}
+    response = JsonResponse(detail, status=exc.status_code, safe=False)
+    if getattr(exc, "wait", None):
+        response["Retry-After"] = "%d" % exc.wait
+    return response
+
+
+def _run_stream(request, direction, held):
+    """
+    Streams the cipher of a raw UTF-8 body, 'vueltas' comes in the query.
+
+    The contexts in ``held`` are handed over to the stream, to be exited once
+    it is sent.
+    """
+    serializer = StreamSerializer(data=request.GET)
+    if not serializer.is_valid():
+        return JsonResponse(
+            serializer.errors, status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    vueltas = serializer.validated_data["vueltas"]
+
+    chunk_size = settings.SCYTALE_STREAM_CHUNK_SIZE
+    try:
+        parsers.check_length({"request": request}, vueltas)
+        spooled, length = streaming.spool(
+            request, chunk_size, settings.SCYTALE_MAX_BODY_SIZE
+        )
+    except UnicodeDecodeError:
+        return JsonResponse(
+            {"mensaje": ["Not a valid UTF-8 string."]},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if not length:
+        spooled.close()
+        return JsonResponse(
+            {"mensaje": ["This field may not be blank."]},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    try:
+        limits.check(limits.cost(length, vueltas))
+    except APIException:
+        spooled.close()
+        raise
+
+    cipher = streaming.SpooledCipher(
+        spooled,
+        length,
+        streaming.CHUNKERS[direction],
+        vueltas,
+        chunk_size,
+        held.pop_all(),
+    )
+    return StreamingHttpResponse(cipher, content_type="text/plain; charset=utf-8")
+
+
+def _limited_stream(request, direction):
+    """
+    Runs ``_run_stream`` in a slot of the client, within the cost budget and
+    the throttle rates, which DRF doesn't apply to these plain Django views.
+
+    NOTE: The slot is held until the stream is closed, after its last chunk.
+    """
+    try:
+        throttling.check(metrics.endpoint(request), request.META)
+        with ExitStack() as held:
+            held.enter_context(limits.slot(limits.client(request.META)))
+            return _run_stream(request, direction, held)
+    except APIException as exc:
+        return _stream_error(exc)
+
+
+@csrf_exempt
+@require_POST
+def encrypt_stream(request):
+    """Encrypts a raw text body using Scytale method and streams the result."""
+    return _limited_stream(request, scytale.ENCRYPT)
+
+
+@csrf_exempt
+@require_POST
+def decrypt_stream(request):
+    """Decrypts a raw text body using Scytale method and streams the result."""
+    return _limited_stream(request, scytale.DECRYPT)
+
+
+@never_cache
+@require_GET
+def metrics_view(request):
+    """Exposes the metrics in the Prometheus text format, to token holders."""
+    token = settings.SCYTALE_METRICS_TOKEN
+    keyword, _, header = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    if (
+        not settings.SCYTALE_METRICS
+        or not token
+        or keyword.lower() != "bearer"
+        or not hmac.compare_digest(
+            header.strip().encode("utf-8"), token.encode("utf-8")
+        )
+    ):
+        raise Http404
+    return HttpResponse(metrics.expose(), content_type=metrics.CONTENT_TYPE)